@@ -1,42 +1,255 @@
-from typing import Literal, Dict, Any
+import asyncio
+import time
+from contextlib import aclosing
+from typing import Literal, Dict, Any, Optional, Iterator, AsyncIterator
 from llama_index.core.schema import NodeWithScore
-from data_pipeline.evaluator import PipelineEvaluator
-from typing import List
+from data_pipeline.eval_worker import BackgroundEvaluator
+from app.query_cache import QueryCache
+from config.settings import settings
+from config.telemetry import start_trace, count
+from llama_index.core.vector_stores.types import MetadataFilters
+from retrieval.filters import active_filters, build_filters, scoped_filters
+from typing import List, Union
+
+# MetadataFilters, or retrieval.filters.build_filters keyword arguments
+Filters = Union[MetadataFilters, Dict[str, Any]]
 
 class AdvancedRAGApplication:
-    def __init__(self, query_engine, mode: Literal["query", "agent"] = "query"):
+    def __init__(
+            self,
+            query_engine,
+            mode: Literal["query", "agent"] = "query",
+            cache: Optional[QueryCache] = None,
+            eval_worker: Optional[BackgroundEvaluator] = None
+    ):
         self.mode = mode
         self.query_engine = query_engine
-        self.evaluator = PipelineEvaluator()
+        self._evaluator = eval_worker.evaluator if eval_worker is not None else None
+        self.cache = cache
+        # When set, evaluate=True queues a sampled background evaluation instead of blocking the answer
+        self.eval_worker = eval_worker
+        # Per-stage cold-start timings, filled in by main.initialize_system
+        self.startup: Dict[str, Any] = {}
 
         if mode == "agent":
             from orchestrator.agent import AdvancedRAGAgent
             self.orchestrator = AdvancedRAGAgent(query_engine)
+            if settings.AGENT_ROUTER_ENABLED:
+                # Single-fact lookups go straight to the query engine; the agent gets the rest
+                from orchestrator.router import QueryRouter, RoutedAgent
+                router = QueryRouter(
+                    embed_model=settings.embed_model,
+                    max_simple_words=settings.AGENT_ROUTER_MAX_SIMPLE_WORDS,
+                    margin=settings.AGENT_ROUTER_MARGIN
+                )
+                self.orchestrator = RoutedAgent(query_engine, self.orchestrator, router)
         else:
             self.orchestrator = query_engine
 
-    def query(self, query_str: str, evaluate: bool = False) -> Dict[str, Any]:
-        """Process query with optional evaluation"""
+    @property
+    def evaluator(self):
+        # Built on the first inline evaluation rather than at startup
+        if self._evaluator is None:
+            from data_pipeline.evaluator import PipelineEvaluator
+            self._evaluator = PipelineEvaluator()
+        return self._evaluator
+
+    def query(self, query_str: str, evaluate: bool = False, filters: Optional[Filters] = None) -> Dict[str, Any]:
+        """Process query with optional evaluation; per-stage timings and counts are under "trace"
+
+        filters restrict retrieval, including the agent's tool calls, to
+        matching chunks, e.g. {"source_file": ["deal_12.txt", "deal_14.txt"],
+        "ingested_after": "2024-06-01"}. Keys are document_id (the file's path
+        relative to the corpus directory, e.g. "deals/deal_12.pdf"),
+        source_file, doc_type, ingested_after and ingested_before. Filtered
+        queries bypass the answer cache.
+        """
+        with start_trace(self.mode) as trace, scoped_filters(self._filters(filters)):
+            result = self._query(query_str, evaluate)
+        return self._attach_trace(result, trace)
+
+    async def aquery(self, query_str: str, evaluate: bool = False,
+                     filters: Optional[Filters] = None) -> Dict[str, Any]:
+        """Async variant of query for serving many questions from one process"""
+        with start_trace(self.mode) as trace, scoped_filters(self._filters(filters)):
+            result = await self._aquery(query_str, evaluate)
+        return self._attach_trace(result, trace)
+
+    def stream_query(self, query_str: str, evaluate: bool = False,
+                     filters: Optional[Filters] = None) -> Iterator[Dict[str, Any]]:
+        """Yield {"type": "token", "delta"} events as the answer is generated, then one "done" event
+
+        The done event carries the full answer, sources, timing (ttft_ms and
+        total_ms), the trace and the evaluation if requested.
+        """
+        with start_trace(self.mode) as trace, scoped_filters(self._filters(filters)):
+            for event in self._stream_query(query_str, evaluate):
+                if event["type"] == "done":
+                    self._attach_trace(event, trace)
+                yield event
+
+    async def astream_query(self, query_str: str, evaluate: bool = False,
+                            filters: Optional[Filters] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Async variant of stream_query"""
+        with start_trace(self.mode) as trace, scoped_filters(self._filters(filters)):
+            # Closed explicitly when the consumer stops early, so the LLM slot is released right away
+            async with aclosing(self._astream_query(query_str, evaluate)) as events:
+                async for event in events:
+                    if event["type"] == "done":
+                        self._attach_trace(event, trace)
+                    yield event
+
+    @staticmethod
+    def _filters(filters: Optional[Filters]) -> Optional[MetadataFilters]:
+        if filters is None or isinstance(filters, MetadataFilters):
+            return filters
+        return build_filters(**filters)
+
+    def _active_cache(self) -> Optional[QueryCache]:
+        # Cached answers were built from unfiltered retrieval
+        return self.cache if active_filters() is None else None
+
+    @staticmethod
+    def _attach_trace(result: Dict[str, Any], trace) -> Dict[str, Any]:
+        if settings.TELEMETRY_ENABLED:
+            result["trace"] = trace.to_dict()
+        return result
+
+    def _query(self, query_str: str, evaluate: bool) -> Dict[str, Any]:
+        cache = self._active_cache()
+        if cache is not None:
+            cached = cache.get(query_str)
+            if cached is not None:
+                count("cache_hits")
+                return cached
+
         response = self.orchestrator.query(query_str)
+        result = self._build_result(response)
+        if cache is not None:
+            cache.put(query_str, result)
 
-        result = {
-            "answer": str(response),
-            "sources": self._extract_sources(response)
-        }
+        if evaluate:
+            result["evaluation"] = self._evaluate(query_str, str(response), self._contexts(response))
+
+        return result
+
+    async def _aquery(self, query_str: str, evaluate: bool) -> Dict[str, Any]:
+        cache = self._active_cache()
+        # Cache lookups may embed the query; keep that off the event loop
+        if cache is not None:
+            cached = await asyncio.to_thread(cache.get, query_str)
+            if cached is not None:
+                count("cache_hits")
+                return cached
+
+        response = await self.orchestrator.aquery(query_str)
+        result = self._build_result(response)
+        if cache is not None:
+            await asyncio.to_thread(cache.put, query_str, result)
 
         if evaluate:
-            eval_results, score = self.evaluator.evaluate_response(
-                query_str,
-                str(response),
-                [n.text for n in response.source_nodes]
+            result["evaluation"] = await self._aevaluate(
+                query_str, str(response), self._contexts(response)
             )
-            result["evaluation"] = {
-                "results": eval_results,
-                "score": score
-            }
 
         return result
 
+    def _stream_query(self, query_str: str, evaluate: bool) -> Iterator[Dict[str, Any]]:
+        cache = self._active_cache()
+        start = time.perf_counter()
+        if cache is not None:
+            cached = cache.get(query_str)
+            if cached is not None:
+                count("cache_hits")
+                yield {"type": "token", "delta": cached["answer"]}
+                yield {"type": "done", **cached, "timing": self._timing(start, time.perf_counter())}
+                return
+
+        response = self.orchestrator.stream_query(query_str)
+        tokens, first_token = [], None
+        for delta in response.response_gen:
+            if first_token is None:
+                first_token = time.perf_counter()
+            tokens.append(delta)
+            yield {"type": "token", "delta": delta}
+
+        answer = "".join(tokens)
+        result = {"answer": answer, "sources": self._extract_sources(response)}
+        if cache is not None:
+            cache.put(query_str, result)
+        result["timing"] = self._timing(start, first_token)
+        if evaluate:
+            result["evaluation"] = self._evaluate(query_str, answer, self._contexts(response))
+        yield {"type": "done", **result}
+
+    async def _astream_query(self, query_str: str, evaluate: bool) -> AsyncIterator[Dict[str, Any]]:
+        cache = self._active_cache()
+        start = time.perf_counter()
+        if cache is not None:
+            cached = await asyncio.to_thread(cache.get, query_str)
+            if cached is not None:
+                count("cache_hits")
+                yield {"type": "token", "delta": cached["answer"]}
+                yield {"type": "done", **cached, "timing": self._timing(start, time.perf_counter())}
+                return
+
+        response = await self.orchestrator.astream_query(query_str)
+        tokens, first_token = [], None
+        try:
+            async with aclosing(response.async_response_gen()) as deltas:
+                async for delta in deltas:
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                    tokens.append(delta)
+                    yield {"type": "token", "delta": delta}
+        finally:
+            # Releases a limited stream's LLM slot even if iteration never started
+            if hasattr(response, "aclose"):
+                await response.aclose()
+
+        answer = "".join(tokens)
+        result = {"answer": answer, "sources": self._extract_sources(response)}
+        if cache is not None:
+            await asyncio.to_thread(cache.put, query_str, result)
+        result["timing"] = self._timing(start, first_token)
+        if evaluate:
+            result["evaluation"] = await self._aevaluate(
+                query_str, answer, self._contexts(response)
+            )
+        yield {"type": "done", **result}
+
+    @staticmethod
+    def _timing(start: float, first_token: Optional[float]) -> Dict[str, Optional[float]]:
+        end = time.perf_counter()
+        return {
+            "ttft_ms": 1000 * (first_token - start) if first_token is not None else None,
+            "total_ms": 1000 * (end - start)
+        }
+
+    def _build_result(self, response) -> Dict[str, Any]:
+        return {
+            "answer": str(response),
+            "sources": self._extract_sources(response)
+        }
+
+    async def _aevaluate(self, query_str: str, answer: str, contexts: List[str]) -> Dict[str, Any]:
+        if self.eval_worker is not None:
+            return self._evaluate(query_str, answer, contexts)
+        return await asyncio.to_thread(self._evaluate, query_str, answer, contexts)
+
+    @staticmethod
+    def _contexts(response) -> List[str]:
+        return [n.text for n in getattr(response, "source_nodes", [])]
+
+    def _evaluate(self, query_str: str, answer: str, contexts: List[str]) -> Dict[str, Any]:
+        if self.eval_worker is not None:
+            return {"status": self.eval_worker.submit(query_str, answer, contexts, mode=self.mode)}
+        eval_results, score = self.evaluator.evaluate_response(query_str, answer, contexts)
+        return {
+            "results": eval_results,
+            "score": score
+        }
+
     def _extract_sources(self, response) -> List[Dict]:
         return [
             {
@@ -0,0 +1,157 @@
+import copy
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, Optional
+
+import numpy as np
+from llama_index.core.embeddings import BaseEmbedding
+
+
+# Numbers (years, amounts, quarters) and capitalised names: what near-duplicate
+# questions most often differ in while still embedding above the threshold
+_ENTITY_TOKENS = re.compile(r"\d+(?:[.,]\d+)*|\b[A-Z][\w&'-]*")
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().lower().rstrip("?!. ")
+
+
+def query_entities(query: str) -> FrozenSet[str]:
+    """Numbers and capitalised tokens of a query, ignoring the capital of its first word"""
+    text = query.strip()
+    return frozenset(
+        m.group(0).lower() for m in _ENTITY_TOKENS.finditer(text)
+        if m.start() > 0 or m.group(0)[0].isdigit()
+    )
+
+
+class _Entry:
+    __slots__ = ("result", "created", "embedding", "entities")
+
+    def __init__(self, result: Dict[str, Any], embedding: Optional[np.ndarray], entities: FrozenSet[str]):
+        self.result = result
+        self.created = time.monotonic()
+        self.embedding = embedding
+        self.entities = entities
+
+
+class QueryCache:
+    """Two-tier response cache: exact normalized query, then near-duplicate by embedding
+
+    The near-duplicate tier only runs when an embed_model is given. A hit
+    there also needs the same numbers and capitalised names as the cached
+    question, because "revenue in 2022" and "revenue in 2023" embed almost
+    identically. Entries expire after ttl seconds and the least recently
+    used entry is evicted beyond max_entries. When version_fn returns a new
+    value (the collection changed) the whole cache is dropped.
+    """
+
+    def __init__(
+            self,
+            embed_model: Optional[BaseEmbedding] = None,
+            ttl: float = 3600.0,
+            max_entries: int = 1024,
+            similarity_threshold: float = 0.98,
+            version_fn: Optional[Callable[[], Any]] = None
+    ):
+        self.embed_model = embed_model
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.version_fn = version_fn
+        self._version = version_fn() if version_fn else None
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(
+            ("exact_hits", "semantic_hits", "entity_mismatches", "misses", "evictions", "expirations",
+             "invalidations"), 0
+        )
+
+    def _check_version(self):
+        if self.version_fn is None:
+            return
+        version = self.version_fn()
+        if version != self._version:
+            self._version = version
+            if self._entries:
+                self._entries.clear()
+                self._counters["invalidations"] += 1
+
+    def _expired(self, entry: _Entry) -> bool:
+        return time.monotonic() - entry.created > self.ttl
+
+    def _embed(self, query: str) -> Optional[np.ndarray]:
+        # The raw query, so the retriever's own embedding of it is an embedding-cache hit
+        if self.embed_model is None:
+            return None
+        vector = np.asarray(self.embed_model.get_query_embedding(query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def get(self, query: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached result with a "cache" marker, or None"""
+        key = normalize_query(query)
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry):
+                    self._entries.move_to_end(key)
+                    self._counters["exact_hits"] += 1
+                    return {**copy.deepcopy(entry.result), "cache": "exact"}
+                del self._entries[key]
+                self._counters["expirations"] += 1
+            if self.embed_model is None or not self._entries:
+                self._counters["misses"] += 1
+                return None
+
+        embedding = self._embed(query)
+        entities = query_entities(query)
+        with self._lock:
+            for other_key in [k for k, e in self._entries.items() if self._expired(e)]:
+                del self._entries[other_key]
+                self._counters["expirations"] += 1
+            if self._entries:
+                keys = list(self._entries)
+                scores = np.stack([self._entries[k].embedding for k in keys]) @ embedding
+                close = scores >= self.similarity_threshold
+                same = np.array([self._entries[k].entities == entities for k in keys])
+                if close.any() and not (close & same).any():
+                    self._counters["entity_mismatches"] += 1
+                scores = np.where(same, scores, -np.inf)
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    self._entries.move_to_end(keys[best])
+                    self._counters["semantic_hits"] += 1
+                    result = copy.deepcopy(self._entries[keys[best]].result)
+                    return {**result, "cache": "semantic", "cache_similarity": float(scores[best])}
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, query: str, result: Dict[str, Any]):
+        key = normalize_query(query)
+        embedding = self._embed(query)
+        with self._lock:
+            self._entries[key] = _Entry(copy.deepcopy(result), embedding, query_entities(query))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._counters["invalidations"] += 1
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self._counters["exact_hits"] + self._counters["semantic_hits"]
+            total = hits + self._counters["misses"]
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "hit_rate": hits / total if total else 0.0,
+            }
@@ -0,0 +1,212 @@
+import asyncio
+import json
+import logging
+import time
+from contextlib import aclosing
+from typing import Any, Dict, Optional, Tuple
+
+from llama_index.core.vector_stores.types import MetadataFilters
+
+from config.settings import settings
+from config.telemetry import metrics
+from retrieval.filters import build_filters
+
+logger = logging.getLogger(__name__)
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+            500: "Internal Server Error", 503: "Service Unavailable"}
+_MAX_BODY = 1 << 20
+_PROMETHEUS = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class RAGServer:
+    """Minimal asyncio HTTP/1.1 server around one shared AdvancedRAGApplication
+
+    POST /query {"query": "...", "evaluate": false} answers a question; with
+    "stream": true the answer is sent as chunked NDJSON token events followed
+    by a final "done" event with sources and timing. An optional "filters"
+    object, e.g. {"source_file": ["deal_12.txt"], "ingested_after":
+    "2024-06-01"}, restricts retrieval to matching chunks. GET /health reports
+    readiness and cold-start timings, and GET /metrics exports Prometheus
+    text. In-flight queries are capped by max_concurrency; embedding, vector
+    store and LLM calls inside each query are further capped by
+    config.limits, so one process can serve many clients without overrunning
+    any downstream.
+    """
+
+    def __init__(self, app, host: str = "127.0.0.1", port: int = 8000, max_concurrency: int = 64):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.max_concurrency = max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._in_flight = 0
+        self._served = 0
+
+    async def serve_forever(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        logger.info(f"Serving on http://{self.host}:{self.port} (max {self.max_concurrency} concurrent queries)")
+        async with server:
+            await server.serve_forever()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                response = await self._dispatch(method, path, body, writer)
+                if response is not None:
+                    status, payload = response
+                    await self._write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except ValueError as e:
+            await self._write_response(writer, 400, {"error": str(e)}, keep_alive=False)
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        try:
+            method, path, _ = request_line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise ValueError("Malformed request line")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get("content-length", 0) or 0)
+        if length > _MAX_BODY:
+            raise ValueError("Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), path.split("?", 1)[0], headers, body
+
+    async def _dispatch(self, method: str, path: str, body: bytes,
+                        writer: asyncio.StreamWriter) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """Route a request; returns None when the response was already streamed to writer"""
+        if path == "/health" and method == "GET":
+            return 200, {"status": "ok", "in_flight": self._in_flight, "served": self._served,
+                         "startup": getattr(self.app, "startup", {})}
+        if path == "/metrics" and method == "GET":
+            await self._write_response(writer, 200, metrics.render_prometheus(), content_type=_PROMETHEUS)
+            return None
+        if path != "/query" or method != "POST":
+            return 404, {"error": f"No route for {method} {path}"}
+
+        try:
+            request = json.loads(body or b"{}")
+            query = request["query"]
+        except (ValueError, KeyError, TypeError):
+            return 400, {"error": 'Expected a JSON body like {"query": "..."}'}
+
+        try:
+            filters = build_filters(**(request.get("filters") or {}))
+        except (ValueError, TypeError) as e:
+            return 400, {"error": f"Invalid filters: {e}"}
+
+        evaluate = bool(request.get("evaluate", False))
+        if request.get("stream"):
+            await self._stream_query(writer, query, evaluate, filters)
+            return None
+
+        start = time.perf_counter()
+        async with self._semaphore:
+            self._in_flight += 1
+            try:
+                result = await self.app.aquery(query, evaluate=evaluate, filters=filters)
+            except Exception as e:
+                logger.exception(f"Query failed: {query!r}")
+                return 500, {"error": str(e)}
+            finally:
+                self._in_flight -= 1
+                self._served += 1
+        result["latency_ms"] = 1000 * (time.perf_counter() - start)
+        return 200, result
+
+    async def _stream_query(self, writer: asyncio.StreamWriter, query: str, evaluate: bool,
+                            filters: Optional[MetadataFilters] = None):
+        head = (
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Type: application/x-ndjson\r\n"
+            "Transfer-Encoding: chunked\r\n"
+            "Connection: keep-alive\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1"))
+        async with self._semaphore:
+            self._in_flight += 1
+            try:
+                # A failed write (client gone) closes the stream now instead of at garbage collection
+                async with aclosing(self.app.astream_query(query, evaluate=evaluate, filters=filters)) as events:
+                    async for event in events:
+                        await self._write_chunk(writer, event)
+            except Exception as e:
+                # Headers are already out; report the failure as the last event
+                logger.exception(f"Streaming query failed: {query!r}")
+                await self._write_chunk(writer, {"type": "error", "error": str(e)})
+            finally:
+                self._in_flight -= 1
+                self._served += 1
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    async def _write_chunk(writer: asyncio.StreamWriter, event: Dict[str, Any]):
+        line = json.dumps(event, default=str).encode("utf-8") + b"\n"
+        writer.write(f"{len(line):x}\r\n".encode("latin-1") + line + b"\r\n")
+        await writer.drain()
+
+    @staticmethod
+    async def _write_response(writer: asyncio.StreamWriter, status: int, payload: Any,
+                              keep_alive: bool = True, content_type: str = "application/json"):
+        if isinstance(payload, str):
+            body = payload.encode("utf-8")
+        else:
+            body = json.dumps(payload, default=str).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+def main():
+    import argparse
+    from main import initialize_system
+
+    parser = argparse.ArgumentParser(description="Serve RAG queries over HTTP")
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument("--max-concurrency", type=int, default=settings.SERVER_MAX_CONCURRENCY)
+    parser.add_argument("--serve-only", action="store_true", default=settings.SERVE_ONLY,
+                        help="Attach to the existing collection and skip ingest")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    # One application, and with it one set of model and vector store clients, for every request
+    app = initialize_system(serve_only=args.serve_only)
+    server = RAGServer(app, host=args.host, port=args.port, max_concurrency=args.max_concurrency)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
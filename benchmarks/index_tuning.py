@@ -0,0 +1,265 @@
+"""Recall@k against search latency and index memory for Milvus index configurations
+
+    python -m benchmarks.index_tuning --sample 20000 --queries 200 --k 10 \
+        --config HNSW:ef=32 --config HNSW:ef=128 --config IVF_SQ8:nprobe=32:rescore=4
+
+Vectors are read from the serving collection. A held-out slice of them
+serves as the queries and is left out of the indexed set. Ground truth is
+the exact top-k by brute force in NumPy. Every configuration is built in a
+scratch collection, so the serving index is left alone unless --apply
+rebuilds it with the best configuration that reaches --target-recall.
+
+A config is TYPE[:key=value...]. Keys that are search parameters of the
+type (ef, nprobe) apply at search time, rescore=N turns on exact rescore of
+N * k candidates, and everything else is a build parameter.
+"""
+import argparse
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from pymilvus import Collection, DataType, MilvusClient, utility
+
+from benchmarks.suite import percentiles
+from config.settings import settings
+from storage.milvus_store import (
+    INDEX_DEFAULTS,
+    QUANTIZED_INDEXES,
+    IndexConfig,
+    MilvusStorage,
+    index_config,
+    search_vectors,
+)
+
+DEFAULT_CONFIGS = [
+    "FLAT",
+    "HNSW:ef=32",
+    "HNSW:ef=64",
+    "HNSW:ef=128",
+    "IVF_FLAT:nprobe=16",
+    "IVF_SQ8:nprobe=16",
+    "IVF_SQ8:nprobe=16:rescore=4",
+    "IVF_PQ:nprobe=32:rescore=4",
+]
+
+
+def parse_config(spec: str, dim: int) -> IndexConfig:
+    index_type, *pairs = spec.split(":")
+    _, search_keys = INDEX_DEFAULTS.get(index_type.upper(), ({}, {}))
+    build, search, rescore = {}, {}, 0
+    for pair in pairs:
+        key, _, raw = pair.partition("=")
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            value = raw
+        if key == "rescore":
+            rescore = int(value)
+        elif key in search_keys:
+            search[key] = value
+        else:
+            build[key] = value
+    return index_config(index_type, build_params=build, search_params=search, rescore=rescore, dim=dim)
+
+
+def load_vectors(limit: int, batch_size: int = 1000) -> np.ndarray:
+    """Up to limit embeddings from the serving collection"""
+    col = Collection(settings.MILVUS_COLLECTION)
+    iterator = col.query_iterator(batch_size=batch_size, limit=limit, output_fields=["embedding"])
+    vectors = []
+    while True:
+        rows = iterator.next()
+        if not rows:
+            break
+        vectors.extend(row["embedding"] for row in rows)
+    iterator.close()
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int, metric_type: str, chunk: int = 256) -> np.ndarray:
+    """Row i holds the corpus positions of the true top-k for query i"""
+    if metric_type == "COSINE":
+        corpus = corpus / (np.linalg.norm(corpus, axis=1, keepdims=True) + 1e-12)
+        queries = queries / (np.linalg.norm(queries, axis=1, keepdims=True) + 1e-12)
+    truth = []
+    for start in range(0, len(queries), chunk):
+        q = queries[start:start + chunk]
+        if metric_type == "L2":
+            scores = -((q ** 2).sum(axis=1)[:, None] - 2 * q @ corpus.T + (corpus ** 2).sum(axis=1)[None, :])
+        else:
+            scores = q @ corpus.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+        truth.append(np.take_along_axis(top, order, axis=1))
+    return np.concatenate(truth)
+
+
+def estimate_index_bytes(config: IndexConfig, n: int, dim: int) -> int:
+    """Rough resident size of the index; used when Milvus does not report segment memory"""
+    params = config.build_params
+    if config.index_type in ("IVF_SQ8", "HNSW_SQ"):
+        codes = n * dim
+    elif config.index_type in ("IVF_PQ", "HNSW_PQ"):
+        codes = n * params.get("m", dim // 8) * params.get("nbits", 8) // 8
+    else:
+        codes = n * dim * 4
+    if config.index_type.startswith("HNSW"):
+        codes += n * params.get("M", 16) * 2 * 4  # layer-0 links dominate the graph
+    if config.index_type.startswith("IVF"):
+        codes += params.get("nlist", 1024) * dim * 4
+    return codes
+
+
+class ScratchCollection:
+    """Throwaway collection holding the sampled vectors, re-indexed once per configuration"""
+
+    def __init__(self, client: MilvusClient, name: str, vectors: np.ndarray):
+        self.client = client
+        self.name = name
+        if client.has_collection(name):
+            client.drop_collection(name)
+        schema = client.create_schema(auto_id=False)
+        schema.add_field("id", DataType.INT64, is_primary=True)
+        schema.add_field("embedding", DataType.FLOAT_VECTOR, dim=vectors.shape[1])
+        client.create_collection(name, schema=schema)
+        for start in range(0, len(vectors), settings.MILVUS_WRITE_BATCH_SIZE):
+            batch = vectors[start:start + settings.MILVUS_WRITE_BATCH_SIZE]
+            client.insert(name, [{"id": start + i, "embedding": v.tolist()} for i, v in enumerate(batch)])
+        client.flush(name)
+        self._indexed = False
+
+    def build(self, config: IndexConfig) -> float:
+        start = time.perf_counter()
+        if self._indexed:
+            self.client.release_collection(self.name)
+            self.client.drop_index(self.name, index_name="embedding")
+        index_params = self.client.prepare_index_params()
+        index_params.add_index(
+            field_name="embedding",
+            index_name="embedding",
+            index_type=config.index_type,
+            metric_type=config.metric_type,
+            params=config.build_params
+        )
+        self.client.create_index(self.name, index_params)
+        self.client.load_collection(self.name)
+        self._indexed = True
+        return time.perf_counter() - start
+
+    def memory_bytes(self) -> Optional[int]:
+        try:
+            return sum(int(s.mem_size) for s in utility.get_query_segment_info(self.name))
+        except Exception:
+            return None
+
+    def drop(self):
+        self.client.drop_collection(self.name)
+
+
+def evaluate(scratch: ScratchCollection, config: IndexConfig, queries: np.ndarray,
+             truth: np.ndarray, k: int, n: int) -> Dict[str, Any]:
+    build_seconds = scratch.build(config)
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        hits = search_vectors(scratch.client, scratch.name, [query.tolist()], k, config)[0]
+        latencies.append(time.perf_counter() - start)
+        recalls.append(len({int(hit["id"]) for hit in hits} & set(expected.tolist())) / k)
+
+    measured = scratch.memory_bytes()
+    memory = measured or estimate_index_bytes(config, n, queries.shape[1])
+    return {
+        "config": config.label,
+        "index_type": config.index_type,
+        "build_params": config.build_params,
+        "search_params": config.search_params,
+        "rescore": config.rescore,
+        f"recall@{k}": round(float(np.mean(recalls)), 4),
+        "build_seconds": round(build_seconds, 2),
+        **percentiles(latencies),
+        "memory_mb": round(memory / 2 ** 20, 1),
+        "memory_source": "segments" if measured else "estimate",
+    }
+
+
+def run(args) -> List[Dict[str, Any]]:
+    storage = MilvusStorage()  # connects and verifies the serving collection
+    vectors = load_vectors(args.sample + args.queries)
+    if len(vectors) <= args.queries:
+        raise SystemExit(f"Need more than {args.queries} vectors in '{settings.MILVUS_COLLECTION}'")
+    rng = np.random.default_rng(args.seed)
+    order = rng.permutation(len(vectors))
+    queries, corpus = vectors[order[:args.queries]], vectors[order[args.queries:]]
+    truth = exact_top_k(corpus, queries, args.k, settings.MILVUS_METRIC_TYPE)
+    logging.info(f"Tuning on {len(corpus)} vectors with {len(queries)} held-out queries")
+
+    client = storage.get_vector_store().client
+    scratch = ScratchCollection(client, f"{settings.MILVUS_COLLECTION}_tuning", corpus)
+    results = []
+    try:
+        for spec in args.config or DEFAULT_CONFIGS:
+            config = parse_config(spec, corpus.shape[1])
+            try:
+                results.append(evaluate(scratch, config, queries, truth, args.k, len(corpus)))
+            except Exception as e:
+                # Not every index type is available on every deployment (e.g. Milvus Lite)
+                results.append({"config": config.label, "error": str(e)})
+            logging.info(f"{config.label}: {results[-1]}")
+    finally:
+        scratch.drop()
+    return results
+
+
+def best(results: List[Dict[str, Any]], k: int, target_recall: float) -> Optional[Dict[str, Any]]:
+    """Fastest configuration (p95) reaching the recall target, smaller memory breaking ties"""
+    eligible = [r for r in results if r.get(f"recall@{k}", 0) >= target_recall]
+    return min(eligible, key=lambda r: (r["p95_ms"], r["memory_mb"])) if eligible else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--config", action="append", help="TYPE[:key=value...]; repeatable")
+    parser.add_argument("--sample", type=int, default=20000, help="Vectors to index")
+    parser.add_argument("--queries", type=int, default=200, help="Held-out query vectors")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--apply", action="store_true",
+                        help="Rebuild the serving index with the best configuration")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    results = run(args)
+    recall_key = f"recall@{args.k}"
+    print(f"{'config':<48} {recall_key:>10} {'p50 ms':>8} {'p95 ms':>8} {'memory MB':>10}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['config']:<48} error: {r['error']}")
+            continue
+        print(f"{r['config']:<48} {r[recall_key]:>10.4f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} "
+              f"{r['memory_mb']:>10.1f}{'*' if r['memory_source'] == 'estimate' else ''}")
+    print("* estimated from the index layout")
+
+    choice = best(results, args.k, args.target_recall)
+    if choice is None:
+        print(f"\nNo configuration reached {recall_key} >= {args.target_recall}")
+    else:
+        print(f"\nBest at {recall_key} >= {args.target_recall}: {choice['config']}")
+        print(f"  MILVUS_INDEX_TYPE={choice['index_type']}")
+        print(f"  MILVUS_INDEX_PARAMS='{json.dumps(choice['build_params'])}'")
+        print(f"  MILVUS_SEARCH_PARAMS='{json.dumps(choice['search_params'])}'")
+        print(f"  MILVUS_RESCORE_MULTIPLIER={choice['rescore']}")
+        if choice["index_type"] in QUANTIZED_INDEXES and not choice["rescore"]:
+            print("  (quantized without rescore; consider rescore=4 if recall drifts on the full corpus)")
+        if args.apply:
+            MilvusStorage().rebuild_index(
+                index_config(choice["index_type"], choice["build_params"], choice["search_params"],
+                             rescore=choice["rescore"])
+            )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
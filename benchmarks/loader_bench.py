@@ -0,0 +1,49 @@
+"""Files/sec of document parsing against process-pool size
+
+    python -m benchmarks.loader_bench --input-dir data --workers 1 2 4 8
+"""
+import argparse
+import json
+import os
+import time
+
+from llama_index.core import SimpleDirectoryReader
+
+from data_pipeline.loader import AdvancedDocumentLoader
+from data_pipeline.parallel_loader import ParallelDocumentReader
+
+
+def run(input_dir: str, workers, repeat: int = 1):
+    reader = SimpleDirectoryReader(input_dir, required_exts=AdvancedDocumentLoader.required_exts)
+    paths = [str(p) for p in reader.input_files] * repeat
+    results = []
+    for num_workers in workers:
+        start = time.perf_counter()
+        if num_workers == 1:
+            failed = 0
+            for path in paths:
+                SimpleDirectoryReader(input_files=[path]).load_data()
+        else:
+            # Includes pool start-up, which is what a real ingest run pays too
+            loaded = ParallelDocumentReader(num_workers=num_workers).load(paths)
+            failed = sum(not r.ok for r in loaded)
+        elapsed = time.perf_counter() - start
+        results.append({
+            "workers": num_workers,
+            "files": len(paths),
+            "failed": failed,
+            "seconds": round(elapsed, 3),
+            "files_per_sec": round(len(paths) / elapsed, 2) if elapsed > 0 else None,
+        })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--input-dir", default="data")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--repeat", type=int, default=1, help="Parse the file list this many times")
+    args = parser.parse_args()
+
+    for row in run(args.input_dir, args.workers, args.repeat):
+        print(json.dumps(row))
@@ -0,0 +1,257 @@
+"""Offline benchmark of the ingest and query hot paths with fake models
+
+    python -m benchmarks.suite --files 50 --backend local --output bench.json
+
+Embeddings and LLM calls come from testing.fake_models with configurable
+latency, the corpus is generated from data/boston.txt, and vectors go to the
+local store or Milvus Lite, so no network service is needed. The report is one
+JSON document (stage timings, throughput and latency percentiles) meant to be
+diffed across versions.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import re
+import subprocess
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from config.settings import settings
+
+
+def synthesize_corpus(source: str, out_dir: str, files: int, lines_per_file: int = 0, seed: int = 0) -> List[str]:
+    """Write files made of source lines sampled with replacement and with perturbed figures
+
+    Every file draws its own deterministic variant, so chunks differ across
+    files (no accidental dedup) while keeping the source's vocabulary.
+    """
+    with open(source, "r", encoding="utf-8") as f:
+        lines = [line.strip() for line in f if line.strip()]
+    lines_per_file = lines_per_file or len(lines)
+    os.makedirs(out_dir, exist_ok=True)
+
+    rng = random.Random(seed)
+    paths = []
+    for i in range(files):
+        body = [rng.choice(lines) for _ in range(lines_per_file)]
+        text = f"Deal notes {i}\n" + "\n".join(body)
+        text = re.sub(r"\d+", lambda m: str(rng.randint(1, 10 ** len(m.group()))), text)
+        path = os.path.join(out_dir, f"deal_{i:05d}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        paths.append(path)
+    return paths
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    values = np.asarray(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "mean_ms": round(float(values.mean()), 3),
+    }
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def configure(work_dir: str, backend: str, args) -> None:
+    """Point settings at fake models and throwaway stores under work_dir"""
+    settings.EMBEDDING_PROVIDER = "fake"
+    settings.LLM_PROVIDER = "fake"
+    settings.FAKE_EMBED_LATENCY = args.embed_latency
+    settings.FAKE_LLM_LATENCY = args.llm_latency
+    settings.FAKE_LLM_TOKEN_LATENCY = args.llm_token_latency
+    settings.EMBED_CACHE_ENABLED = False
+    settings.QUERY_CACHE_ENABLED = False
+    settings.VECTOR_STORE_BACKEND = backend
+    settings.LOCAL_STORE_PATH = os.path.join(work_dir, "vector_store")
+    settings.MILVUS_URI = os.path.join(work_dir, "milvus_bench.db")
+    settings.BM25_INDEX_PATH = os.path.join(work_dir, "bm25.sqlite")
+    settings.INGEST_MANIFEST_PATH = os.path.join(work_dir, "manifest.json")
+
+
+def run(args) -> Dict[str, Any]:
+    from data_pipeline.loader import AdvancedDocumentLoader
+    from data_pipeline.processor import DocumentProcessor
+    from retrieval.bm25_index import BM25Index
+    from retrieval.compressor import split_sentences
+    from retrieval.reranker import AdvancedReranker
+    from retrieval.retriever import AdvancedRetriever
+    from orchestrator.query_engine import AdvancedQueryEngine
+    from app.application import AdvancedRAGApplication
+    from storage import initialize_storage
+
+    work_dir = tempfile.mkdtemp(prefix="rag_bench_")
+    configure(work_dir, args.backend, args)
+    report: Dict[str, Any] = {
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "params": vars(args),
+        "stages": {},
+    }
+    stages = report["stages"]
+
+    corpus_dir = os.path.join(work_dir, "corpus")
+    paths, seconds = _timed(synthesize_corpus, args.source, corpus_dir, args.files, args.lines_per_file, args.seed)
+    corpus_bytes = sum(os.path.getsize(p) for p in paths)
+    stages["corpus"] = {"files": len(paths), "bytes": corpus_bytes, "seconds": round(seconds, 3)}
+
+    # Chunking
+    loader = AdvancedDocumentLoader(corpus_dir, chunking_mode=args.chunking_mode, num_workers=1)
+    nodes, seconds = _timed(loader.load_and_chunk)
+    stages["chunking"] = {
+        "mode": args.chunking_mode,
+        "chunks": len(nodes),
+        "seconds": round(seconds, 3),
+        "mb_per_sec": round(corpus_bytes / 1e6 / seconds, 3) if seconds else None,
+        "chunks_per_sec": round(len(nodes) / seconds, 1) if seconds else None,
+    }
+
+    # Embedding
+    processor = DocumentProcessor(settings.embed_model)
+    nodes, seconds = _timed(processor.process_nodes, nodes)
+    stages["embedding"] = {
+        "chunks": len(nodes),
+        "seconds": round(seconds, 3),
+        "chunks_per_sec": round(len(nodes) / seconds, 1) if seconds else None,
+        **{k: v for k, v in processor.scheduler.last_stats.items() if k in ("batches", "retries")},
+    }
+
+    # Insert, including the final flush/persist
+    storage = initialize_storage()
+    lexical_index = BM25Index(settings.bm25_index_path)
+    start = time.perf_counter()
+    for i in range(0, len(nodes), args.insert_batch):
+        storage.store_nodes(nodes[i:i + args.insert_batch])
+    storage.finalize()
+    insert_seconds = time.perf_counter() - start
+    _, bm25_seconds = _timed(lexical_index.add, nodes)
+    stages["insert"] = {
+        "backend": args.backend,
+        "rows": len(nodes),
+        "seconds": round(insert_seconds, 3),
+        "rows_per_sec": round(len(nodes) / insert_seconds, 1) if insert_seconds else None,
+        "bm25_seconds": round(bm25_seconds, 3),
+    }
+
+    rng = random.Random(args.seed)
+    sample = rng.sample(nodes, min(args.queries, len(nodes)))
+    queries = [split_sentences(n.get_content())[0] for n in sample]
+
+    # Retrieval latency, dense and hybrid
+    vector_store = storage.get_vector_store()
+    for label, index in (("dense", None), ("hybrid", lexical_index)):
+        retriever = AdvancedRetriever(vector_store, lexical_index=index)
+        latencies = [_timed(retriever.retrieve, q, args.top_k)[1] for q in queries]
+        stages[f"retrieval_{label}"] = {"queries": len(queries), "top_k": args.top_k, **percentiles(latencies)}
+
+    # Rerank, compression and synthesis overhead on hybrid candidates
+    retriever = AdvancedRetriever(vector_store, lexical_index=lexical_index)
+    engine = AdvancedQueryEngine(retriever, AdvancedReranker(top_n=args.top_k))
+    rerank, compress, synth = [], [], []
+    for q in queries:
+        candidates = retriever.retrieve(q, args.top_k * settings.HYBRID_CANDIDATE_MULTIPLIER)
+        ranked, seconds = _timed(engine.reranker.rerank, q, candidates)
+        rerank.append(seconds)
+        context = ranked
+        if engine.compressor is not None:
+            context, seconds = _timed(engine.compressor.postprocess_nodes, ranked, query_str=q)
+            compress.append(seconds)
+        synth.append(_timed(engine.synthesizer.synthesize, q, context)[1])
+    stages["rerank"] = {"mode": engine.reranker.mode, **percentiles(rerank)}
+    if engine.reranker.stats:
+        stages["rerank"]["escalation_rate"] = round(engine.reranker.stats["escalation_rate"], 3)
+    if compress:
+        stats = engine.compressor.stats
+        stages["compression"] = {
+            **percentiles(compress),
+            "avg_tokens_before": round(stats["avg_tokens_before"], 1),
+            "avg_tokens_after": round(stats["avg_tokens_after"], 1),
+        }
+    stages["synthesis"] = percentiles(synth)
+
+    # End-to-end QPS through the async serving path
+    app = AdvancedRAGApplication(engine, mode="query")
+    stages["end_to_end"] = asyncio.run(_load_test(app, queries, args.concurrency, args.requests))
+
+    from config.telemetry import metrics
+    report["metrics"] = metrics.snapshot()
+    return report
+
+
+async def _load_test(app, queries: List[str], levels: List[int], requests: int) -> List[Dict[str, Any]]:
+    # All levels share one event loop, as the downstream limits' semaphores do
+    results = []
+    for concurrency in levels:
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies: List[float] = []
+
+        async def one(query: str):
+            async with semaphore:
+                start = time.perf_counter()
+                await app.aquery(query)
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(queries[i % len(queries)]) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+        results.append({
+            "concurrency": concurrency,
+            "requests": requests,
+            "seconds": round(elapsed, 3),
+            "qps": round(requests / elapsed, 2) if elapsed else None,
+            **percentiles(latencies),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", default="data/boston.txt")
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--lines-per-file", type=int, default=0, help="0 keeps the source length")
+    parser.add_argument("--backend", choices=["local", "milvus"], default="local")
+    parser.add_argument("--chunking-mode", default="sentence")
+    parser.add_argument("--insert-batch", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=100, help="Requests per concurrency level")
+    parser.add_argument("--embed-latency", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    parser.add_argument("--llm-token-latency", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    report = run(args)
+    text = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
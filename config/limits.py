@@ -0,0 +1,38 @@
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+from typing import Dict
+
+from config.settings import settings
+
+
+class DownstreamLimits:
+    """Per-downstream concurrency caps shared by every request in the process
+
+    An asyncio.Semaphore is bound to the first event loop that waits on it,
+    so each running loop gets its own set, created lazily. The same object
+    can be imported at module level and used from successive asyncio.run()
+    calls. The caps apply per loop, which in the server is per process.
+    """
+
+    def __init__(self, **limits: int):
+        self._limits = limits
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    @asynccontextmanager
+    async def __call__(self, name: str):
+        semaphores = self._semaphores.setdefault(asyncio.get_running_loop(), {})
+        semaphore = semaphores.get(name)
+        if semaphore is None:
+            semaphore = semaphores[name] = asyncio.Semaphore(self._limits[name])
+        async with semaphore:
+            yield
+
+
+limits = DownstreamLimits(
+    embedding=settings.LIMIT_EMBEDDING,
+    vector_store=settings.LIMIT_VECTOR_STORE,
+    llm=settings.LIMIT_LLM,
+)
@@ -1,14 +1,23 @@
 import os
-from llama_index.embeddings.openai import OpenAIEmbedding
-from llama_index.llms.openai import OpenAI
-from llama_index.core.constants import DEFAULT_EMBEDDING_DIM
+import threading
 
 class Settings:
+    # Model providers: "openai", or "fake" for deterministic local models (tests, benchmarks)
+    EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")
+    LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
+    FAKE_EMBED_LATENCY = float(os.getenv("FAKE_EMBED_LATENCY", "0.0"))
+    FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0.0"))
+    FAKE_LLM_TOKEN_LATENCY = float(os.getenv("FAKE_LLM_TOKEN_LATENCY", "0.0"))
+
     # OpenAI
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
     EMBEDDING_MODEL = "text-embedding-ada-002"
     LLM_MODEL = "gpt-3.5-turbo"
 
+    # Vector store backend: "milvus" or "local" (in-process NumPy store, no server)
+    VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "milvus")
+    LOCAL_STORE_PATH = os.getenv("LOCAL_STORE_PATH", ".vector_store")
+
     # Milvus
     MILVUS_HOST = os.getenv("MILVUS_HOST", "localhost")
     MILVUS_PORT = os.getenv("MILVUS_PORT", "19530")
@@ -16,26 +25,202 @@ class Settings:
     MILVUS_PASSWORD = os.getenv("MILVUS_USER", "Milvus")
     MILVUS_DATABASE = os.getenv("MILVUS_DATABASE", "default")
     MILVUS_COLLECTION = "advanced_rag_test"
+    # Set to a local file such as "./milvus_llamaindex.db" to use Milvus Lite
+    MILVUS_URI = os.getenv("MILVUS_URI", "")
+    MILVUS_WRITE_BATCH_SIZE = int(os.getenv("MILVUS_WRITE_BATCH_SIZE", "1000"))
     EMBEDDING_DIM = 1536  # 1536 for ada-002
+    # Vector index: HNSW, IVF_FLAT, IVF_SQ8, IVF_PQ, HNSW_SQ, HNSW_PQ or FLAT. Params are JSON objects
+    # merged over the defaults for the index type (storage.milvus_store.INDEX_DEFAULTS);
+    # benchmarks.index_tuning measures recall, latency and memory per choice
+    MILVUS_INDEX_TYPE = os.getenv("MILVUS_INDEX_TYPE", "HNSW")
+    MILVUS_METRIC_TYPE = os.getenv("MILVUS_METRIC_TYPE", "IP")
+    MILVUS_INDEX_PARAMS = os.getenv("MILVUS_INDEX_PARAMS", "")  # e.g. {"M": 16, "efConstruction": 200}
+    MILVUS_SEARCH_PARAMS = os.getenv("MILVUS_SEARCH_PARAMS", "")  # e.g. {"ef": 64}
+    # Partition key for filtered retrieval ("" = none); scalar indexes cover the other filter fields
+    MILVUS_PARTITION_KEY = os.getenv("MILVUS_PARTITION_KEY", "document_id")
+    MILVUS_NUM_PARTITIONS = int(os.getenv("MILVUS_NUM_PARTITIONS", "64"))
+    # Exact rescore for quantized indexes: top_k * N candidates re-ranked on the stored float vectors; 0 = off
+    MILVUS_RESCORE_MULTIPLIER = int(os.getenv("MILVUS_RESCORE_MULTIPLIER", "0"))
+
+    # Hybrid retrieval: local BM25 index fused with dense results
+    HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+    HYBRID_FUSION = os.getenv("HYBRID_FUSION", "rrf")  # "rrf" or "weighted"
+    HYBRID_ALPHA = float(os.getenv("HYBRID_ALPHA", "0.5"))
+    HYBRID_CANDIDATE_MULTIPLIER = int(os.getenv("HYBRID_CANDIDATE_MULTIPLIER", "4"))
+    # Filtered queries restrict BM25 to the matching chunk ids when there are at most this many
+    HYBRID_FILTER_MAX_IDS = int(os.getenv("HYBRID_FILTER_MAX_IDS", "16000"))
+    BM25_INDEX_PATH = os.getenv("BM25_INDEX_PATH", "")
+
+    # Reranking: "tiered" (embedding pass, LLM only when unsure) or "llm" (always LLMRerank)
+    RERANK_MODE = os.getenv("RERANK_MODE", "tiered")
+    # Cosine lead tier 1 needs (top candidate and top_n cut) to skip the LLM reranker
+    RERANK_SCORE_GAP = float(os.getenv("RERANK_SCORE_GAP", "0.02"))
+    RERANK_USE_MMR = os.getenv("RERANK_USE_MMR", "true").lower() == "true"
+    RERANK_LLM_CANDIDATES = int(os.getenv("RERANK_LLM_CANDIDATES", "10"))
+    RERANK_LLM_BATCH_SIZE = int(os.getenv("RERANK_LLM_BATCH_SIZE", "5"))
+    RERANK_LLM_CONCURRENCY = int(os.getenv("RERANK_LLM_CONCURRENCY", "4"))
+
+    # Query result cache
+    QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE_ENABLED", "true").lower() == "true"
+    QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+    QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "1024"))
+    # Near-duplicate hits by embedding are opt-in; exact repeats are always served
+    QUERY_CACHE_SEMANTIC = os.getenv("QUERY_CACHE_SEMANTIC", "false").lower() == "true"
+    QUERY_CACHE_SIMILARITY = float(os.getenv("QUERY_CACHE_SIMILARITY", "0.98"))
+
+    # Agent mode: simple questions skip the ReAct loop; repeated tool calls in a session hit a memo
+    AGENT_ROUTER_ENABLED = os.getenv("AGENT_ROUTER_ENABLED", "true").lower() == "true"
+    AGENT_ROUTER_MAX_SIMPLE_WORDS = int(os.getenv("AGENT_ROUTER_MAX_SIMPLE_WORDS", "15"))
+    AGENT_ROUTER_MARGIN = float(os.getenv("AGENT_ROUTER_MARGIN", "0.02"))
+    AGENT_TOOL_MEMO_ENABLED = os.getenv("AGENT_TOOL_MEMO_ENABLED", "true").lower() == "true"
+    AGENT_TOOL_MEMO_SIMILARITY = float(os.getenv("AGENT_TOOL_MEMO_SIMILARITY", "0.97"))
+    AGENT_TOOL_MEMO_TTL = float(os.getenv("AGENT_TOOL_MEMO_TTL", "1800"))
+    AGENT_TOOL_MEMO_MAX_ENTRIES = int(os.getenv("AGENT_TOOL_MEMO_MAX_ENTRIES", "256"))
+
+    # Context compression between reranking and synthesis
+    CONTEXT_COMPRESSION = os.getenv("CONTEXT_COMPRESSION", "true").lower() == "true"
+    CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+    CONTEXT_MIN_RELATIVE_SCORE = float(os.getenv("CONTEXT_MIN_RELATIVE_SCORE", "0.25"))
+
+    # Query coalescing: concurrent dense lookups share one embedding call and one vector search
+    QUERY_COALESCE_ENABLED = os.getenv("QUERY_COALESCE_ENABLED", "false").lower() == "true"
+    QUERY_COALESCE_MAX_WAIT_MS = float(os.getenv("QUERY_COALESCE_MAX_WAIT_MS", "5"))
+    QUERY_COALESCE_MAX_BATCH = int(os.getenv("QUERY_COALESCE_MAX_BATCH", "32"))
+    QUERY_COALESCE_CONCURRENCY = int(os.getenv("QUERY_COALESCE_CONCURRENCY", "4"))
+
+    # Evaluation: sampled and batched on a background worker instead of inline
+    EVAL_BACKGROUND = os.getenv("EVAL_BACKGROUND", "true").lower() == "true"
+    EVAL_SAMPLE_RATE = float(os.getenv("EVAL_SAMPLE_RATE", "0.2"))
+    EVAL_QUEUE_SIZE = int(os.getenv("EVAL_QUEUE_SIZE", "256"))
+    EVAL_BATCH_SIZE = int(os.getenv("EVAL_BATCH_SIZE", "8"))
+    EVAL_MAX_WAIT = float(os.getenv("EVAL_MAX_WAIT", "2.0"))
+    EVAL_SINK_PATH = os.getenv("EVAL_SINK_PATH", "eval_results.jsonl")  # *.parquet for Parquet parts
+    EVAL_ROLLING_WINDOW = int(os.getenv("EVAL_ROLLING_WINDOW", "100"))
+
+    # Per-stage spans, LLM token counts and latency histograms (Prometheus at GET /metrics)
+    TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "true").lower() == "true"
+
+    # Stream answer tokens to the CLI as they are generated
+    STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "true").lower() == "true"
+
+    # Startup: attach to the existing collection and indexes without scanning or ingesting the corpus
+    SERVE_ONLY = os.getenv("SERVE_ONLY", "false").lower() == "true"
+
+    # Serving: concurrent requests and per-downstream in-flight caps
+    SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+    SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+    SERVER_MAX_CONCURRENCY = int(os.getenv("SERVER_MAX_CONCURRENCY", "64"))
+    LIMIT_EMBEDDING = int(os.getenv("LIMIT_EMBEDDING", "16"))
+    LIMIT_VECTOR_STORE = int(os.getenv("LIMIT_VECTOR_STORE", "32"))
+    LIMIT_LLM = int(os.getenv("LIMIT_LLM", "8"))
 
     # Data Processing
     CHUNK_SIZE = 1024
     CHUNK_OVERLAP = 200
+    # "semantic", "semantic_pooled" (reuse sentence vectors) or "sentence" (fixed-token)
+    CHUNKING_MODE = os.getenv("CHUNKING_MODE", "semantic")
+
+    # Embedding cache
+    EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "true").lower() == "true"
+    EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", ".embedding_cache.sqlite")
+    EMBED_CACHE_MEMORY_ITEMS = int(os.getenv("EMBED_CACHE_MEMORY_ITEMS", "10000"))
+
+    # Ingestion
+    # Parser processes for PDF/DOCX/PPTX extraction: 1 = in-process, 0 = one per core
+    LOADER_WORKERS = int(os.getenv("LOADER_WORKERS", "1"))
+    LOADER_FILE_TIMEOUT = float(os.getenv("LOADER_FILE_TIMEOUT", "120"))
+    EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+    EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "30000"))
+    EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+    # Bounded queues between the chunk, embed and insert stages
+    INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "4"))
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+    INGEST_MANIFEST_PATH = os.getenv("INGEST_MANIFEST_PATH", "")
+
+    @property
+    def milvus_uri(self):
+        return self.MILVUS_URI or f"http://{self.MILVUS_HOST}:{self.MILVUS_PORT}"
+
+    @property
+    def milvus_is_lite(self):
+        return self.milvus_uri.endswith(".db")
+
+    @property
+    def ingest_manifest_path(self):
+        # One manifest per backend, so switching backends re-ingests into the new one
+        return self.INGEST_MANIFEST_PATH or f".ingest_manifest.{self.VECTOR_STORE_BACKEND}.json"
+
+    @property
+    def bm25_index_path(self):
+        return self.BM25_INDEX_PATH or f".bm25_index.{self.VECTOR_STORE_BACKEND}.sqlite"
+
+    @property
+    def callback_manager(self):
+        from config.telemetry import callback_manager
+        return callback_manager
+
+    # Model clients shared process-wide, keyed on the settings they were built from
+    _clients = {}
+    _clients_lock = threading.RLock()
+
+    def _shared(self, key, factory):
+        with self._clients_lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._clients[key] = factory()
+            return client
 
     @property
     def embed_model(self):
-        return OpenAIEmbedding(
-            model=self.EMBEDDING_MODEL,
-            api_key=self.OPENAI_API_KEY
-        )
+        """One embedding client (and HTTP connection pool) for every component, created on first use"""
+        key = ("embed", self.EMBEDDING_PROVIDER, self.EMBEDDING_MODEL, self.EMBEDDING_DIM,
+               self.FAKE_EMBED_LATENCY, self.EMBED_CACHE_ENABLED, self.EMBED_CACHE_PATH)
+        return self._shared(key, self._build_embed_model)
 
     @property
     def llm(self):
+        """One LLM client (and HTTP connection pool) for every component, created on first use"""
+        key = ("llm", self.LLM_PROVIDER, self.LLM_MODEL, self.FAKE_LLM_LATENCY, self.FAKE_LLM_TOKEN_LATENCY)
+        return self._shared(key, self._build_llm)
+
+    def _build_embed_model(self):
+        if self.EMBEDDING_PROVIDER == "fake":
+            from testing.fake_models import FakeEmbedding
+            embed_model = FakeEmbedding(dim=self.EMBEDDING_DIM, latency=self.FAKE_EMBED_LATENCY)
+        else:
+            from llama_index.embeddings.openai import OpenAIEmbedding
+            embed_model = OpenAIEmbedding(
+                model=self.EMBEDDING_MODEL,
+                api_key=self.OPENAI_API_KEY,
+                reuse_client=True,
+                callback_manager=self.callback_manager
+            )
+        if not self.EMBED_CACHE_ENABLED:
+            return embed_model
+
+        from data_pipeline.embedding_cache import CachedEmbedding, get_embedding_cache_store
+        store = get_embedding_cache_store(
+            self.EMBED_CACHE_PATH,
+            max_memory_items=self.EMBED_CACHE_MEMORY_ITEMS
+        )
+        return CachedEmbedding(embed_model, store)
+
+    def _build_llm(self):
+        if self.LLM_PROVIDER == "fake":
+            from testing.fake_models import FakeLLM
+            return FakeLLM(
+                latency=self.FAKE_LLM_LATENCY,
+                per_token_latency=self.FAKE_LLM_TOKEN_LATENCY,
+                callback_manager=self.callback_manager
+            )
+        from llama_index.llms.openai import OpenAI
         return OpenAI(
             model=self.LLM_MODEL,
             temperature=0.1,
             max_tokens=2000,
-            api_key=self.OPENAI_API_KEY
+            api_key=self.OPENAI_API_KEY,
+            reuse_client=True,
+            callback_manager=self.callback_manager
         )
 
 settings = Settings()
\ No newline at end of file
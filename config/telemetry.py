@@ -0,0 +1,331 @@
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from llama_index.core import Settings as LlamaSettings
+from llama_index.core.callbacks import CallbackManager, CBEventType, EventPayload
+from llama_index.core.callbacks.base_handler import BaseCallbackHandler
+
+from config.settings import settings
+
+# Seconds; covers sub-millisecond local lookups up to slow agent loops
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus layout"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Process-wide counters and histograms, rendered in Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._help: Dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1.0, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters plus count/sum per histogram series, for logs and benchmark reports"""
+        with self._lock:
+            return {
+                "counters": {
+                    name: {_format_labels(key): value for key, value in series.items()}
+                    for name, series in self._counters.items()
+                },
+                "histograms": {
+                    name: {_format_labels(key): {"count": h.count, "sum": h.sum} for key, h in series.items()}
+                    for name, series in self._histograms.items()
+                },
+            }
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, h in series.items():
+                    cumulative = 0
+                    for bound, count in zip(h.buckets, h.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key + (('le', repr(bound)),))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', '+Inf'),))} {h.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {h.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(key: Labels) -> str:
+    if not key:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in key)
+    return "{" + body + "}"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Trace:
+    """Spans and counters of a single query, attached to its response dict"""
+
+    def __init__(self, name: str, **attrs: Any):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.spans: List[Dict[str, Any]] = []
+        self.counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, start: float, duration: float, attrs: Dict[str, Any]):
+        span = {
+            "name": name,
+            "start_ms": round(1000 * (start - self.start), 3),
+            "duration_ms": round(1000 * duration, 3),
+        }
+        if attrs:
+            span["attrs"] = attrs
+        with self._lock:
+            self.spans.append(span)
+
+    def inc(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start_ms"])
+            stages: Dict[str, float] = {}
+            for s in spans:
+                stages[s["name"]] = round(stages.get(s["name"], 0.0) + s["duration_ms"], 3)
+            return {
+                "name": self.name,
+                **self.attrs,
+                "total_ms": round(1000 * (self.duration if self.duration is not None
+                                          else time.perf_counter() - self.start), 3),
+                "stages_ms": stages,
+                "counters": dict(self.counters),
+                "spans": spans,
+            }
+
+
+metrics = MetricsRegistry()
+metrics.describe("rag_stage_duration_seconds", "Time spent per pipeline stage")
+metrics.describe("rag_query_duration_seconds", "End-to-end query latency")
+metrics.describe("rag_queries_total", "Queries answered")
+metrics.describe("rag_llm_calls_total", "LLM completions and chat calls")
+metrics.describe("rag_llm_tokens_total", "LLM tokens by kind (prompt or completion)")
+metrics.describe("rag_agent_steps_total", "ReAct agent reasoning steps")
+metrics.describe("rag_router_decisions_total", "Agent-mode questions by route (direct or agent)")
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("rag_trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def record(name: str, start: float, duration: float, **attrs: Any):
+    """Record a finished stage in the histograms and, if a query is being traced, its trace"""
+    if not settings.TELEMETRY_ENABLED:
+        return
+    metrics.observe("rag_stage_duration_seconds", duration, stage=name)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(name, start, duration, attrs)
+
+
+def count(name: str, value: float = 1):
+    """Bump a per-query counter on the active trace"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.inc(name, value)
+
+
+@contextmanager
+def span(name: str, **attrs: Any):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, start, time.perf_counter() - start, **attrs)
+
+
+def traced(name: str):
+    """Decorator form of span for methods that are a stage in their own right"""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, start, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def start_trace(name: str, **attrs: Any):
+    """Trace everything run in this context (including tasks and bound threads) as one query"""
+    trace = Trace(name, **attrs)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        trace.duration = time.perf_counter() - trace.start
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            # A generator finished from another context; the var dies with that context
+            pass
+        if settings.TELEMETRY_ENABLED:
+            metrics.observe("rag_query_duration_seconds", trace.duration, mode=name)
+            metrics.inc("rag_queries_total", mode=name)
+
+
+def bind_context(fn: Callable) -> Callable:
+    """Run fn in a copy of the caller's context, so pool threads report into the caller's trace"""
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.run(fn, *args, **kwargs)
+
+
+def _usage(response: Any) -> Tuple[Optional[int], Optional[int]]:
+    raw = getattr(response, "raw", None)
+    usage = raw.get("usage") if isinstance(raw, dict) else getattr(raw, "usage", None)
+    if usage is None:
+        return None, None
+    if isinstance(usage, dict):
+        return usage.get("prompt_tokens"), usage.get("completion_tokens")
+    return getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)
+
+
+class TelemetryCallbackHandler(BaseCallbackHandler):
+    """Turns llama_index events into spans: LLM calls with token counts, retrieval,
+    synthesis and agent steps, including the modules run inside QueryPipeline"""
+
+    _SPAN_NAMES = {
+        CBEventType.LLM: "llm",
+        CBEventType.RETRIEVE: "retrieve",
+        CBEventType.SYNTHESIZE: "synthesize",
+        CBEventType.RERANKING: "rerank.llm",
+        CBEventType.AGENT_STEP: "agent.step",
+        CBEventType.FUNCTION_CALL: "agent.tool_call",
+    }
+
+    def __init__(self):
+        super().__init__(event_starts_to_ignore=[], event_ends_to_ignore=[])
+        self._open: Dict[str, Tuple[float, CBEventType, Optional[str], Any]] = {}
+        self._lock = threading.Lock()
+        self._tokenizer = None
+
+    def _count_tokens(self, value: Any) -> int:
+        if self._tokenizer is None:
+            from llama_index.core.utils import get_tokenizer
+            self._tokenizer = get_tokenizer()
+        if isinstance(value, list):
+            value = "\n".join(str(getattr(m, "content", m)) for m in value)
+        return len(self._tokenizer(str(value or "")))
+
+    def on_event_start(self, event_type: CBEventType, payload: Optional[Dict[str, Any]] = None,
+                       event_id: str = "", parent_id: str = "", **kwargs: Any) -> str:
+        if event_type in self._SPAN_NAMES and settings.TELEMETRY_ENABLED:
+            prompt = None
+            if event_type == CBEventType.LLM and payload:
+                prompt = payload.get(EventPayload.PROMPT) or payload.get(EventPayload.MESSAGES)
+            with self._lock:
+                parent = self._open.get(parent_id)
+                self._open[event_id] = (time.perf_counter(), event_type, parent[1] if parent else None, prompt)
+        return event_id
+
+    def on_event_end(self, event_type: CBEventType, payload: Optional[Dict[str, Any]] = None,
+                     event_id: str = "", **kwargs: Any) -> None:
+        with self._lock:
+            opened = self._open.pop(event_id, None)
+        if opened is None:
+            return
+        start, _, parent_type, prompt = opened
+        name = self._SPAN_NAMES[event_type]
+        if event_type == CBEventType.RETRIEVE and parent_type == CBEventType.RETRIEVE:
+            # The dense leg inside the hybrid retriever
+            name = "retrieve.dense"
+        record(name, start, time.perf_counter() - start)
+
+        if event_type == CBEventType.LLM:
+            response = (payload or {}).get(EventPayload.COMPLETION) or (payload or {}).get(EventPayload.RESPONSE)
+            prompt_tokens, completion_tokens = _usage(response)
+            if prompt_tokens is None:
+                prompt_tokens = self._count_tokens(prompt)
+            if completion_tokens is None:
+                message = getattr(response, "message", None)
+                completion_tokens = self._count_tokens(
+                    getattr(message, "content", None) if message is not None else getattr(response, "text", None)
+                )
+            metrics.inc("rag_llm_calls_total")
+            metrics.inc("rag_llm_tokens_total", prompt_tokens, kind="prompt")
+            metrics.inc("rag_llm_tokens_total", completion_tokens, kind="completion")
+            count("llm_calls")
+            count("prompt_tokens", prompt_tokens)
+            count("completion_tokens", completion_tokens)
+        elif event_type == CBEventType.AGENT_STEP:
+            metrics.inc("rag_agent_steps_total")
+            count("agent_steps")
+
+    def start_trace(self, trace_id: Optional[str] = None) -> None:
+        pass
+
+    def end_trace(self, trace_id: Optional[str] = None,
+                  trace_map: Optional[Dict[str, List[str]]] = None) -> None:
+        pass
+
+
+# Shared by every model, retriever and synthesizer the app builds; components
+# that take no explicit callback manager fall back to llama_index's global one
+callback_manager = CallbackManager([TelemetryCallbackHandler()])
+LlamaSettings.callback_manager = callback_manager
@@ -0,0 +1,152 @@
+import argparse
+import logging
+import random
+from typing import List, Dict, Any, Optional, Sequence
+
+import numpy as np
+from llama_index.core.embeddings import BaseEmbedding
+from llama_index.core.node_parser import SemanticSplitterNodeParser
+from llama_index.core.node_parser.node_utils import build_nodes_from_splits
+from llama_index.core.schema import BaseNode
+
+
+class PooledSemanticSplitter(SemanticSplitterNodeParser):
+    """Semantic splitter that also assigns each chunk a vector pooled from its sentence embeddings
+
+    The sentence-window vectors computed to find breakpoints are averaged
+    (weighted by sentence length) into the chunk embedding, so the chunk does
+    not have to be embedded a second time by DocumentProcessor.
+    """
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "PooledSemanticSplitter"
+
+    def build_semantic_nodes_from_documents(
+            self,
+            documents: Sequence[BaseNode],
+            show_progress: bool = False,
+    ) -> List[BaseNode]:
+        all_nodes: List[BaseNode] = []
+        for doc in documents:
+            text = doc.text
+            text_splits = self.sentence_splitter(text)
+            sentences = self._build_sentence_groups(text_splits)
+            if not sentences:
+                continue
+
+            embeddings = self.embed_model.get_text_embedding_batch(
+                [s["combined_sentence"] for s in sentences],
+                show_progress=show_progress,
+            )
+            for sentence, embedding in zip(sentences, embeddings):
+                sentence["combined_sentence_embedding"] = embedding
+
+            groups = self._group_sentences(sentences)
+            chunks = ["".join(s["sentence"] for s in group) for group in groups]
+            nodes = build_nodes_from_splits(chunks, doc, id_func=self.id_func)
+            for node, group in zip(nodes, groups):
+                node.embedding = pool_embeddings(
+                    [s["combined_sentence_embedding"] for s in group],
+                    [len(s["sentence"]) for s in group],
+                )
+            all_nodes.extend(nodes)
+        return all_nodes
+
+    def _group_sentences(self, sentences: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Same breakpoints as SemanticSplitterNodeParser, but keeps sentence membership"""
+        if len(sentences) == 1:
+            return [sentences]
+
+        distances = self._calculate_distances_between_sentence_groups(sentences)
+        threshold = np.percentile(distances, self.breakpoint_percentile_threshold)
+        breakpoints = [i for i, d in enumerate(distances) if d > threshold]
+
+        groups = []
+        start = 0
+        for index in breakpoints:
+            groups.append(sentences[start:index + 1])
+            start = index + 1
+        if start < len(sentences):
+            groups.append(sentences[start:])
+        return groups
+
+
+def pool_embeddings(embeddings: List[List[float]], weights: List[int]) -> List[float]:
+    """Length-weighted mean of sentence vectors, renormalized for inner-product search"""
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    w = np.asarray(weights, dtype=np.float32)
+    if w.sum() <= 0:
+        w = np.ones_like(w)
+    pooled = (matrix * w[:, None]).sum(axis=0) / w.sum()
+    norm = np.linalg.norm(pooled)
+    if norm > 0:
+        pooled /= norm
+    return pooled.tolist()
+
+
+def pooled_recall_at_k(
+        nodes: List[BaseNode],
+        embed_model: BaseEmbedding,
+        queries: Optional[List[str]] = None,
+        k: int = 5,
+        sample_size: int = 50,
+        seed: int = 0,
+) -> Dict[str, float]:
+    """Compare top-k neighbours under pooled vectors with those under full chunk re-embedding
+
+    When no queries are given, the first sentence of a sample of chunks is
+    used as a pseudo-query.
+    """
+    pooled_nodes = [n for n in nodes if n.embedding is not None]
+    if not pooled_nodes:
+        raise ValueError("No pooled embeddings found; chunk with PooledSemanticSplitter first")
+
+    if queries is None:
+        rng = random.Random(seed)
+        sample = rng.sample(pooled_nodes, min(sample_size, len(pooled_nodes)))
+        queries = [n.get_content().split(". ")[0] for n in sample]
+
+    pooled = np.asarray([n.embedding for n in pooled_nodes], dtype=np.float32)
+    full = np.asarray(
+        embed_model.get_text_embedding_batch([n.get_content() for n in pooled_nodes]),
+        dtype=np.float32,
+    )
+    query_vectors = np.asarray(
+        [embed_model.get_query_embedding(q) for q in queries], dtype=np.float32
+    )
+
+    k = min(k, len(pooled_nodes))
+    pooled_top = np.argsort(-(query_vectors @ pooled.T), axis=1)[:, :k]
+    full_top = np.argsort(-(query_vectors @ full.T), axis=1)[:, :k]
+    overlaps = [len(set(p) & set(f)) / k for p, f in zip(pooled_top, full_top)]
+    top1 = [p[0] == f[0] for p, f in zip(pooled_top, full_top)]
+
+    cosines = np.sum(pooled * full, axis=1) / (
+        np.linalg.norm(pooled, axis=1) * np.linalg.norm(full, axis=1) + 1e-12
+    )
+    return {
+        f"recall@{k}": float(np.mean(overlaps)),
+        "top1_agreement": float(np.mean(top1)),
+        "mean_chunk_cosine": float(np.mean(cosines)),
+        "queries": len(queries),
+        "chunks": len(pooled_nodes),
+    }
+
+
+if __name__ == "__main__":
+    from config.settings import settings
+    from data_pipeline.loader import AdvancedDocumentLoader
+
+    parser = argparse.ArgumentParser(description="Check pooled chunk embeddings against full re-embedding")
+    parser.add_argument("--input-dir", default="data")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--sample-size", type=int, default=50)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    loader = AdvancedDocumentLoader(args.input_dir, chunking_mode="semantic_pooled")
+    chunked = loader.load_and_chunk()
+    report = pooled_recall_at_k(chunked, settings.embed_model, k=args.k, sample_size=args.sample_size)
+    for name, value in report.items():
+        print(f"{name}: {value}")
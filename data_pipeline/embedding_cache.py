@@ -0,0 +1,203 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Any
+
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.embeddings import BaseEmbedding
+
+
+def _text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCacheStore:
+    """SQLite-backed embedding store keyed by (model name, text hash) with an in-memory LRU"""
+
+    def __init__(self, path: str, max_memory_items: int = 10000):
+        self.path = path
+        self.max_memory_items = max_memory_items
+        self._lock = threading.Lock()
+        self._lru: "OrderedDict[Tuple[str, str], array]" = OrderedDict()
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.commit()
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        keys = [(model, _text_key(text)) for text in texts]
+        found: Dict[Tuple[str, str], array] = {}
+
+        with self._lock:
+            disk_keys = []
+            for key in keys:
+                vector = self._lru.get(key)
+                if vector is not None:
+                    self._lru.move_to_end(key)
+                    found[key] = vector
+                else:
+                    disk_keys.append(key)
+
+            # SQLite caps bound parameters, so look up misses in slices
+            unique_disk_hashes = list({text_hash for _, text_hash in disk_keys})
+            for start in range(0, len(unique_disk_hashes), 500):
+                batch = unique_disk_hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch]
+                ).fetchall()
+                for text_hash, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[(model, text_hash)] = vector
+                    self._remember((model, text_hash), vector)
+
+            disk_key_set = set(disk_keys)
+            results = []
+            for key in keys:
+                vector = found.get(key)
+                if vector is None:
+                    self._misses += 1
+                    results.append(None)
+                else:
+                    if key in disk_key_set:
+                        self._disk_hits += 1
+                    else:
+                        self._memory_hits += 1
+                    results.append(vector.tolist())
+        return results
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]):
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = (model, _text_key(text))
+                packed = array("f", vector)
+                self._remember(key, packed)
+                rows.append((model, key[1], packed.tobytes()))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def _remember(self, key: Tuple[str, str], vector: array):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_memory_items:
+            self._lru.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self._memory_hits + self._disk_hits
+            total = hits + self._misses
+            return {
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "hit_rate": hits / total if total else 0.0,
+                "memory_items": len(self._lru),
+            }
+
+
+_stores: Dict[str, EmbeddingCacheStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_embedding_cache_store(path: str, max_memory_items: int = 10000) -> EmbeddingCacheStore:
+    """Return the process-wide store for path so every wrapper shares one LRU"""
+    path = os.path.abspath(path)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = EmbeddingCacheStore(path, max_memory_items=max_memory_items)
+        return _stores[path]
+
+
+class CachedEmbedding(BaseEmbedding):
+    """Embedding wrapper that serves repeated texts from the local cache"""
+
+    _inner: BaseEmbedding = PrivateAttr()
+    _store: EmbeddingCacheStore = PrivateAttr()
+
+    def __init__(self, inner: BaseEmbedding, store: EmbeddingCacheStore, **kwargs: Any):
+        super().__init__(
+            model_name=inner.model_name,
+            embed_batch_size=inner.embed_batch_size,
+            **kwargs
+        )
+        self._inner = inner
+        self._store = store
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def inner(self) -> BaseEmbedding:
+        return self._inner
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return self._store.stats()
+
+    def _lookup(self, texts: List[str]) -> Tuple[List[Optional[List[float]]], List[int]]:
+        cached = self._store.get_many(self.model_name, texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        return cached, missing
+
+    def _fill(self, cached, missing, texts, vectors) -> List[List[float]]:
+        self._store.put_many(self.model_name, [texts[i] for i in missing], vectors)
+        for i, vector in zip(missing, vectors):
+            cached[i] = vector
+        return cached
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        cached, missing = self._lookup([query])
+        if missing:
+            return self._fill(cached, missing, [query], [self._inner.get_query_embedding(query)])[0]
+        return cached[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        cached, missing = self._lookup([query])
+        if missing:
+            vector = await self._inner.aget_query_embedding(query)
+            return self._fill(cached, missing, [query], [vector])[0]
+        return cached[0]
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        cached, missing = self._lookup(texts)
+        if missing:
+            vectors = self._inner.get_text_embedding_batch([texts[i] for i in missing])
+            cached = self._fill(cached, missing, texts, vectors)
+        logging.debug(f"Embedding cache: {len(texts) - len(missing)}/{len(texts)} hits")
+        return cached
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        cached, missing = self._lookup(texts)
+        if missing:
+            vectors = await self._inner.aget_text_embedding_batch([texts[i] for i in missing])
+            cached = self._fill(cached, missing, texts, vectors)
+        return cached
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return (await self._aget_text_embeddings([text]))[0]
@@ -0,0 +1,104 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Callable
+
+from llama_index.core.embeddings import BaseEmbedding
+from llama_index.core.utils import get_tokenizer
+
+
+class EmbeddingScheduler:
+    """Embed texts in token-budgeted batches, several batches in flight at once
+
+    Output order always matches input order. Each batch is retried with
+    exponential backoff and jitter independently of the others.
+    """
+
+    def __init__(
+            self,
+            embed_model: BaseEmbedding,
+            max_batch_tokens: int = 30000,
+            max_batch_size: Optional[int] = None,
+            concurrency: int = 4,
+            max_retries: int = 5,
+            initial_backoff: float = 1.0,
+            max_backoff: float = 30.0,
+            tokenizer: Optional[Callable[[str], List]] = None
+    ):
+        self.embed_model = embed_model
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size or getattr(embed_model, "embed_batch_size", 100)
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.tokenizer = tokenizer or get_tokenizer()
+        self.last_stats: Dict[str, Any] = {}
+        self._retry_lock = threading.Lock()
+
+    def pack_batches(self, texts: List[str]) -> List[List[int]]:
+        """Group text indices so each batch stays within the token and size budgets"""
+        batches = []
+        current: List[int] = []
+        current_tokens = 0
+        for i, text in enumerate(texts):
+            tokens = len(self.tokenizer(text))
+            if current and (
+                    current_tokens + tokens > self.max_batch_tokens
+                    or len(current) >= self.max_batch_size
+            ):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        start = time.perf_counter()
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        if not texts:
+            return []
+
+        batches = self.pack_batches(texts)
+        retries = [0]
+
+        def run_batch(indices: List[int]):
+            vectors = self._embed_with_retry([texts[i] for i in indices], retries)
+            for i, vector in zip(indices, vectors):
+                results[i] = vector
+
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as pool:
+            # list() re-raises the first batch that exhausted its retries
+            list(pool.map(run_batch, batches))
+
+        elapsed = time.perf_counter() - start
+        self.last_stats = {
+            "chunks": len(texts),
+            "batches": len(batches),
+            "retries": retries[0],
+            "seconds": elapsed,
+            "chunks_per_sec": len(texts) / elapsed if elapsed > 0 else float("inf"),
+        }
+        logging.info(
+            f"Embedded {len(texts)} chunks in {len(batches)} batches "
+            f"({self.last_stats['chunks_per_sec']:.1f} chunks/sec, {retries[0]} retries)"
+        )
+        return results
+
+    def _embed_with_retry(self, batch: List[str], retries: List[int]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.embed_model.get_text_embedding_batch(batch)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise RuntimeError(f"Embedding batch failed after {attempt + 1} attempts: {e}") from e
+                delay = min(self.max_backoff, self.initial_backoff * (2 ** attempt))
+                delay *= 0.5 + random.random() / 2
+                with self._retry_lock:
+                    retries[0] += 1
+                logging.warning(f"⚠️ Embedding batch attempt {attempt + 1} failed: {e}; retrying in {delay:.1f}s")
+                time.sleep(delay)
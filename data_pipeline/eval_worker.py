@@ -0,0 +1,205 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from data_pipeline.evaluator import PipelineEvaluator
+
+_STOP = object()
+
+
+class EvaluationSink:
+    """Append-only store of evaluation records with rolling aggregates over the latest window
+
+    Paths ending in .parquet are treated as a directory of part files, one per
+    batch (requires pyarrow); anything else is a JSONL file.
+    """
+
+    def __init__(self, path: str, window: int = 100):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        self._recent: deque = deque(maxlen=window)
+        self._total = 0
+        self._lock = threading.Lock()
+        if self.parquet:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ImportError("Parquet evaluation sink requires pyarrow: pip install pyarrow")
+            os.makedirs(path, exist_ok=True)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def write(self, records: List[Dict[str, Any]]):
+        if not records:
+            return
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            rows = [{**r, "metrics": json.dumps(r["metrics"])} for r in records]
+            part = os.path.join(self.path, f"part-{time.time_ns()}.parquet")
+            pq.write_table(pa.Table.from_pylist(rows), part)
+        else:
+            with open(self.path, "a", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, default=str) + "\n")
+
+        with self._lock:
+            self._recent.extend(records)
+            self._total += len(records)
+
+    @property
+    def aggregates(self) -> Dict[str, Any]:
+        """Mean score, pass rate per metric and mean evaluation latency over the latest window"""
+        with self._lock:
+            recent = list(self._recent)
+            total = self._total
+        if not recent:
+            return {"total": total, "window": 0}
+
+        metrics: Dict[str, List[bool]] = {}
+        for record in recent:
+            for name, result in record["metrics"].items():
+                metrics.setdefault(name, []).append(bool(result["passing"]))
+        return {
+            "total": total,
+            "window": len(recent),
+            "mean_score": sum(r["score"] for r in recent) / len(recent),
+            **{f"{name}_pass_rate": sum(values) / len(values) for name, values in metrics.items()},
+            "mean_eval_latency_ms": sum(r["eval_latency_ms"] for r in recent) / len(recent),
+        }
+
+
+class BackgroundEvaluator:
+    """Samples answered queries and evaluates them on a worker thread, off the request path
+
+    submit() never blocks: unsampled items and items arriving while the
+    bounded queue is full are counted and dropped. The worker takes up to
+    batch_size items (waiting at most max_wait seconds after the first one)
+    and scores them with a single BatchEvalRunner call.
+    """
+
+    def __init__(
+            self,
+            evaluator: PipelineEvaluator,
+            sink: EvaluationSink,
+            sample_rate: float = 1.0,
+            queue_size: int = 256,
+            batch_size: int = 8,
+            max_wait: float = 2.0,
+            seed: Optional[int] = None
+    ):
+        self.evaluator = evaluator
+        self.sink = sink
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(("submitted", "sampled_out", "dropped", "evaluated", "failed", "batches"), 0)
+        self._worker = threading.Thread(target=self._run, name="eval-worker", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+        return {**counters, "queued": self._queue.qsize(), **self.sink.aggregates}
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self._counters[key] += amount
+
+    def submit(self, query: str, answer: str, contexts: List[str], **metadata: Any) -> str:
+        """Queue an answered query for evaluation; returns "queued", "not_sampled" or "dropped" """
+        self._count("submitted")
+        with self._lock:
+            sampled = self._rng.random() < self.sample_rate
+        if not sampled:
+            self._count("sampled_out")
+            return "not_sampled"
+        item = {"query": query, "answer": answer, "contexts": contexts,
+                "metadata": metadata, "answered_at": time.time()}
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._count("dropped")
+            return "dropped"
+        return "queued"
+
+    def close(self, timeout: float = 30.0):
+        """Evaluate what is already queued, then stop the worker"""
+        if not self._worker.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._worker.join(timeout)
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch, stop = [first], False
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._evaluate(batch)
+            if stop:
+                return
+
+    def _evaluate(self, batch: List[Dict[str, Any]]):
+        start = time.perf_counter()
+        try:
+            eval_results, scores = self.evaluator.evaluate_batch(
+                [item["query"] for item in batch],
+                [item["answer"] for item in batch],
+                [item["contexts"] for item in batch]
+            )
+        except Exception as e:
+            logging.error(f"❌ Background evaluation of {len(batch)} answers failed: {e}")
+            self._count("failed", len(batch))
+            return
+
+        latency_ms = 1000 * (time.perf_counter() - start) / len(batch)
+        records = []
+        for i, item in enumerate(batch):
+            records.append({
+                "evaluated_at": time.time(),
+                "answered_at": item["answered_at"],
+                "query": item["query"],
+                "answer": item["answer"],
+                "score": scores[i],
+                "metrics": {
+                    name: {"passing": bool(results[i].passing), "score": results[i].score,
+                           "feedback": results[i].feedback}
+                    for name, results in eval_results.items()
+                },
+                "eval_latency_ms": latency_ms,
+                **item["metadata"],
+            })
+        self.sink.write(records)
+        self._count("evaluated", len(batch))
+        self._count("batches")
+        logging.info(f"📊 Evaluated {len(batch)} answers in the background: {self.sink.aggregates}")
@@ -4,14 +4,16 @@ from llama_index.core.evaluation import (
     BatchEvalRunner
 )
 from typing import Tuple, Dict, Any, List
+from config.settings import settings
 
 class PipelineEvaluator:
-    def __init__(self):
-        self.faithfulness_eval = FaithfulnessEvaluator()
-        self.relevancy_eval = RelevancyEvaluator()
+    def __init__(self, workers: int = 2):
+        llm = settings.llm
+        self.faithfulness_eval = FaithfulnessEvaluator(llm=llm)
+        self.relevancy_eval = RelevancyEvaluator(llm=llm)
         self.eval_runner = BatchEvalRunner(
             {"faithfulness": self.faithfulness_eval, "relevancy": self.relevancy_eval},
-            workers=2
+            workers=workers
         )
 
     def evaluate_response(
@@ -21,16 +23,26 @@ class PipelineEvaluator:
             contexts: List[str]
     ) -> Tuple[Dict[str, Any], float]:
         """Evaluate response quality"""
-        eval_results = self.eval_runner.evaluate(
-            queries=[query],
-            responses=[response],
-            contexts=[contexts]
+        eval_results, scores = self.evaluate_batch([query], [response], [contexts])
+        return {name: results[0] for name, results in eval_results.items()}, scores[0]
+
+    def evaluate_batch(
+            self,
+            queries: List[str],
+            responses: List[str],
+            contexts: List[List[str]]
+    ) -> Tuple[Dict[str, List[Any]], List[float]]:
+        """Evaluate many responses in one BatchEvalRunner call; one score per response"""
+        eval_results = self.eval_runner.evaluate_response_strs(
+            queries=queries,
+            response_strs=responses,
+            contexts_list=contexts
         )
 
-        # Calculate overall score
-        score = (
-                        eval_results["faithfulness"].passing
-                        + eval_results["relevancy"].passing
-                ) / 2
+        # Overall score: share of evaluators that passed
+        scores = [
+            (bool(faithfulness.passing) + bool(relevancy.passing)) / 2
+            for faithfulness, relevancy in zip(eval_results["faithfulness"], eval_results["relevancy"])
+        ]
 
-        return eval_results, score
\ No newline at end of file
+        return eval_results, scores
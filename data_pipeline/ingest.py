@@ -0,0 +1,126 @@
+import logging
+import random
+import time
+from typing import Dict, List, Optional
+
+from data_pipeline.loader import AdvancedDocumentLoader
+from data_pipeline.manifest import IngestionManifest
+from data_pipeline.processor import DocumentProcessor
+from data_pipeline.streaming import StreamingIngestPipeline
+from retrieval.bm25_index import BM25Index
+from config.settings import settings
+
+# Chunk ids checked against the vector store before the manifest is trusted
+_SYNC_SAMPLE_SIZE = 256
+
+
+class IncrementalIngestor:
+    """Ingest only what changed since the last run, as recorded in the manifest"""
+
+    def __init__(
+            self,
+            loader: AdvancedDocumentLoader,
+            processor: DocumentProcessor,
+            storage,
+            manifest: IngestionManifest,
+            pipeline: Optional[StreamingIngestPipeline] = None,
+            lexical_index: Optional[BM25Index] = None
+    ):
+        self.loader = loader
+        self.processor = processor
+        self.storage = storage
+        self.manifest = manifest
+        self.lexical_index = lexical_index
+        self.pipeline = pipeline or StreamingIngestPipeline(
+            loader,
+            processor,
+            storage,
+            queue_size=settings.INGEST_QUEUE_SIZE,
+            batch_size=settings.INGEST_BATCH_SIZE,
+            lexical_index=lexical_index
+        )
+
+    def run(self) -> Dict[str, int]:
+        start = time.perf_counter()
+        force_reload = False
+        if self.lexical_index is not None and self.lexical_index.is_empty and self.manifest.files:
+            # Rebuild the lexical index: every file is re-chunked, but chunks already
+            # in the vector store are not re-embedded
+            logging.info("Lexical index is empty, re-reading corpus to build it")
+            force_reload = True
+        elif self.manifest.files and not self._store_in_sync():
+            # New or emptied server, dropped or recreated collection: the manifest describes
+            # chunks that are gone, so re-read everything (surviving chunks are not re-embedded)
+            logging.warning("Vector store is missing chunks listed in the manifest, re-ingesting corpus")
+            force_reload = True
+
+        current = self.manifest.scan(self.loader.input_dir, self.loader.required_exts)
+        diff = self.manifest.diff(current, force_reload=force_reload)
+        stats = {
+            "files_added": len(diff.added),
+            "files_modified": len(diff.modified),
+            "files_removed": len(diff.removed),
+            "files_unchanged": len(diff.unchanged),
+            "files_reloaded": len(diff.reloaded),
+            "chunks_embedded": 0,
+            "chunks_skipped": 0,
+            "chunks_deleted": 0,
+        }
+
+        if not diff.has_changes:
+            self.manifest.save()
+            logging.info(f"Corpus unchanged ({len(diff.unchanged)} files), skipping ingest")
+            return stats
+
+        try:
+            for path in diff.removed:
+                stale_ids = self.manifest.chunk_ids_for([path])
+                if stale_ids:
+                    self._delete(stale_ids)
+                stats["chunks_deleted"] += len(stale_ids)
+                self.manifest.remove_file(path)
+
+            def on_file_done(path: str, chunk_ids: List[str]):
+                # Chunks the previous version of this file produced but this one no longer does
+                produced = set(chunk_ids)
+                stale_ids = [i for i in self.manifest.chunk_ids_for([path]) if i not in produced]
+                if stale_ids:
+                    self._delete(stale_ids)
+                stats["chunks_deleted"] += len(stale_ids)
+                # A file is only recorded once its rows survive a crash, or a rerun would skip it
+                self.storage.checkpoint()
+                self.manifest.record_file(path, current[path], chunk_ids)
+
+            stream_stats = self.pipeline.run(diff.to_load, on_file_done=on_file_done)
+            self.storage.finalize()
+            stats["chunks_embedded"] = stream_stats["embedded"]
+            stats["chunks_skipped"] = stream_stats["skipped"]
+        finally:
+            # Files completed before a failure stay recorded, so a rerun resumes
+            self.manifest.save()
+            if self.lexical_index is not None:
+                self.lexical_index.save()
+
+        logging.info(
+            f"Ingest finished in {time.perf_counter() - start:.2f}s: "
+            f"{stats['chunks_embedded']} embedded, {stats['chunks_skipped']} skipped, "
+            f"{stats['chunks_deleted']} deleted"
+        )
+        return stats
+
+    def _store_in_sync(self) -> bool:
+        """Whether a sample of manifest chunk ids, one from every file included, is in the store"""
+        per_file = [entry["chunk_ids"] for entry in self.manifest.files.values() if entry.get("chunk_ids")]
+        sample = [ids[0] for ids in per_file]
+        rest = [i for ids in per_file for i in ids[1:]]
+        if len(sample) < _SYNC_SAMPLE_SIZE and rest:
+            sample += random.sample(rest, min(_SYNC_SAMPLE_SIZE - len(sample), len(rest)))
+        if not sample:
+            return True
+        existing = self.storage.get_existing_ids(sample)
+        return len(existing) == len(set(sample))
+
+    def _delete(self, node_ids: List[str]):
+        self.storage.delete_nodes(node_ids)
+        if self.lexical_index is not None:
+            self.lexical_index.remove(node_ids)
@@ -1,23 +1,114 @@
+import logging
+import os
 from llama_index.core import SimpleDirectoryReader
-from llama_index.core.node_parser import SemanticSplitterNodeParser
-from typing import List
+from llama_index.core.node_parser import SemanticSplitterNodeParser, SentenceSplitter
+from typing import List, Optional, Iterator, Tuple
 from llama_index.core.schema import Document
 from config.settings import settings
+from data_pipeline.chunking import PooledSemanticSplitter
+from data_pipeline.parallel_loader import ParallelDocumentReader, _parse_file
 
 class AdvancedDocumentLoader:
-    def __init__(self, input_dir: str = "data"):
+    required_exts = [".pdf", ".docx", ".pptx", ".txt"]
+
+    def __init__(
+            self,
+            input_dir: str = "data",
+            chunking_mode: Optional[str] = None,
+            num_workers: Optional[int] = None
+    ):
         self.input_dir = input_dir
-        self.parser = SemanticSplitterNodeParser(
-            buffer_size=1,
-            breakpoint_percentile_threshold=95,
-            embed_model=settings.embed_model
-        )
-
-    def load_and_chunk(self) -> List[Document]:
-        """Load and semantically chunk documents"""
-        documents = SimpleDirectoryReader(
-            self.input_dir,
-            required_exts=[".pdf", ".docx", ".pptx", ".txt"]
-        ).load_data()
-
-        return self.parser.get_nodes_from_documents(documents)
\ No newline at end of file
+        self.chunking_mode = chunking_mode or settings.CHUNKING_MODE
+        self.parser = self._build_parser(self.chunking_mode)
+
+        # 1 parses in-process; anything else fans files out to a process pool (0 = all cores)
+        num_workers = settings.LOADER_WORKERS if num_workers is None else num_workers
+        self.reader = None
+        if num_workers != 1:
+            self.reader = ParallelDocumentReader(
+                num_workers=num_workers or None,
+                timeout=settings.LOADER_FILE_TIMEOUT
+            )
+
+    def _build_parser(self, chunking_mode: str):
+        """Pick the node parser for the configured chunking mode"""
+        if chunking_mode == "semantic":
+            return SemanticSplitterNodeParser(
+                buffer_size=1,
+                breakpoint_percentile_threshold=95,
+                embed_model=settings.embed_model
+            )
+        if chunking_mode == "semantic_pooled":
+            # Chunks come out already embedded from their sentence vectors
+            return PooledSemanticSplitter(
+                buffer_size=1,
+                breakpoint_percentile_threshold=95,
+                embed_model=settings.embed_model
+            )
+        if chunking_mode == "sentence":
+            # Fixed-token, sentence-aware chunks; no embedding calls at chunk time
+            return SentenceSplitter(
+                chunk_size=settings.CHUNK_SIZE,
+                chunk_overlap=settings.CHUNK_OVERLAP
+            )
+        raise ValueError(f"Unknown chunking mode: {chunking_mode}")
+
+    def list_files(self) -> List[str]:
+        """Files under input_dir the loader would pick up, in reader order"""
+        reader = SimpleDirectoryReader(self.input_dir, required_exts=self.required_exts)
+        return [str(path) for path in reader.input_files]
+
+    def iter_documents(self, input_files: Optional[List[str]] = None) -> Iterator[Tuple[str, List[Document]]]:
+        """Yield (file path, documents) one file at a time to keep memory bounded
+
+        Files that fail to parse are logged and skipped so the rest of the batch proceeds.
+        """
+        paths = self.list_files() if input_files is None else input_files
+        if self.reader is None:
+            for path in paths:
+                documents, error, _ = _parse_file(path)
+                if error is not None:
+                    # Not recorded in the manifest, so the next run retries it
+                    logging.warning(f"⚠️ Failed to parse {path}: {error}")
+                    continue
+                yield path, documents
+            return
+
+        for result in self.reader.iter_load(paths):
+            if result.ok:
+                yield result.path, result.documents
+
+    def document_id(self, path: str) -> str:
+        """Stable id of a source file: its path relative to input_dir, the same for every page and edit"""
+        return os.path.relpath(os.path.abspath(path), os.path.abspath(self.input_dir)).replace(os.sep, "/")
+
+    def chunk(self, documents: List[Document]) -> List[Document]:
+        for document in documents:
+            path = document.metadata.get("file_path")
+            if path:
+                document.metadata["document_id"] = self.document_id(path)
+            # Filter-only; kept out of chunk sizing, embeddings and prompts
+            for keys in (document.excluded_embed_metadata_keys, document.excluded_llm_metadata_keys):
+                if "document_id" not in keys:
+                    keys.append("document_id")
+        return self.parser.get_nodes_from_documents(documents)
+
+    def load_and_chunk(self, input_files: Optional[List[str]] = None) -> List[Document]:
+        """Load and chunk documents, optionally restricted to input_files"""
+        if input_files is not None:
+            if not input_files:
+                return []
+            reader = SimpleDirectoryReader(input_files=input_files)
+        else:
+            reader = SimpleDirectoryReader(
+                self.input_dir,
+                required_exts=self.required_exts
+            )
+
+        if self.reader is not None:
+            results = self.reader.load([str(path) for path in reader.input_files])
+            documents = [doc for result in results if result.ok for doc in result.documents]
+        else:
+            documents = reader.load_data()
+
+        return self.chunk(documents)
\ No newline at end of file
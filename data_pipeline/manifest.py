@@ -0,0 +1,153 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Iterable, Any
+
+
+@dataclass
+class ManifestDiff:
+    """File-level difference between the corpus on disk and the manifest"""
+    added: List[str] = field(default_factory=list)
+    modified: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    # Unchanged files read again anyway (force_reload); their stored chunks are not re-embedded
+    reloaded: List[str] = field(default_factory=list)
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.modified or self.removed or self.reloaded)
+
+    @property
+    def to_load(self) -> List[str]:
+        return self.added + self.modified + self.reloaded
+
+
+def manifest_version(path: str) -> int:
+    """Cheap change token for the ingested corpus; the manifest is rewritten on every change"""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+
+class IngestionManifest:
+    """Local record of ingested files and the chunk ids produced from them"""
+
+    VERSION = 1
+
+    def __init__(self, path: str):
+        self.path = path
+        self._data = self._load()
+        self._dirty = False
+
+    def _load(self) -> Dict[str, Any]:
+        if not os.path.exists(self.path):
+            return {"version": self.VERSION, "generation": 0, "files": {}}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != self.VERSION:
+                logging.warning(f"⚠️ Ignoring manifest with unknown version: {self.path}")
+                return {"version": self.VERSION, "generation": 0, "files": {}}
+            return data
+        except (OSError, ValueError) as e:
+            logging.warning(f"⚠️ Could not read manifest {self.path}: {e}")
+            return {"version": self.VERSION, "generation": 0, "files": {}}
+
+    @property
+    def files(self) -> Dict[str, Dict[str, Any]]:
+        return self._data["files"]
+
+    @property
+    def generation(self) -> int:
+        """Monotonic counter bumped every time the ingested corpus changes"""
+        return self._data["generation"]
+
+    def scan(self, input_dir: str, required_exts: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Fingerprint files the loader would pick up, hashing only when stat changed"""
+        exts = {e.lower() for e in required_exts}
+        current = {}
+        for name in sorted(os.listdir(input_dir)):
+            path = os.path.abspath(os.path.join(input_dir, name))
+            if name.startswith(".") or not os.path.isfile(path):
+                continue
+            if os.path.splitext(name)[1].lower() not in exts:
+                continue
+
+            stat = os.stat(path)
+            known = self.files.get(path)
+            if known and known["size"] == stat.st_size and known["mtime"] == stat.st_mtime:
+                file_hash = known["file_hash"]
+            else:
+                file_hash = self._hash_file(path)
+
+            current[path] = {
+                "file_hash": file_hash,
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+            }
+        return current
+
+    def diff(self, current: Dict[str, Dict[str, Any]], force_reload: bool = False) -> ManifestDiff:
+        """Compare a scan with the manifest; force_reload moves unchanged files to reloaded"""
+        diff = ManifestDiff()
+        for path, fingerprint in current.items():
+            known = self.files.get(path)
+            if known is None:
+                diff.added.append(path)
+            elif known["file_hash"] != fingerprint["file_hash"]:
+                diff.modified.append(path)
+            else:
+                diff.unchanged.append(path)
+                if known["mtime"] != fingerprint["mtime"]:
+                    # Touched but identical: remember the new stat to skip hashing next time
+                    known.update(size=fingerprint["size"], mtime=fingerprint["mtime"])
+                    self._dirty = True
+        if force_reload:
+            diff.reloaded, diff.unchanged = diff.unchanged, []
+        diff.removed = [path for path in self.files if path not in current]
+        return diff
+
+    def chunk_ids_for(self, paths: Iterable[str]) -> List[str]:
+        ids = []
+        for path in paths:
+            ids.extend(self.files.get(path, {}).get("chunk_ids", []))
+        return ids
+
+    def record_file(self, path: str, fingerprint: Dict[str, Any], chunk_ids: List[str]):
+        self.files[path] = {
+            **fingerprint,
+            "chunk_ids": chunk_ids,
+            "ingested_at": int(time.time()),
+        }
+        self._data["generation"] += 1
+        self._dirty = True
+
+    def remove_file(self, path: str):
+        if self.files.pop(path, None) is not None:
+            self._data["generation"] += 1
+            self._dirty = True
+
+    def save(self):
+        """Atomically persist the manifest if anything changed"""
+        if not self._dirty:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
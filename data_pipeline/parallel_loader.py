@@ -0,0 +1,89 @@
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Tuple
+
+from llama_index.core import SimpleDirectoryReader
+from llama_index.core.schema import Document
+
+
+@dataclass
+class FileLoadResult:
+    path: str
+    documents: List[Document] = field(default_factory=list)
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _parse_file(path: str) -> Tuple[List[Document], Optional[str], float]:
+    """Worker entry point; errors are returned as text so one bad file can't kill the batch"""
+    start = time.perf_counter()
+    try:
+        documents = SimpleDirectoryReader(input_files=[path]).load_data()
+        return documents, None, time.perf_counter() - start
+    except Exception as e:
+        return [], f"{type(e).__name__}: {e}", time.perf_counter() - start
+
+
+class ParallelDocumentReader:
+    """Parse files across a process pool, yielding results in input order
+
+    Each file gets `timeout` seconds once it reaches the head of the ordered
+    result queue. A timed-out worker cannot be interrupted, so the pool is
+    replaced and the in-flight files behind it are resubmitted.
+    """
+
+    def __init__(self, num_workers: Optional[int] = None, timeout: float = 120.0, start_method: str = "spawn"):
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        # spawn: the ingest pipeline runs the loader from a thread, and forking a threaded process is unsafe
+        self._context = multiprocessing.get_context(start_method)
+
+    def _new_pool(self):
+        return self._context.Pool(processes=self.num_workers)
+
+    def load(self, paths: List[str]) -> List[FileLoadResult]:
+        return list(self.iter_load(paths))
+
+    def iter_load(self, paths: List[str]) -> Iterator[FileLoadResult]:
+        window = self.num_workers * 2
+        remaining = iter(paths)
+        in_flight = deque()
+        pool = self._new_pool()
+
+        def fill():
+            while len(in_flight) < window:
+                path = next(remaining, None)
+                if path is None:
+                    return
+                in_flight.append((path, pool.apply_async(_parse_file, (path,))))
+
+        try:
+            fill()
+            while in_flight:
+                path, result = in_flight.popleft()
+                try:
+                    documents, error, seconds = result.get(timeout=self.timeout)
+                    if error:
+                        logging.warning(f"⚠️ Failed to parse {path}: {error}")
+                    yield FileLoadResult(path, documents, error, seconds)
+                except multiprocessing.TimeoutError:
+                    logging.warning(f"⚠️ Parsing {path} timed out after {self.timeout}s")
+                    yield FileLoadResult(path, [], f"timed out after {self.timeout}s", self.timeout)
+                    pool.terminate()
+                    pool = self._new_pool()
+                    in_flight = deque(
+                        (p, pool.apply_async(_parse_file, (p,))) for p, _ in in_flight
+                    )
+                except Exception as e:
+                    yield FileLoadResult(path, [], f"{type(e).__name__}: {e}")
+                fill()
+        finally:
+            pool.terminate()
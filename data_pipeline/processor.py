@@ -1,16 +1,37 @@
-from typing import List
+from typing import List, Optional
 from llama_index.core.schema import BaseNode
 from llama_index.core.embeddings import BaseEmbedding
+from data_pipeline.embedding_scheduler import EmbeddingScheduler
+from config.settings import settings
+from config.telemetry import traced
 import hashlib
 import time
 
+# File-stat metadata that changes without the chunk changing; kept out of the node id
+# so that unchanged chunks of a touched or edited file keep their id across runs
+_VOLATILE_METADATA_KEYS = {"creation_date", "last_modified_date", "last_accessed_date", "file_size", "ingested_at"}
+# Filter keys that mean nothing to the embedding model or the LLM
+_FILTER_ONLY_METADATA_KEYS = ["document_id", "ingested_at"]
+
 class DocumentProcessor:
-    def __init__(self, embed_model: BaseEmbedding):
+    def __init__(self, embed_model: BaseEmbedding, scheduler: Optional[EmbeddingScheduler] = None):
         self.embed_model = embed_model
+        self.scheduler = scheduler or EmbeddingScheduler(
+            embed_model,
+            max_batch_tokens=settings.EMBED_BATCH_TOKENS,
+            concurrency=settings.EMBED_CONCURRENCY,
+            max_retries=settings.EMBED_MAX_RETRIES
+        )
 
     def process_nodes(self, nodes: List[BaseNode]) -> List[BaseNode]:
-        current_time = int(time.time())
         """Add metadata, embeddings, and unique IDs"""
+        nodes = self.prepare_nodes(nodes)
+        return self.embed_nodes(nodes)
+
+    @traced("processor.prepare")
+    def prepare_nodes(self, nodes: List[BaseNode]) -> List[BaseNode]:
+        """Assign deterministic IDs and processing metadata without embedding"""
+        ingested_at = int(time.time())
         # Generate consistent IDs
         for node in nodes:
             node.id_ = self._generate_node_id(node)
@@ -24,16 +45,28 @@ class DocumentProcessor:
                 "processing_version": "2.0",
                 "chunk_hash": self._generate_content_hash(node),
                 "doc_type": node.metadata.get("doc_type", "unknown"),
-                "source_file": node.metadata.get("file_name", "unknown")
+                "source_file": node.metadata.get("file_name", "unknown"),
+                # Filterable: the source document (set by the loader) and when this chunk was stored
+                "document_id": node.metadata.get("document_id") or node.metadata.get("file_name", "unknown"),
+                "ingested_at": ingested_at
             })
+            for keys in (node.excluded_embed_metadata_keys, node.excluded_llm_metadata_keys):
+                keys.extend(k for k in _FILTER_ONLY_METADATA_KEYS if k not in keys)
 
             # Add required Milvus fields
-            setattr(node, "document_id", node.metadata.get("doc_id", ""))
+            setattr(node, "document_id", node.metadata["document_id"])
+
+        return nodes
 
-        # Batch embed
-        texts = [node.get_content() for node in nodes]
-        embeddings = self.embed_model.get_text_embedding_batch(texts)
-        for node, embedding in zip(nodes, embeddings):
+    @traced("processor.embed")
+    def embed_nodes(self, nodes: List[BaseNode]) -> List[BaseNode]:
+        """Batch embed nodes in place, skipping nodes the chunker already embedded"""
+        pending = [node for node in nodes if node.embedding is None]
+        if not pending:
+            return nodes
+        texts = [node.get_content() for node in pending]
+        embeddings = self.scheduler.embed(texts)
+        for node, embedding in zip(pending, embeddings):
             node.embedding = embedding
 
         return nodes
@@ -41,7 +74,9 @@ class DocumentProcessor:
     def _generate_node_id(self, node: BaseNode) -> str:
         """Generate SHA256 ID from content and metadata"""
         content = node.get_content()
-        metadata = str(node.metadata)
+        metadata = str({
+            k: v for k, v in node.metadata.items() if k not in _VOLATILE_METADATA_KEYS
+        })
         return hashlib.sha256(f"{content}{metadata}".encode()).hexdigest()
 
     def _generate_content_hash(self, node: BaseNode) -> str:
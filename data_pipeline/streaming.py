@@ -0,0 +1,164 @@
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Any
+
+from llama_index.core.schema import BaseNode
+
+from data_pipeline.loader import AdvancedDocumentLoader
+from data_pipeline.processor import DocumentProcessor
+
+_DONE = object()
+
+
+class _WorkItem:
+    __slots__ = ("path", "nodes", "pending", "last")
+
+    def __init__(self, path: str, nodes: List[BaseNode], last: bool):
+        self.path = path
+        self.nodes = nodes
+        self.pending: List[BaseNode] = []
+        self.last = last
+
+
+class StreamingIngestPipeline:
+    """Chunk, embed and insert stages running concurrently over bounded queues
+
+    Files are read one at a time and their nodes travel in batches of at most
+    batch_size, so at most (2 * queue_size + 3) batches are held in memory
+    regardless of corpus size.
+    """
+
+    def __init__(
+            self,
+            loader: AdvancedDocumentLoader,
+            processor: DocumentProcessor,
+            storage,
+            queue_size: int = 4,
+            batch_size: int = 256,
+            lexical_index=None
+    ):
+        self.loader = loader
+        self.processor = processor
+        self.storage = storage
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.lexical_index = lexical_index
+
+    def run(
+            self,
+            input_files: Optional[List[str]] = None,
+            on_file_done: Optional[Callable[[str, List[str]], None]] = None
+    ) -> Dict[str, Any]:
+        """Ingest input_files; on_file_done(path, chunk_ids) fires once a file is fully stored"""
+        start = time.perf_counter()
+        to_embed: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        to_insert: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        errors: List[BaseException] = []
+        stats = {"files": 0, "chunks": 0, "embedded": 0, "skipped": 0}
+
+        def guarded(stage: Callable, *args):
+            def target():
+                try:
+                    stage(*args)
+                except BaseException as e:
+                    logging.error(f"❌ Ingest stage {stage.__name__} failed: {e}")
+                    errors.append(e)
+                    stop.set()
+            return threading.Thread(target=target, name=f"ingest-{stage.__name__}", daemon=True)
+
+        threads = [
+            guarded(self._chunk_stage, input_files, to_embed, stop),
+            guarded(self._embed_stage, to_embed, to_insert, stop, stats),
+            guarded(self._insert_stage, to_insert, stop, stats, on_file_done),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            raise RuntimeError(f"Streaming ingest failed: {errors[0]}") from errors[0]
+
+        elapsed = time.perf_counter() - start
+        stats["seconds"] = elapsed
+        stats["chunks_per_sec"] = stats["chunks"] / elapsed if elapsed > 0 else 0.0
+        logging.info(
+            f"Streamed {stats['files']} files / {stats['chunks']} chunks in {elapsed:.2f}s "
+            f"({stats['embedded']} embedded, {stats['skipped']} already stored)"
+        )
+        return stats
+
+    @staticmethod
+    def _put(q: "queue.Queue", item, stop: threading.Event) -> bool:
+        """Blocking put that gives up when another stage has failed"""
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @staticmethod
+    def _get(q: "queue.Queue", stop: threading.Event):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _chunk_stage(self, input_files, out: "queue.Queue", stop: threading.Event):
+        try:
+            for path, documents in self.loader.iter_documents(input_files):
+                nodes = self.processor.prepare_nodes(self.loader.chunk(documents))
+                seen = set()
+                nodes = [n for n in nodes if not (n.id_ in seen or seen.add(n.id_))]
+
+                batches = [
+                    nodes[i:i + self.batch_size] for i in range(0, len(nodes), self.batch_size)
+                ] or [[]]
+                for i, batch in enumerate(batches):
+                    if not self._put(out, _WorkItem(path, batch, i == len(batches) - 1), stop):
+                        return
+        finally:
+            self._put(out, _DONE, stop)
+
+    def _embed_stage(self, inp: "queue.Queue", out: "queue.Queue", stop: threading.Event, stats):
+        try:
+            while True:
+                item = self._get(inp, stop)
+                if item is _DONE:
+                    return
+                if item.nodes:
+                    existing = self.storage.get_existing_ids([n.id_ for n in item.nodes])
+                    item.pending = [n for n in item.nodes if n.id_ not in existing]
+                    self.processor.embed_nodes(item.pending)
+                    stats["skipped"] += len(item.nodes) - len(item.pending)
+                if not self._put(out, item, stop):
+                    return
+        finally:
+            self._put(out, _DONE, stop)
+
+    def _insert_stage(self, inp: "queue.Queue", stop: threading.Event, stats, on_file_done):
+        ids_by_path: Dict[str, List[str]] = defaultdict(list)
+        while True:
+            item = self._get(inp, stop)
+            if item is _DONE:
+                return
+            if item.pending:
+                self.storage.store_nodes(item.pending)
+                stats["embedded"] += len(item.pending)
+            if self.lexical_index is not None and item.nodes:
+                # Every chunk, not just pending ones, so a fresh lexical index gets backfilled
+                self.lexical_index.add(n for n in item.nodes if n.node_id not in self.lexical_index)
+            stats["chunks"] += len(item.nodes)
+            ids_by_path[item.path].extend(n.id_ for n in item.nodes)
+            if item.last:
+                stats["files"] += 1
+                if on_file_done:
+                    on_file_done(item.path, ids_by_path.pop(item.path))
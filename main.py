@@ -1,42 +1,127 @@
 import logging
+import time
+from typing import Optional
 from config.settings import settings
-from data_pipeline.loader import AdvancedDocumentLoader
-from data_pipeline.processor import DocumentProcessor
-from storage.milvus_store import MilvusStorage
+from config.telemetry import record
+from data_pipeline.manifest import manifest_version
+from data_pipeline.eval_worker import BackgroundEvaluator, EvaluationSink
 from retrieval.retriever import AdvancedRetriever
+from retrieval.bm25_index import BM25Index
+from retrieval.coalescer import QueryCoalescer
 from orchestrator.query_engine import AdvancedQueryEngine
 from app.application import AdvancedRAGApplication
-from storage import initialize_milvus
+from app.query_cache import QueryCache
+from storage import initialize_storage
+
+def ingest(storage, lexical_index):
+    """Embed and store only new or changed chunks"""
+    # Loader, splitter and processor imports are only paid when ingesting
+    from data_pipeline.loader import AdvancedDocumentLoader
+    from data_pipeline.processor import DocumentProcessor
+    from data_pipeline.manifest import IngestionManifest
+    from data_pipeline.ingest import IncrementalIngestor
 
-def initialize_system():
-    # Initialize Milvus with custom collection
-    milvus_storage = initialize_milvus()
-    """Initialize all components"""
-    # Load and process documents
     loader = AdvancedDocumentLoader()
     processor = DocumentProcessor(settings.embed_model)
+    manifest = IngestionManifest(settings.ingest_manifest_path)
+    ingestor = IncrementalIngestor(loader, processor, storage, manifest, lexical_index=lexical_index)
+    ingestor.run()
+    if hasattr(processor.embed_model, "stats"):
+        logging.info(f"Embedding cache: {processor.embed_model.stats}")
+
+def initialize_system(serve_only: Optional[bool] = None):
+    """Initialize all components
+
+    With serve_only (default SERVE_ONLY) the existing collection, BM25 index
+    and manifest are attached to as they are: the corpus is neither scanned
+    nor ingested, so a restarted server is ready as soon as its clients are.
+    Per-stage startup times are logged and kept on app.startup.
+    """
+    serve_only = settings.SERVE_ONLY if serve_only is None else serve_only
+    startup = {}
+    began = stage_start = time.perf_counter()
+
+    def stage_done(name):
+        nonlocal stage_start
+        now = time.perf_counter()
+        startup[f"{name}_ms"] = round(1000 * (now - stage_start), 1)
+        record(f"startup.{name}", stage_start, now - stage_start)
+        stage_start = now
 
-    nodes = loader.load_and_chunk()
-    processed_nodes = processor.process_nodes(nodes)
+    # Initialize the configured vector store (Milvus or local)
+    storage = initialize_storage(serve_only=serve_only)
+    lexical_index = BM25Index(settings.bm25_index_path) if settings.HYBRID_SEARCH else None
+    stage_done("storage")
 
-    # Store in Milvus with timestamps
-    milvus_storage.store_nodes(processed_nodes)
-    logging.info(f"Stored {len(processed_nodes)} nodes in Milvus")
+    if serve_only:
+        if lexical_index is not None and lexical_index.is_empty:
+            logging.warning("BM25 index is empty; serving dense-only until the next ingest")
+            lexical_index = None
+    else:
+        ingest(storage, lexical_index)
+        stage_done("ingest")
 
     # Create retrieval and query components
-    retriever = AdvancedRetriever(milvus_storage.get_vector_store())
+    coalescer = None
+    if settings.QUERY_COALESCE_ENABLED:
+        coalescer = QueryCoalescer(
+            settings.embed_model,
+            storage.get_vector_store(),
+            max_wait=settings.QUERY_COALESCE_MAX_WAIT_MS / 1000,
+            max_batch_size=settings.QUERY_COALESCE_MAX_BATCH,
+            concurrency=settings.QUERY_COALESCE_CONCURRENCY
+        )
+    retriever = AdvancedRetriever(storage.get_vector_store(), lexical_index=lexical_index, coalescer=coalescer)
     query_engine = AdvancedQueryEngine(retriever)
 
+    # Cached answers are dropped whenever ingest rewrites the manifest
+    cache = None
+    if settings.QUERY_CACHE_ENABLED:
+        cache = QueryCache(
+            embed_model=settings.embed_model if settings.QUERY_CACHE_SEMANTIC else None,
+            ttl=settings.QUERY_CACHE_TTL,
+            max_entries=settings.QUERY_CACHE_MAX_ENTRIES,
+            similarity_threshold=settings.QUERY_CACHE_SIMILARITY,
+            version_fn=lambda: manifest_version(settings.ingest_manifest_path)
+        )
+
+    # Evaluation results arrive later in the sink instead of delaying the answer
+    eval_worker = None
+    if settings.EVAL_BACKGROUND:
+        from data_pipeline.evaluator import PipelineEvaluator
+        eval_worker = BackgroundEvaluator(
+            PipelineEvaluator(workers=settings.EVAL_BATCH_SIZE),
+            EvaluationSink(settings.EVAL_SINK_PATH, window=settings.EVAL_ROLLING_WINDOW),
+            sample_rate=settings.EVAL_SAMPLE_RATE,
+            queue_size=settings.EVAL_QUEUE_SIZE,
+            batch_size=settings.EVAL_BATCH_SIZE,
+            max_wait=settings.EVAL_MAX_WAIT
+        )
+
     # Initialize application
-    return AdvancedRAGApplication(query_engine, mode="agent")
+    app = AdvancedRAGApplication(query_engine, mode="agent", cache=cache, eval_worker=eval_worker)
+    stage_done("components")
+
+    startup["total_ms"] = round(1000 * (time.perf_counter() - began), 1)
+    startup["serve_only"] = serve_only
+    app.startup = startup
+    logging.info(f"Cold start took {startup['total_ms']:.0f} ms: {startup}")
+    return app
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Interactive question answering over the ingested corpus")
+    parser.add_argument("--serve-only", action="store_true", default=settings.SERVE_ONLY,
+                        help="Skip ingest and answer from the existing collection")
+    args = parser.parse_args()
+
     logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
 
     try:
-        rag_app = initialize_system()
-        print("Advanced RAG System Ready. Type 'exit' to quit.")
+        rag_app = initialize_system(serve_only=args.serve_only)
+        print(f"Advanced RAG System Ready in {rag_app.startup['total_ms'] / 1000:.1f}s. Type 'exit' to quit.")
 
         while True:
             query = input("\nQuestion: ")
@@ -44,10 +129,30 @@ if __name__ == "__main__":
                 break
 
             try:
-                response = rag_app.query(query, evaluate=True)
-
                 print("\nAnswer:")
-                print(response["answer"])
+                if settings.STREAM_RESPONSES:
+                    # Print tokens as they arrive; the final event carries sources and timing
+                    response = {}
+                    for event in rag_app.stream_query(query, evaluate=True):
+                        if event["type"] == "token":
+                            print(event["delta"], end="", flush=True)
+                        else:
+                            response = event
+                    print()
+                else:
+                    response = rag_app.query(query, evaluate=True)
+                    print(response["answer"])
+
+                if response.get("timing"):
+                    timing = response["timing"]
+                    ttft = f"{timing['ttft_ms']:.0f} ms" if timing["ttft_ms"] is not None else "n/a"
+                    print(f"(first token after {ttft}, total {timing['total_ms']:.0f} ms)")
+
+                if response.get("trace"):
+                    trace = response["trace"]
+                    stages = ", ".join(f"{name} {ms:.0f} ms" for name, ms in trace["stages_ms"].items())
+                    counters = ", ".join(f"{name}={value:g}" for name, value in trace["counters"].items())
+                    print(f"(stages: {stages or 'none'}; {counters or 'no LLM calls'})")
 
                 if response.get("sources"):
                     print("\nSources:")
@@ -56,7 +161,25 @@ if __name__ == "__main__":
                         print(f"   {source['text'][:200]}...")
                         print(f"   Metadata: {source['metadata']}\n")
 
-                if response.get("evaluation"):
+                compressor = rag_app.query_engine.compressor
+                if compressor is not None and compressor.stats["queries"]:
+                    stats = compressor.stats
+                    print(f"(context: {stats['avg_tokens_before']:.0f} -> {stats['avg_tokens_after']:.0f} "
+                          f"prompt tokens per query on average)")
+
+                router_stats = getattr(rag_app.orchestrator, "stats", None)
+                if router_stats:
+                    memo = router_stats.get("tool_memo") or {}
+                    print(f"(routing: {router_stats['direct']} direct, {router_stats['agent']} agent, "
+                          f"{router_stats['avg_agent_steps']:.1f} steps per agent query, "
+                          f"~{router_stats['seconds_saved'] + memo.get('seconds_saved', 0.0):.1f}s saved)")
+
+                if response.get("cache"):
+                    print(f"\n(cached: {response['cache']}, hit rate {rag_app.cache.stats['hit_rate']:.0%})")
+
+                if response.get("evaluation", {}).get("status"):
+                    print(f"\nEvaluation: {response['evaluation']['status']} (results go to {settings.EVAL_SINK_PATH})")
+                elif response.get("evaluation"):
                     eval_data = response["evaluation"]
                     print(f"\nEvaluation Score: {eval_data['score']:.2f}")
                     for metric, result in eval_data['results'].items():
@@ -1,31 +1,232 @@
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import contextmanager, nullcontext
 from llama_index.core.agent import ReActAgent
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.llms import LLM
 from llama_index.core.tools import QueryEngineTool
-from llama_index.core import VectorStoreIndex
-from typing import List
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from app.query_cache import QueryCache
+from config.limits import limits
 from config.settings import settings
+from config.telemetry import count, span
+from data_pipeline.manifest import manifest_version
+from retrieval.filters import active_filters
+
+class MemoizedQueryEngine:
+    """Query engine wrapper that answers repeated tool calls of one agent session from a memo
+
+    A session is one top-level question: session() installs a fresh memo for
+    the tool calls made while answering it, so concurrent clients never see
+    each other's entries and nothing outlives the question. Identical (after
+    normalisation) and near-identical inputs, by embedding similarity, return
+    the earlier response instead of rerunning retrieve, rerank and
+    synthesize. Each hit adds the original call's duration to seconds_saved.
+    Calls outside a session or under retrieval filters are not memoized.
+    """
+
+    def __init__(self, query_engine, memo_factory: Callable[[], QueryCache]):
+        self.query_engine = query_engine
+        self.memo_factory = memo_factory
+        self._memo: contextvars.ContextVar[Optional[QueryCache]] = contextvars.ContextVar(
+            f"tool_memo_{id(self)}", default=None
+        )
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(("sessions", "hits", "misses", "seconds_saved"), 0)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    @contextmanager
+    def session(self) -> Iterator[None]:
+        token = self._memo.set(self.memo_factory())
+        with self._lock:
+            self._stats["sessions"] += 1
+        try:
+            yield
+        finally:
+            try:
+                self._memo.reset(token)
+            except ValueError:
+                # Ended from another context; the memo dies with that context
+                pass
+
+    def _active_memo(self) -> Optional[QueryCache]:
+        # Memoized answers come from unfiltered or differently filtered calls
+        return self._memo.get() if active_filters() is None else None
+
+    def _hit(self, cached: Dict[str, Any]):
+        count("tool_memo_hits")
+        with self._lock:
+            self._stats["hits"] += 1
+            self._stats["seconds_saved"] += cached["seconds"]
+        return cached["response"]
+
+    def _miss(self):
+        with self._lock:
+            self._stats["misses"] += 1
+
+    def query(self, query_str: str):
+        memo = self._active_memo()
+        if memo is None:
+            return self.query_engine.query(query_str)
+        cached = memo.get(query_str)
+        if cached is not None:
+            return self._hit(cached)
+        self._miss()
+        start = time.perf_counter()
+        response = self.query_engine.query(query_str)
+        memo.put(query_str, {"response": response, "seconds": time.perf_counter() - start})
+        return response
+
+    async def aquery(self, query_str: str):
+        memo = self._active_memo()
+        if memo is None:
+            return await self.query_engine.aquery(query_str)
+        # Memo lookups may embed the input; keep that off the event loop
+        cached = await asyncio.to_thread(memo.get, query_str)
+        if cached is not None:
+            return self._hit(cached)
+        self._miss()
+        start = time.perf_counter()
+        response = await self.query_engine.aquery(query_str)
+        await asyncio.to_thread(
+            memo.put, query_str, {"response": response, "seconds": time.perf_counter() - start}
+        )
+        return response
+
+class _LimitedLLM(LLM):
+    """LLM proxy whose async calls each hold a limits("llm") slot
+
+    Puts the ReAct reasoning calls under the same cap as synthesis. Only the
+    call itself holds the slot, so tool calls in between take their own.
+    """
+
+    _llm: LLM = PrivateAttr()
+
+    def __init__(self, llm: LLM, **kwargs: Any):
+        super().__init__(callback_manager=llm.callback_manager, **kwargs)
+        self._llm = llm
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LimitedLLM"
+
+    @property
+    def metadata(self):
+        return self._llm.metadata
+
+    def chat(self, messages, **kwargs: Any):
+        return self._llm.chat(messages, **kwargs)
+
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+        return self._llm.complete(prompt, formatted=formatted, **kwargs)
+
+    def stream_chat(self, messages, **kwargs: Any):
+        return self._llm.stream_chat(messages, **kwargs)
+
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+        return self._llm.stream_complete(prompt, formatted=formatted, **kwargs)
+
+    async def achat(self, messages, **kwargs: Any):
+        async with limits("llm"):
+            return await self._llm.achat(messages, **kwargs)
+
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+        async with limits("llm"):
+            return await self._llm.acomplete(prompt, formatted=formatted, **kwargs)
+
+    async def astream_chat(self, messages, **kwargs: Any):
+        return self._hold(lambda: self._llm.astream_chat(messages, **kwargs))
+
+    async def astream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+        return self._hold(lambda: self._llm.astream_complete(prompt, formatted=formatted, **kwargs))
+
+    @staticmethod
+    async def _hold(start: Callable):
+        # Tokens are generated while the stream is consumed, so the slot covers the iteration
+        async with limits("llm"):
+            async for chunk in await start():
+                yield chunk
+
 
 class AdvancedRAGAgent:
-    def __init__(self, query_engine, additional_tools: List = None):
+    def __init__(self, query_engine, additional_tools: List = None,
+                 memo_factory: Optional[Callable[[], QueryCache]] = None):
         self.query_engine = query_engine
+        self.tool_engine = query_engine
+        if memo_factory is None and settings.AGENT_TOOL_MEMO_ENABLED:
+            memo_factory = self._default_memo
+        if memo_factory is not None:
+            self.tool_engine = MemoizedQueryEngine(query_engine, memo_factory)
         self.tools = self._setup_tools(additional_tools or [])
-        self.agent = self._create_agent()
+        self.async_llm = _LimitedLLM(settings.llm)
+
+    @property
+    def memo_stats(self) -> Optional[Dict[str, Any]]:
+        if isinstance(self.tool_engine, MemoizedQueryEngine):
+            return self.tool_engine.stats
+        return None
+
+    @staticmethod
+    def _default_memo() -> QueryCache:
+        return QueryCache(
+            embed_model=settings.embed_model,
+            ttl=settings.AGENT_TOOL_MEMO_TTL,
+            max_entries=settings.AGENT_TOOL_MEMO_MAX_ENTRIES,
+            similarity_threshold=settings.AGENT_TOOL_MEMO_SIMILARITY,
+            # A re-ingest mid-question must not be answered from pre-ingest tool calls
+            version_fn=lambda: manifest_version(settings.ingest_manifest_path)
+        )
+
+    def _session(self):
+        if isinstance(self.tool_engine, MemoizedQueryEngine):
+            return self.tool_engine.session()
+        return nullcontext()
 
     def _setup_tools(self, additional_tools):
         base_tool = QueryEngineTool.from_defaults(
-            query_engine=self.query_engine,
+            query_engine=self.tool_engine,
             name="document_retriever",
             description="Access deal conversation notes"
         )
         return [base_tool] + additional_tools
 
-    def _create_agent(self):
+    def _create_agent(self, llm: Optional[LLM] = None):
+        """A ReActAgent for one question; its chat memory must not be shared between clients
+
+        Tools and the LLM client are shared, so this only builds the agent's
+        prompt state and an empty memory.
+        """
         return ReActAgent.from_tools(
             self.tools,
-            llm=settings.llm,
+            llm=llm or settings.llm,
+            callback_manager=settings.callback_manager,  # one agent.step span per ReAct iteration
             verbose=True,
             max_iterations=6
         )
 
     def query(self, query_str: str):
         """Execute agent-based query"""
-        return self.agent.chat(query_str)
\ No newline at end of file
+        with span("agent"), self._session():
+            return self._create_agent().chat(query_str)
+
+    async def aquery(self, query_str: str):
+        with span("agent"), self._session():
+            return await self._create_agent(self.async_llm).achat(query_str)
+
+    def stream_query(self, query_str: str):
+        """Tool calls run to completion; only the final answer is streamed via response_gen"""
+        with self._session():
+            return self._create_agent().stream_chat(query_str)
+
+    async def astream_query(self, query_str: str):
+        with self._session():
+            return await self._create_agent(self.async_llm).astream_chat(query_str)
@@ -2,14 +2,63 @@ from llama_index.core.query_engine import RetrieverQueryEngine
 from llama_index.core.response_synthesizers import get_response_synthesizer
 from retrieval.retriever import AdvancedRetriever
 from retrieval.reranker import AdvancedReranker
-from llama_index.core.query_pipeline import QueryPipeline
-from typing import Optional
+from retrieval.compressor import ContextCompressor
+from llama_index.core.query_pipeline import QueryPipeline, InputComponent
+from llama_index.core.schema import QueryBundle
+from contextlib import AsyncExitStack
+from typing import Any, Awaitable, Callable, Optional
+from config.limits import limits
+from config.telemetry import span
 from config.settings import settings
+from retrieval.filters import active_filters
+
+class _LimitedStream:
+    """Async streaming response that holds its LLM slot until the last token is consumed
+
+    The slot is released when async_response_gen() is exhausted or closed,
+    or by aclose(). Callers that may never iterate must call aclose().
+    """
+
+    def __init__(self, response: Any, release: Callable[[], Awaitable[Any]]):
+        self._response = response
+        self._release = release
+        self._released = False
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._response, name)
+
+    async def aclose(self):
+        if not self._released:
+            self._released = True
+            await self._release()
+
+    async def async_response_gen(self):
+        try:
+            async for delta in self._response.async_response_gen():
+                yield delta
+        finally:
+            await self.aclose()
+
 
 class AdvancedQueryEngine:
-    def __init__(self, retriever: AdvancedRetriever, reranker: Optional[AdvancedReranker] = None):
+    def __init__(
+            self,
+            retriever: AdvancedRetriever,
+            reranker: Optional[AdvancedReranker] = None,
+            compressor: Optional[ContextCompressor] = None
+    ):
         self.retriever = retriever
         self.reranker = reranker or AdvancedReranker()
+        self.compressor = compressor
+        if compressor is None and settings.CONTEXT_COMPRESSION:
+            # Trim reranked chunks to the sentences that matter before they reach the prompt
+            self.compressor = ContextCompressor(
+                embed_model=settings.embed_model,
+                token_budget=settings.CONTEXT_TOKEN_BUDGET,
+                min_relative_score=settings.CONTEXT_MIN_RELATIVE_SCORE
+            )
+        self.synthesizer = get_response_synthesizer(llm=settings.llm)
+        self.streaming_synthesizer = get_response_synthesizer(llm=settings.llm, streaming=True)
         self.query_pipeline = self._build_query_pipeline()
 
     def _build_query_pipeline(self):
@@ -18,17 +67,73 @@ class AdvancedQueryEngine:
 
         # Add modules
         qp.add_modules({
+            "input": InputComponent(),
             "retriever": self.retriever.get_retriever(),
             "reranker": self.reranker.reranker,
-            "synthesizer": get_response_synthesizer(llm=settings.llm)
+            "synthesizer": self.synthesizer
         })
 
-        # Connect pipeline
-        qp.add_link("retriever", "reranker")
-        qp.add_link("reranker", "synthesizer")
+        # Connect pipeline; the postprocessors need the query as well as the nodes
+        qp.add_link("input", "retriever")
+        qp.add_link("retriever", "reranker", dest_key="nodes")
+        qp.add_link("input", "reranker", dest_key="query_str")
+        last = "reranker"
+        if self.compressor is not None:
+            qp.add_modules({"compressor": self.compressor})
+            qp.add_link("reranker", "compressor", dest_key="nodes")
+            qp.add_link("input", "compressor", dest_key="query_str")
+            last = "compressor"
+        qp.add_link(last, "synthesizer", dest_key="nodes")
+        qp.add_link("input", "synthesizer", dest_key="query_str")
 
         return qp
 
     def query(self, query_str: str):
         """Execute the full RAG pipeline"""
-        return self.query_pipeline.run(query=query_str)
\ No newline at end of file
+        with span("pipeline"):
+            if active_filters() is not None:
+                # The pipeline's retriever is built once, unfiltered; run the same stages directly
+                return self.synthesizer.synthesize(query_str, self._context(query_str))
+            return self.query_pipeline.run(input=query_str)
+
+    async def aquery(self, query_str: str):
+        """Same stages as the pipeline, awaited one by one so each respects its downstream limit"""
+        nodes = await self._acontext(query_str)
+        async with limits("llm"):
+            return await self.synthesizer.asynthesize(query_str, nodes)
+
+    def stream_query(self, query_str: str):
+        """Retrieve and rerank up front, then return a StreamingResponse whose response_gen yields tokens"""
+        return self.streaming_synthesizer.synthesize(query_str, self._context(query_str))
+
+    async def astream_query(self, query_str: str):
+        """Async variant of stream_query; tokens come from async_response_gen()
+
+        The LLM limit is held from synthesis until async_response_gen() is
+        exhausted or closed, since tokens are generated while it is consumed.
+        """
+        nodes = await self._acontext(query_str)
+        slot = AsyncExitStack()
+        await slot.enter_async_context(limits("llm"))
+        try:
+            response = await self.streaming_synthesizer.asynthesize(query_str, nodes)
+        except BaseException:
+            await slot.aclose()
+            raise
+        return _LimitedStream(response, slot.aclose)
+
+    def _context(self, query_str: str):
+        """Retrieve, rerank and compress: the nodes the synthesizer will see"""
+        nodes = self.reranker.rerank(query_str, self.retriever.retrieve(query_str))
+        if self.compressor is not None:
+            nodes = self.compressor.postprocess_nodes(nodes, query_str=query_str)
+        return nodes
+
+    async def _acontext(self, query_str: str):
+        """Async variant of _context"""
+        nodes = await self.retriever.aretrieve(query_str)
+        nodes = await self.reranker.arerank(query_str, nodes)
+        if self.compressor is not None:
+            async with limits("embedding"):
+                nodes = await self.compressor.acompress(nodes, QueryBundle(query_str=query_str))
+        return nodes
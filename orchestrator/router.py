@@ -0,0 +1,198 @@
+import re
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+from llama_index.core.embeddings import BaseEmbedding
+
+from config.telemetry import count, current_trace, metrics, span
+
+# Wording that needs decomposition, comparison or explanation across several lookups
+_COMPLEX_MARKERS = re.compile(
+    r"\b(compare[ds]?|comparison|versus|vs\.?|differ(?:s|ence|ences)?|between|relationship|trends?|"
+    r"over time|why|explain|analy[sz]e|summari[sz]e|across|each|every|all (?:of|the)|"
+    r"step by step|pros and cons|implications?|impact)\b"
+)
+# Openers of single-fact lookups
+_SIMPLE_OPENERS = re.compile(
+    r"^(what(?:'s| is| was| are| were)?|who|when|where|which|how (?:much|many|long|old)|"
+    r"is|are|was|were|did|does|do|list|name)\b"
+)
+_QUESTION_WORDS = re.compile(r"\b(what|who|when|where|which|why|how)\b")
+
+# Prototype questions for the embedding fallback, in the vocabulary of the deal notes
+SIMPLE_EXAMPLES = [
+    "What was the proposed deal size?",
+    "Who is the main contact at the company?",
+    "When is the next meeting scheduled?",
+    "What price did the buyer offer?",
+    "Which bank is advising on the transaction?",
+    "Where is the company headquartered?",
+]
+COMPLEX_EXAMPLES = [
+    "Compare the terms offered by the two bidders and explain which is better for us.",
+    "Why did the deal stall and what changed after the second meeting?",
+    "Summarize how the valuation discussions evolved across all the calls.",
+    "What are the main risks raised so far and how were they addressed?",
+    "How do the synergies discussed relate to the price we are willing to pay?",
+    "Walk through the negotiation and list the open issues for each party.",
+]
+
+
+class RouteDecision(NamedTuple):
+    route: str  # "direct" (query engine) or "agent"
+    reason: str
+
+
+class QueryRouter:
+    """Decides without an LLM call whether a question needs the ReAct agent
+
+    Cheap heuristics decide first. Long or multi-part questions and comparison
+    or explanation wording go to the agent, and short questions with a
+    single-fact opener go direct. When neither applies and an embed_model is
+    given, the question is compared with the centroids of the simple and
+    complex example questions. It goes direct only if it is closer to the
+    simple one by at least margin. Anything still undecided goes to the agent.
+    """
+
+    def __init__(
+            self,
+            embed_model: Optional[BaseEmbedding] = None,
+            max_simple_words: int = 15,
+            max_words: int = 40,
+            margin: float = 0.02,
+            simple_examples: Optional[List[str]] = None,
+            complex_examples: Optional[List[str]] = None
+    ):
+        self.embed_model = embed_model
+        self.max_simple_words = max_simple_words
+        self.max_words = max_words
+        self.margin = margin
+        self.simple_examples = simple_examples or SIMPLE_EXAMPLES
+        self.complex_examples = complex_examples or COMPLEX_EXAMPLES
+        self._centroids: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def route(self, query: str) -> RouteDecision:
+        text = re.sub(r"\s+", " ", query).strip().lower()
+        words = len(text.split())
+        if words > self.max_words:
+            return RouteDecision("agent", "long")
+        if text.count("?") > 1 or len(_QUESTION_WORDS.findall(text)) > 1:
+            return RouteDecision("agent", "multi_question")
+        marker = _COMPLEX_MARKERS.search(text)
+        if marker:
+            return RouteDecision("agent", f"marker:{marker.group(1)}")
+        if words <= self.max_simple_words and _SIMPLE_OPENERS.match(text):
+            return RouteDecision("direct", "simple_lookup")
+        if self.embed_model is not None:
+            return self._route_by_embedding(query)
+        return RouteDecision("agent", "default")
+
+    def _route_by_embedding(self, query: str) -> RouteDecision:
+        # The raw query, so the retriever's embedding of it is a cache hit
+        vector = np.asarray(self.embed_model.get_query_embedding(query), dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1.0
+        simple, complex_ = self._prototype_centroids() @ vector
+        if simple - complex_ >= self.margin:
+            return RouteDecision("direct", "embedding")
+        return RouteDecision("agent", "embedding")
+
+    def _prototype_centroids(self) -> np.ndarray:
+        with self._lock:
+            if self._centroids is None:
+                centroids = []
+                for examples in (self.simple_examples, self.complex_examples):
+                    vectors = np.asarray(self.embed_model.get_text_embedding_batch(examples), dtype=np.float32)
+                    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+                    centroid = vectors.mean(axis=0)
+                    centroids.append(centroid / (np.linalg.norm(centroid) or 1.0))
+                self._centroids = np.stack(centroids)
+            return self._centroids
+
+
+class RoutedAgent:
+    """Front door for agent mode: simple questions skip the ReAct loop entirely
+
+    Exposes the same query / aquery / stream_query / astream_query methods
+    as AdvancedQueryEngine and AdvancedRAGAgent. It tracks how many
+    questions each path took, the agent iterations spent, and an estimate of
+    the time saved. The estimate is the number of direct answers multiplied
+    by the difference between the mean agent and mean direct latency.
+    """
+
+    def __init__(self, query_engine, agent, router: Optional[QueryRouter] = None):
+        self.query_engine = query_engine
+        self.agent = agent
+        self.router = router or QueryRouter()
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(
+            ("direct", "agent", "direct_seconds", "agent_seconds", "timed_direct", "timed_agent", "agent_steps"), 0
+        )
+        self._reasons: Dict[str, int] = {}
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["reasons"] = dict(self._reasons)
+        avg_direct = stats["direct_seconds"] / stats["timed_direct"] if stats["timed_direct"] else None
+        avg_agent = stats["agent_seconds"] / stats["timed_agent"] if stats["timed_agent"] else None
+        stats["direct_rate"] = stats["direct"] / ((stats["direct"] + stats["agent"]) or 1)
+        stats["avg_agent_steps"] = stats["agent_steps"] / (stats["timed_agent"] or 1)
+        stats["seconds_saved"] = (
+            stats["direct"] * max(avg_agent - avg_direct, 0.0)
+            if avg_direct is not None and avg_agent is not None else 0.0
+        )
+        if hasattr(self.agent, "memo_stats"):
+            stats["tool_memo"] = self.agent.memo_stats
+        return stats
+
+    def _decide(self, query_str: str):
+        with span("router"):
+            decision = self.router.route(query_str)
+        with self._lock:
+            self._stats[decision.route] += 1
+            self._reasons[decision.reason] = self._reasons.get(decision.reason, 0) + 1
+        metrics.inc("rag_router_decisions_total", route=decision.route)
+        count(f"route_{decision.route}")
+        return decision, (self.query_engine if decision.route == "direct" else self.agent)
+
+    def _observe(self, route: str, start: float, steps_before: float):
+        elapsed = time.perf_counter() - start
+        # ReAct iterations come from the trace's agent.step events, so they need TELEMETRY_ENABLED
+        steps = self._steps_so_far() - steps_before
+        with self._lock:
+            self._stats[f"{route}_seconds"] += elapsed
+            self._stats[f"timed_{route}"] += 1
+            if route == "agent":
+                self._stats["agent_steps"] += steps
+
+    @staticmethod
+    def _steps_so_far() -> float:
+        trace = current_trace()
+        return trace.counters.get("agent_steps", 0) if trace is not None else 0
+
+    def query(self, query_str: str):
+        decision, target = self._decide(query_str)
+        start, steps = time.perf_counter(), self._steps_so_far()
+        response = target.query(query_str)
+        self._observe(decision.route, start, steps)
+        return response
+
+    async def aquery(self, query_str: str):
+        decision, target = self._decide(query_str)
+        start, steps = time.perf_counter(), self._steps_so_far()
+        response = await target.aquery(query_str)
+        self._observe(decision.route, start, steps)
+        return response
+
+    def stream_query(self, query_str: str):
+        # Streaming latency ends with the last token, outside this call, so only the route is counted
+        _, target = self._decide(query_str)
+        return target.stream_query(query_str)
+
+    async def astream_query(self, query_str: str):
+        _, target = self._decide(query_str)
+        return await target.astream_query(query_str)
@@ -0,0 +1,216 @@
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, List, Optional, Tuple, Iterable
+
+import numpy as np
+from llama_index.core.schema import BaseNode
+
+# Keeps tickers and names like "BRK.B", "AT&T", "S&P500" or "X-1" as single tokens
+_TOKEN_RE = re.compile(r"[a-z0-9](?:[a-z0-9&$.\-]*[a-z0-9&$])?")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were "
+    "will with what which who how when where why does did do".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+class BM25Index:
+    """Incrementally updated BM25 inverted index persisted to SQLite
+
+    Postings are stored per term as packed uint32 doc numbers and uint16 term
+    frequencies. Removed documents are tombstoned and dropped from postings
+    when the tombstone ratio gets high enough to be worth a compaction.
+    """
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75, compact_ratio: float = 0.25):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.compact_ratio = compact_ratio
+        self._lock = threading.RLock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            "doc INTEGER PRIMARY KEY, node_id TEXT NOT NULL, length INTEGER NOT NULL, alive INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS postings (term TEXT PRIMARY KEY, docs BLOB NOT NULL, tfs BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+        self.node_ids: List[str] = []
+        self.doc_for_node: Dict[str, int] = {}
+        self.lengths = array("I")
+        self.alive = bytearray()
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self._dirty_terms = set()
+        self._dirty_docs = set()
+        self._load()
+
+    def _load(self):
+        for doc, node_id, length, alive in self._conn.execute(
+                "SELECT doc, node_id, length, alive FROM docs ORDER BY doc"
+        ):
+            self.node_ids.append(node_id)
+            self.lengths.append(length)
+            self.alive.append(alive)
+            if alive:
+                self.doc_for_node[node_id] = doc
+        for term, docs_blob, tfs_blob in self._conn.execute("SELECT term, docs, tfs FROM postings"):
+            docs, tfs = array("I"), array("H")
+            docs.frombytes(docs_blob)
+            tfs.frombytes(tfs_blob)
+            self.postings[term] = (docs, tfs)
+
+    @property
+    def live_count(self) -> int:
+        return len(self.doc_for_node)
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.doc_for_node
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.doc_for_node
+
+    def add(self, nodes: Iterable[BaseNode]):
+        """Index nodes, replacing any earlier version with the same id"""
+        with self._lock:
+            for node in nodes:
+                if node.node_id in self.doc_for_node:
+                    self._tombstone(node.node_id)
+                counts = Counter(tokenize(node.get_content()))
+                doc = len(self.node_ids)
+                self.node_ids.append(node.node_id)
+                self.lengths.append(sum(counts.values()))
+                self.alive.append(1)
+                self.doc_for_node[node.node_id] = doc
+                self._dirty_docs.add(doc)
+                for term, tf in counts.items():
+                    docs, tfs = self.postings.setdefault(term, (array("I"), array("H")))
+                    docs.append(doc)
+                    tfs.append(min(tf, 0xFFFF))
+                    self._dirty_terms.add(term)
+
+    def remove(self, node_ids: Iterable[str]):
+        with self._lock:
+            for node_id in node_ids:
+                if node_id in self.doc_for_node:
+                    self._tombstone(node_id)
+
+    def _tombstone(self, node_id: str):
+        doc = self.doc_for_node.pop(node_id)
+        self.alive[doc] = 0
+        self._dirty_docs.add(doc)
+
+    def save(self):
+        """Persist changed documents and postings, compacting first if many are tombstoned"""
+        with self._lock:
+            dead = len(self.node_ids) - self.live_count
+            if self.node_ids and dead / len(self.node_ids) > self.compact_ratio:
+                self._compact()
+                return
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO docs (doc, node_id, length, alive) VALUES (?, ?, ?, ?)",
+                [(d, self.node_ids[d], self.lengths[d], self.alive[d]) for d in self._dirty_docs]
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO postings (term, docs, tfs) VALUES (?, ?, ?)",
+                [(t, self.postings[t][0].tobytes(), self.postings[t][1].tobytes()) for t in self._dirty_terms]
+            )
+            self._conn.commit()
+            self._dirty_docs.clear()
+            self._dirty_terms.clear()
+
+    def _compact(self):
+        """Renumber live documents densely and rewrite every posting list"""
+        remap = {}
+        node_ids, lengths, alive = [], array("I"), bytearray()
+        for doc, node_id in enumerate(self.node_ids):
+            if self.alive[doc]:
+                remap[doc] = len(node_ids)
+                node_ids.append(node_id)
+                lengths.append(self.lengths[doc])
+                alive.append(1)
+
+        postings = {}
+        for term, (docs, tfs) in self.postings.items():
+            new_docs, new_tfs = array("I"), array("H")
+            for doc, tf in zip(docs, tfs):
+                if doc in remap:
+                    new_docs.append(remap[doc])
+                    new_tfs.append(tf)
+            if new_docs:
+                postings[term] = (new_docs, new_tfs)
+
+        self.node_ids, self.lengths, self.alive, self.postings = node_ids, lengths, alive, postings
+        self.doc_for_node = {node_id: doc for doc, node_id in enumerate(node_ids)}
+
+        self._conn.execute("DELETE FROM docs")
+        self._conn.execute("DELETE FROM postings")
+        self._conn.executemany(
+            "INSERT INTO docs (doc, node_id, length, alive) VALUES (?, ?, ?, 1)",
+            [(d, node_id, lengths[d]) for d, node_id in enumerate(node_ids)]
+        )
+        self._conn.executemany(
+            "INSERT INTO postings (term, docs, tfs) VALUES (?, ?, ?)",
+            [(t, d.tobytes(), f.tobytes()) for t, (d, f) in postings.items()]
+        )
+        self._conn.commit()
+        self._dirty_docs.clear()
+        self._dirty_terms.clear()
+        logging.info(f"Compacted BM25 index to {len(node_ids)} documents")
+
+    def search(self, query: str, top_k: int = 10, allowed: Optional[set] = None) -> List[Tuple[str, float]]:
+        """Top-k (node_id, score) by BM25, optionally restricted to allowed node ids"""
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self.node_ids)
+            if not terms or not self.doc_for_node:
+                return []
+
+            alive = np.frombuffer(bytes(self.alive), dtype=np.uint8).astype(bool)
+            lengths = np.frombuffer(self.lengths.tobytes(), dtype=np.uint32).astype(np.float32)
+            live = self.live_count
+            avgdl = float(lengths[alive].mean()) or 1.0
+            norm = self.k1 * (1 - self.b + self.b * lengths / avgdl)
+
+            scores = np.zeros(n_docs, dtype=np.float32)
+            for term in terms:
+                posting = self.postings.get(term)
+                if posting is None:
+                    continue
+                docs = np.frombuffer(posting[0].tobytes(), dtype=np.uint32)
+                tfs = np.frombuffer(posting[1].tobytes(), dtype=np.uint16).astype(np.float32)
+                df = int(alive[docs].sum())
+                if df == 0:
+                    continue
+                idf = math.log(1 + (live - df + 0.5) / (df + 0.5))
+                scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm[docs])
+
+            scores[~alive] = 0
+            if allowed is not None:
+                mask = np.zeros(n_docs, dtype=bool)
+                mask[[self.doc_for_node[i] for i in allowed if i in self.doc_for_node]] = True
+                scores[~mask] = 0
+
+            candidates = np.flatnonzero(scores > 0)
+            if not len(candidates):
+                return []
+            k = min(top_k, len(candidates))
+            top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            top = top[np.argsort(-scores[top])]
+            return [(self.node_ids[d], float(scores[d])) for d in top]
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from llama_index.core.embeddings import BaseEmbedding
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+
+from config.settings import settings
+
+
+def query_batch(
+        vector_store: BasePydanticVectorStore,
+        embeddings: List[List[float]],
+        top_k: int,
+        filters: Optional[MetadataFilters] = None
+) -> List[VectorStoreQueryResult]:
+    """One multi-vector search where the backend supports it, one query per vector otherwise"""
+    if hasattr(vector_store, "query_batch"):
+        return vector_store.query_batch(embeddings, top_k, filters)
+
+    from storage.milvus_store import milvus_query_batch, is_milvus_store
+    if is_milvus_store(vector_store):
+        return milvus_query_batch(vector_store, embeddings, top_k, filters)
+
+    return [
+        vector_store.query(VectorStoreQuery(query_embedding=e, similarity_top_k=top_k, filters=filters))
+        for e in embeddings
+    ]
+
+
+class _Pending:
+    __slots__ = ("query", "top_k", "filters", "future", "enqueued")
+
+    def __init__(self, query: str, top_k: int, filters: Optional[MetadataFilters]):
+        self.query = query
+        self.top_k = top_k
+        self.filters = filters
+        self.future: Future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class QueryCoalescer:
+    """Gathers concurrent dense lookups into one embedding call and one multi-vector search
+
+    The first query to arrive opens a window of at most max_wait seconds;
+    everything submitted before it closes (up to max_batch_size queries) is
+    embedded with a single get_text_embedding_batch call and searched with a
+    single vector store request per distinct filter set. Results are fanned
+    back out to the callers' futures. Up to concurrency batches are in flight
+    at once, so a slow batch does not hold back the next window.
+    """
+
+    def __init__(
+            self,
+            embed_model: BaseEmbedding,
+            vector_store: BasePydanticVectorStore,
+            max_wait: float = 0.005,
+            max_batch_size: int = 32,
+            concurrency: int = 4
+    ):
+        self.embed_model = embed_model
+        self.vector_store = vector_store
+        self.max_wait = max_wait
+        self.max_batch_size = max_batch_size
+        self._queue: "queue.Queue[_Pending]" = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="coalescer")
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(("queries", "batches", "embed_seconds", "search_seconds", "wait_seconds"), 0)
+        self._collector = threading.Thread(target=self._collect, name="coalescer-collector", daemon=True)
+        self._collector.start()
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+        batches = stats["batches"] or 1
+        stats["avg_batch_size"] = stats["queries"] / batches
+        stats["avg_wait_ms"] = 1000 * stats["wait_seconds"] / (stats["queries"] or 1)
+        return stats
+
+    def submit(self, query: str, top_k: int, filters: Optional[MetadataFilters] = None) -> Future:
+        """Queue a lookup; the future resolves to (query embedding, VectorStoreQueryResult)"""
+        pending = _Pending(query, top_k, filters)
+        self._queue.put(pending)
+        return pending.future
+
+    def search(self, query: str, top_k: int,
+               filters: Optional[MetadataFilters] = None) -> Tuple[List[float], VectorStoreQueryResult]:
+        return self.submit(query, top_k, filters).result()
+
+    async def asearch(self, query: str, top_k: int,
+                      filters: Optional[MetadataFilters] = None) -> Tuple[List[float], VectorStoreQueryResult]:
+        return await asyncio.wrap_future(self.submit(query, top_k, filters))
+
+    def _collect(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._executor.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch: List[_Pending]):
+        start = time.perf_counter()
+        try:
+            # Identical texts in one window are embedded once
+            texts = list(dict.fromkeys(p.query for p in batch))
+            vectors = dict(zip(texts, self.embed_model.get_text_embedding_batch(texts)))
+            embedded = time.perf_counter()
+
+            groups: Dict[str, List[_Pending]] = {}
+            for p in batch:
+                groups.setdefault(repr(p.filters), []).append(p)
+            for group in groups.values():
+                top_k = max(p.top_k for p in group)
+                results = query_batch(
+                    self.vector_store, [vectors[p.query] for p in group], top_k, group[0].filters
+                )
+                for p, result in zip(group, results):
+                    p.future.set_result((vectors[p.query], self._truncate(result, p.top_k)))
+        except Exception as e:
+            logging.error(f"❌ Coalesced search of {len(batch)} queries failed: {e}")
+            for p in batch:
+                if not p.future.done():
+                    p.future.set_exception(e)
+            return
+
+        with self._lock:
+            self._stats["queries"] += len(batch)
+            self._stats["batches"] += 1
+            self._stats["embed_seconds"] += embedded - start
+            self._stats["search_seconds"] += time.perf_counter() - embedded
+            self._stats["wait_seconds"] += sum(start - p.enqueued for p in batch)
+
+    @staticmethod
+    def _truncate(result: VectorStoreQueryResult, top_k: int) -> VectorStoreQueryResult:
+        if len(result.nodes or []) <= top_k:
+            return result
+        return VectorStoreQueryResult(
+            nodes=result.nodes[:top_k],
+            similarities=result.similarities[:top_k] if result.similarities else None,
+            ids=result.ids[:top_k] if result.ids else None,
+        )
+
+
+class CoalescingRetriever(BaseRetriever):
+    """Dense retriever whose embedding and search calls are shared with concurrent requests"""
+
+    def __init__(self, coalescer: QueryCoalescer, similarity_top_k: int = 5,
+                 filters: Optional[MetadataFilters] = None, **kwargs: Any):
+        kwargs.setdefault("callback_manager", settings.callback_manager)
+        super().__init__(**kwargs)
+        self.coalescer = coalescer
+        self.similarity_top_k = similarity_top_k
+        self.filters = filters
+
+    @staticmethod
+    def _to_nodes(result: VectorStoreQueryResult) -> List[NodeWithScore]:
+        similarities = result.similarities or [None] * len(result.nodes or [])
+        return [NodeWithScore(node=node, score=score) for node, score in zip(result.nodes or [], similarities)]
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        _, result = self.coalescer.search(query_bundle.query_str, self.similarity_top_k, self.filters)
+        return self._to_nodes(result)
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        _, result = await self.coalescer.asearch(query_bundle.query_str, self.similarity_top_k, self.filters)
+        return self._to_nodes(result)
@@ -0,0 +1,253 @@
+import argparse
+import logging
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.embeddings import BaseEmbedding
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import BaseNode, NodeWithScore, QueryBundle
+from llama_index.core.utils import get_tokenizer
+
+from config.telemetry import record
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+# Shorter edge sentences ("Q3.", "Yes.") are too generic to call a fragment of anything
+_MIN_FRAGMENT_CHARS = 40
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_BOUNDARY.split(text) if s.strip()]
+
+
+def _normalize(sentence: str) -> str:
+    return re.sub(r"\W+", " ", sentence).strip().lower()
+
+
+class ContextCompressor(BaseNodePostprocessor):
+    """Extractive compression of reranked chunks down to a hard token budget
+
+    Chunks are split into sentences. Sentences repeated across chunks, such as
+    the CHUNK_OVERLAP region shared by neighbours, are kept only once. A
+    partial sentence at a chunk edge is dropped when it is part of a sentence
+    already kept from the same or a neighbouring chunk. The rest are scored by cosine similarity
+    to the query; text embeddings go through the same cached model used at
+    ingest, so repeat queries over the same chunks cost no embedding calls.
+    Sentences are added best first until token_budget is reached, dropping
+    anything below min_relative_score of the min-max normalised range. Each
+    chunk's surviving sentences keep their original order and chunks keep the
+    reranker's order, so the strongest evidence leads the prompt. If not even
+    one sentence fits the budget, the top chunk is truncated to it instead.
+    """
+
+    token_budget: int = Field(default=1500)
+    min_relative_score: float = Field(default=0.25)
+
+    _embed_model: BaseEmbedding = PrivateAttr()
+    _tokenizer: Callable = PrivateAttr()
+    _lock: Any = PrivateAttr()
+    _stats: Dict[str, float] = PrivateAttr()
+
+    def __init__(self, embed_model: BaseEmbedding, tokenizer: Optional[Callable] = None, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._embed_model = embed_model
+        self._tokenizer = tokenizer or get_tokenizer()
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(
+            ("queries", "tokens_before", "tokens_after", "sentences_before", "sentences_after", "duplicates"), 0
+        )
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "ContextCompressor"
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+        queries = stats["queries"] or 1
+        stats["avg_tokens_before"] = stats["tokens_before"] / queries
+        stats["avg_tokens_after"] = stats["tokens_after"] / queries
+        stats["compression_ratio"] = stats["tokens_after"] / (stats["tokens_before"] or 1)
+        return stats
+
+    def _count(self, text: str) -> int:
+        return len(self._tokenizer(text))
+
+    def _postprocess_nodes(
+            self,
+            nodes: List[NodeWithScore],
+            query_bundle: Optional[QueryBundle] = None,
+    ) -> List[NodeWithScore]:
+        if query_bundle is None or not nodes:
+            return nodes
+        start = time.perf_counter()
+        sentences, duplicates = self._candidate_sentences(nodes)
+        if not sentences:
+            return nodes
+
+        query = self._embed_model.get_query_embedding(query_bundle.query_str)
+        vectors = self._embed_model.get_text_embedding_batch([text for _, _, text in sentences])
+        return self._select(nodes, sentences, duplicates, query, vectors, start)
+
+    async def acompress(self, nodes: List[NodeWithScore], query_bundle: QueryBundle) -> List[NodeWithScore]:
+        """Async variant of postprocess_nodes"""
+        if not nodes:
+            return nodes
+        start = time.perf_counter()
+        sentences, duplicates = self._candidate_sentences(nodes)
+        if not sentences:
+            return nodes
+
+        query = await self._embed_model.aget_query_embedding(query_bundle.query_str)
+        vectors = await self._embed_model.aget_text_embedding_batch([text for _, _, text in sentences])
+        return self._select(nodes, sentences, duplicates, query, vectors, start)
+
+    def _candidate_sentences(self, nodes: List[NodeWithScore]) -> Tuple[List[Tuple[int, int, str]], int]:
+        """(node index, position, text) for every sentence not already seen in a better-ranked chunk"""
+        sentences, seen, duplicates = [], set(), 0
+        keys_by_node: Dict[str, List[str]] = {}
+        for i, n in enumerate(nodes):
+            texts = split_sentences(n.node.get_content())
+            neighbours = self._neighbours(n.node)
+            for position, text in enumerate(texts):
+                key = _normalize(text)
+                if not key or key in seen:
+                    duplicates += 1
+                    continue
+                # Overlap windows cut sentences at chunk edges; such a fragment duplicates
+                # a sentence of the same or a neighbouring chunk
+                if (position in (0, len(texts) - 1) and len(key) >= _MIN_FRAGMENT_CHARS
+                        and any(key in other for node_id in neighbours for other in keys_by_node.get(node_id, ()))):
+                    duplicates += 1
+                    continue
+                seen.add(key)
+                keys_by_node.setdefault(n.node.node_id, []).append(key)
+                sentences.append((i, position, text))
+        return sentences, duplicates
+
+    @staticmethod
+    def _neighbours(node: BaseNode) -> List[str]:
+        ids = [node.node_id]
+        for related in (node.prev_node, node.next_node):
+            if related is not None:
+                ids.append(related.node_id)
+        return ids
+
+    def _truncate(self, text: str) -> str:
+        """Longest word prefix of text within token_budget"""
+        words = text.split()
+        cut = len(words) * self.token_budget // max(self._count(text), 1)
+        while cut > 0 and self._count(" ".join(words[:cut])) > self.token_budget:
+            cut = cut * 9 // 10
+        return " ".join(words[:cut])
+
+    def _select(self, nodes, sentences, duplicates, query, vectors, start) -> List[NodeWithScore]:
+        query = np.asarray(query, dtype=np.float32)
+        matrix = np.asarray(vectors, dtype=np.float32)
+        similarity = matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query) + 1e-12)
+        spread = float(similarity.max() - similarity.min())
+        relative = (similarity - similarity.min()) / spread if spread > 0 else np.ones_like(similarity)
+
+        tokens = [self._count(text) for _, _, text in sentences]
+        kept, used = set(), 0
+        for idx in np.argsort(-similarity):
+            if kept and relative[idx] < self.min_relative_score:
+                break
+            if used + tokens[idx] > self.token_budget:
+                continue
+            kept.add(int(idx))
+            used += tokens[idx]
+
+        by_node: Dict[int, List[Tuple[int, str]]] = {}
+        for idx in sorted(kept):
+            node_index, position, text = sentences[idx]
+            by_node.setdefault(node_index, []).append((position, text))
+
+        compressed = []
+        for node_index, n in enumerate(nodes):
+            if node_index not in by_node:
+                continue
+            node = n.node.model_copy()
+            node.set_content(" ".join(text for _, text in sorted(by_node[node_index])))
+            compressed.append(NodeWithScore(node=node, score=n.score))
+        if not compressed:
+            # Every sentence is over budget on its own; an empty context would be worse
+            node = nodes[0].node.model_copy()
+            node.set_content(self._truncate(nodes[0].node.get_content()))
+            compressed.append(NodeWithScore(node=node, score=nodes[0].score))
+            used = self._count(node.get_content())
+
+        tokens_before = sum(self._count(n.node.get_content()) for n in nodes)
+        with self._lock:
+            self._stats["queries"] += 1
+            self._stats["tokens_before"] += tokens_before
+            self._stats["tokens_after"] += used
+            self._stats["sentences_before"] += len(sentences) + duplicates
+            self._stats["sentences_after"] += len(kept)
+            self._stats["duplicates"] += duplicates
+        record("compress", start, time.perf_counter() - start, tokens_before=tokens_before, tokens_after=used)
+        logging.debug(f"Context compressed from {tokens_before} to {used} tokens ({duplicates} duplicate sentences)")
+        return compressed
+
+
+def compression_quality_check(
+        query_engine,
+        compressor: ContextCompressor,
+        queries: List[str],
+        evaluator=None
+) -> Dict[str, float]:
+    """Answer each query with the full and the compressed context, scoring both with PipelineEvaluator"""
+    from data_pipeline.evaluator import PipelineEvaluator
+
+    evaluator = evaluator or PipelineEvaluator()
+    report = dict.fromkeys(("tokens_before", "tokens_after", "score_full", "score_compressed"), 0.0)
+    for query in queries:
+        nodes = query_engine.reranker.rerank(query, query_engine.retriever.retrieve(query))
+        compressed = compressor.postprocess_nodes(nodes, query_str=query)
+        for label, context in (("full", nodes), ("compressed", compressed)):
+            answer = str(query_engine.synthesizer.synthesize(query, context))
+            _, score = evaluator.evaluate_response(query, answer, [n.node.get_content() for n in context])
+            report[f"score_{label}"] += score
+        report["tokens_before"] += sum(compressor._count(n.node.get_content()) for n in nodes)
+        report["tokens_after"] += sum(compressor._count(n.node.get_content()) for n in compressed)
+
+    count = len(queries) or 1
+    report = {name: value / count for name, value in report.items()}
+    report["compression_ratio"] = report["tokens_after"] / (report["tokens_before"] or 1)
+    report["queries"] = len(queries)
+    return report
+
+
+if __name__ == "__main__":
+    from config.settings import settings
+    from data_pipeline.loader import AdvancedDocumentLoader
+    from main import initialize_system
+
+    parser = argparse.ArgumentParser(description="Compare answer quality with and without context compression")
+    parser.add_argument("--queries", nargs="*", default=None)
+    parser.add_argument("--sample-size", type=int, default=10)
+    parser.add_argument("--token-budget", type=int, default=settings.CONTEXT_TOKEN_BUDGET)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    app = initialize_system()
+    queries = args.queries
+    if not queries:
+        # Pseudo-queries: the opening sentence of a sample of chunks
+        chunks = AdvancedDocumentLoader().load_and_chunk()
+        sample = random.Random(0).sample(chunks, min(args.sample_size, len(chunks)))
+        queries = [split_sentences(n.get_content())[0] for n in sample]
+
+    checker = ContextCompressor(
+        embed_model=settings.embed_model,
+        token_budget=args.token_budget,
+        min_relative_score=settings.CONTEXT_MIN_RELATIVE_SCORE
+    )
+    report = compression_quality_check(app.query_engine, checker, queries, evaluator=app.evaluator)
+    for name, value in report.items():
+        print(f"{name}: {value}")
@@ -0,0 +1,68 @@
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Sequence, Union
+
+from llama_index.core.vector_stores.types import FilterOperator, MetadataFilter, MetadataFilters
+
+# Node metadata keys written by DocumentProcessor, stored as indexed scalar fields in Milvus
+FILTER_FIELDS = ("document_id", "source_file", "doc_type", "ingested_at")
+
+Values = Union[str, Sequence[str]]
+Timestamp = Union[int, float, str, datetime]
+
+_active_filters: contextvars.ContextVar[Optional[MetadataFilters]] = contextvars.ContextVar(
+    "rag_filters", default=None
+)
+
+
+def _epoch(value: Timestamp) -> int:
+    if isinstance(value, datetime):
+        moment = value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+        return int(moment.timestamp())
+    if isinstance(value, str):
+        return _epoch(datetime.fromisoformat(value))
+    return int(value)
+
+
+def _match(key: str, values: Optional[Values]) -> List[MetadataFilter]:
+    if values is None:
+        return []
+    if isinstance(values, str):
+        return [MetadataFilter(key=key, value=values, operator=FilterOperator.EQ)]
+    return [MetadataFilter(key=key, value=list(values), operator=FilterOperator.IN)]
+
+
+def build_filters(
+        document_id: Optional[Values] = None,
+        source_file: Optional[Values] = None,
+        doc_type: Optional[Values] = None,
+        ingested_after: Optional[Timestamp] = None,
+        ingested_before: Optional[Timestamp] = None
+) -> Optional[MetadataFilters]:
+    """AND of the given constraints; a list matches any of its values, times are epoch seconds,
+    datetimes or ISO strings (naive ones taken as UTC). None when nothing is constrained."""
+    filters = _match("document_id", document_id) + _match("source_file", source_file) + _match("doc_type", doc_type)
+    if ingested_after is not None:
+        filters.append(MetadataFilter(key="ingested_at", value=_epoch(ingested_after), operator=FilterOperator.GTE))
+    if ingested_before is not None:
+        filters.append(MetadataFilter(key="ingested_at", value=_epoch(ingested_before), operator=FilterOperator.LT))
+    return MetadataFilters(filters=filters) if filters else None
+
+
+def active_filters() -> Optional[MetadataFilters]:
+    """Filters of the query being answered, seen by every retrieval it triggers (agent tool calls included)"""
+    return _active_filters.get()
+
+
+@contextmanager
+def scoped_filters(filters: Optional[MetadataFilters]) -> Iterator[None]:
+    token = _active_filters.set(filters)
+    try:
+        yield
+    finally:
+        try:
+            _active_filters.reset(token)
+        except ValueError:
+            # A generator finished from another context; the var dies with that context
+            pass
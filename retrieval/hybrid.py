@@ -0,0 +1,126 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Literal, Optional, Set, Tuple
+
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from llama_index.core.vector_stores.types import BasePydanticVectorStore, MetadataFilters
+
+from config.settings import settings
+from config.telemetry import bind_context, span
+from retrieval.bm25_index import BM25Index
+
+# Shared by every HybridRetriever so the lexical search runs beside the dense one
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hybrid")
+
+
+def reciprocal_rank_fusion(ranked_lists: List[List[str]], k: int = 60) -> Dict[str, float]:
+    scores: Dict[str, float] = {}
+    for ranked in ranked_lists:
+        for rank, node_id in enumerate(ranked):
+            scores[node_id] = scores.get(node_id, 0.0) + 1.0 / (k + rank + 1)
+    return scores
+
+
+def weighted_score_fusion(dense: List[Tuple[str, float]], sparse: List[Tuple[str, float]],
+                          alpha: float) -> Dict[str, float]:
+    """alpha * dense + (1 - alpha) * sparse, each min-max normalised to [0, 1]"""
+    def normalise(pairs):
+        if not pairs:
+            return {}
+        values = [score for _, score in pairs]
+        low, high = min(values), max(values)
+        span = (high - low) or 1.0
+        return {node_id: (score - low) / span for node_id, score in pairs}
+
+    dense_norm, sparse_norm = normalise(dense), normalise(sparse)
+    return {
+        node_id: alpha * dense_norm.get(node_id, 0.0) + (1 - alpha) * sparse_norm.get(node_id, 0.0)
+        for node_id in set(dense_norm) | set(sparse_norm)
+    }
+
+
+class HybridRetriever(BaseRetriever):
+    """Dense retrieval and BM25 run concurrently, fused by RRF or weighted score
+
+    With filters, the dense search is filtered by the vector store. BM25 only
+    scores the chunk ids the vector store reports as matching. When more
+    than max_filter_ids match, it instead over-fetches filter_overfetch times
+    the candidates and fusion drops the excluded ones. That fallback only
+    applies to broad filters, where most lexical hits pass anyway.
+    """
+
+    def __init__(
+            self,
+            dense_retriever: BaseRetriever,
+            lexical_index: BM25Index,
+            vector_store: BasePydanticVectorStore,
+            similarity_top_k: int = 5,
+            candidate_k: int = 20,
+            fusion: Literal["rrf", "weighted"] = "rrf",
+            alpha: float = 0.5,
+            rrf_k: int = 60,
+            filters: Optional[MetadataFilters] = None,
+            max_filter_ids: int = 16000,
+            filter_overfetch: int = 5
+    ):
+        super().__init__(callback_manager=settings.callback_manager)
+        self.dense_retriever = dense_retriever
+        self.lexical_index = lexical_index
+        self.vector_store = vector_store
+        self.similarity_top_k = similarity_top_k
+        self.candidate_k = candidate_k
+        self.fusion = fusion
+        self.alpha = alpha
+        self.rrf_k = rrf_k
+        self.filters = filters
+        self.max_filter_ids = max_filter_ids
+        self.filter_overfetch = filter_overfetch
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        lexical = _executor.submit(bind_context(self._lexical_search), query_bundle.query_str)
+        dense = self.dense_retriever.retrieve(query_bundle)
+        return self._fuse(dense, lexical.result())
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        loop = asyncio.get_running_loop()
+        lexical = loop.run_in_executor(_executor, bind_context(self._lexical_search), query_bundle.query_str)
+        dense, lexical_hits = await asyncio.gather(self.dense_retriever.aretrieve(query_bundle), lexical)
+        return self._fuse(dense, lexical_hits)
+
+    def _lexical_search(self, query: str) -> List[Tuple[str, float]]:
+        with span("retrieve.lexical"):
+            if self.filters is None:
+                return self.lexical_index.search(query, self.candidate_k)
+            allowed = self._allowed_ids()
+            if allowed is not None:
+                return self.lexical_index.search(query, self.candidate_k, allowed=allowed)
+            return self.lexical_index.search(query, self.candidate_k * self.filter_overfetch)
+
+    def _allowed_ids(self) -> Optional[Set[str]]:
+        resolve = getattr(self.vector_store, "filtered_ids", None)
+        if resolve is None:
+            return None
+        ids = resolve(self.filters, limit=self.max_filter_ids)
+        return set(ids) if ids is not None else None
+
+    def _fuse(self, dense: List[NodeWithScore], lexical: List[Tuple[str, float]]) -> List[NodeWithScore]:
+        dense_pairs = [(n.node.node_id, n.score or 0.0) for n in dense]
+        if self.fusion == "weighted":
+            fused = weighted_score_fusion(dense_pairs, lexical, self.alpha)
+        else:
+            fused = reciprocal_rank_fusion(
+                [[node_id for node_id, _ in dense_pairs], [node_id for node_id, _ in lexical]],
+                k=self.rrf_k
+            )
+
+        ranked = sorted(fused, key=fused.get, reverse=True)
+        if self.filters is None:
+            ranked = ranked[:self.similarity_top_k]
+        nodes = {n.node.node_id: n.node for n in dense}
+        missing = [node_id for node_id in ranked if node_id not in nodes]
+        if missing:
+            # Lexical-only hits: fetch their content; the filters drop any left by the over-fetch fallback
+            for node in self.vector_store.get_nodes(node_ids=missing, filters=self.filters):
+                nodes[node.node_id] = node
+        return [NodeWithScore(node=nodes[i], score=fused[i]) for i in ranked if i in nodes][:self.similarity_top_k]
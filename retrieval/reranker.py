@@ -1,15 +1,43 @@
 from llama_index.core.postprocessor import LLMRerank
-from llama_index.llms.openai import OpenAI
-from typing import List
-from llama_index.core.schema import NodeWithScore
+from typing import List, Optional
+import asyncio
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from config.limits import limits
 from config.settings import settings
+from retrieval.tiered_reranker import TieredReranker
 
 class AdvancedReranker:
-    def __init__(self):
-        self.reranker = LLMRerank(
-            llm=settings.llm,
-            top_n=5  # return top 3 after reranking
-        )
+    def __init__(self, mode: Optional[str] = None, top_n: int = 5):
+        self.mode = mode or settings.RERANK_MODE
+        if self.mode == "tiered":
+            # Embedding pass first, LLM only when the top candidates are too close to call
+            self.reranker = TieredReranker(
+                embed_model=settings.embed_model,
+                llm=settings.llm,
+                top_n=top_n,
+                score_gap=settings.RERANK_SCORE_GAP,
+                use_mmr=settings.RERANK_USE_MMR,
+                llm_candidates=settings.RERANK_LLM_CANDIDATES,
+                llm_batch_size=settings.RERANK_LLM_BATCH_SIZE,
+                llm_concurrency=settings.RERANK_LLM_CONCURRENCY
+            )
+        elif self.mode == "llm":
+            self.reranker = LLMRerank(
+                llm=settings.llm,
+                top_n=top_n  # return top 5 after reranking
+            )
+        else:
+            raise ValueError(f"Unknown rerank mode: {self.mode}")
+
+    @property
+    def stats(self):
+        return getattr(self.reranker, "stats", None)
 
     def rerank(self, query: str, nodes: List[NodeWithScore]) -> List[NodeWithScore]:
-        return self.reranker.postprocess_nodes(nodes, query_str=query)
\ No newline at end of file
+        return self.reranker.postprocess_nodes(nodes, query_str=query)
+
+    async def arerank(self, query: str, nodes: List[NodeWithScore]) -> List[NodeWithScore]:
+        if isinstance(self.reranker, TieredReranker):
+            return await self.reranker.arerank(nodes, QueryBundle(query_str=query))
+        async with limits("llm"):
+            return await asyncio.to_thread(self.rerank, query, nodes)
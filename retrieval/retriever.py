@@ -1,23 +1,77 @@
 from llama_index.core.retrievers import VectorIndexRetriever
 from llama_index.core import VectorStoreIndex
-from llama_index.vector_stores.milvus import MilvusVectorStore
-from llama_index.core.schema import BaseNode
-from typing import List
+from llama_index.core.vector_stores.types import BasePydanticVectorStore, MetadataFilters
+from llama_index.core.schema import BaseNode, QueryBundle
+from typing import List, Optional
+import asyncio
+from config.limits import limits
 from config.settings import settings
+from retrieval.bm25_index import BM25Index
+from retrieval.hybrid import HybridRetriever
+from retrieval.coalescer import QueryCoalescer, CoalescingRetriever
+from retrieval.filters import active_filters
 
 class AdvancedRetriever:
-    def __init__(self, vector_store: MilvusVectorStore):
-        self.index = VectorStoreIndex.from_vector_store(vector_store)
+    def __init__(
+            self,
+            vector_store: BasePydanticVectorStore,
+            lexical_index: Optional[BM25Index] = None,
+            coalescer: Optional[QueryCoalescer] = None
+    ):
+        self.vector_store = vector_store
+        self.lexical_index = lexical_index
+        self.coalescer = coalescer
+        # Query embeddings go through the same (cached) model used at ingest
+        self.embed_model = settings.embed_model
+        self.index = VectorStoreIndex.from_vector_store(
+            vector_store,
+            embed_model=self.embed_model
+        )
+
+    def get_retriever(self, similarity_top_k: int = 5, filters: Optional[MetadataFilters] = None):
+        """Create hybrid retriever with bm25 and vector search, or dense-only without a lexical index
+
+        filters (default: those of the query being answered, see
+        retrieval.filters) are evaluated by the vector store during the search.
+        """
+        filters = filters or active_filters()
+        if self.lexical_index is None:
+            return self._dense_retriever(similarity_top_k, filters)
 
-    def get_retriever(self, similarity_top_k: int = 5):
-        """Create hybrid retriever with bm25 and vector search"""
-        return VectorIndexRetriever(
-            index=self.index,
+        candidate_k = similarity_top_k * settings.HYBRID_CANDIDATE_MULTIPLIER
+        return HybridRetriever(
+            dense_retriever=self._dense_retriever(candidate_k, filters),
+            lexical_index=self.lexical_index,
+            vector_store=self.vector_store,
+            filters=filters,
             similarity_top_k=similarity_top_k,
-            vector_store_query_mode="hybrid",
-            alpha=0.5  # balance between bm25 and vector search
+            candidate_k=candidate_k,
+            fusion=settings.HYBRID_FUSION,
+            alpha=settings.HYBRID_ALPHA,  # balance between vector and bm25 in weighted fusion
+            max_filter_ids=settings.HYBRID_FILTER_MAX_IDS
         )
 
-    def retrieve(self, query: str, top_k: int = 5) -> List[BaseNode]:
-        retriever = self.get_retriever(similarity_top_k=top_k)
-        return retriever.retrieve(query)
\ No newline at end of file
+    def _dense_retriever(self, similarity_top_k: int, filters: Optional[MetadataFilters] = None):
+        if self.coalescer is not None:
+            return CoalescingRetriever(self.coalescer, similarity_top_k=similarity_top_k, filters=filters)
+        return VectorIndexRetriever(index=self.index, similarity_top_k=similarity_top_k, filters=filters)
+
+    def retrieve(self, query: str, top_k: int = 5, filters: Optional[MetadataFilters] = None) -> List[BaseNode]:
+        retriever = self.get_retriever(similarity_top_k=top_k, filters=filters)
+        return retriever.retrieve(query)
+
+    async def aretrieve(self, query: str, top_k: int = 5,
+                        filters: Optional[MetadataFilters] = None) -> List[BaseNode]:
+        """Embed and search without blocking the event loop, each step under its downstream limit"""
+        if self.coalescer is not None:
+            # The coalescer batches embedding and search across concurrent callers itself
+            return await self.get_retriever(similarity_top_k=top_k, filters=filters).aretrieve(query)
+
+        async with limits("embedding"):
+            embedding = await self.embed_model.aget_query_embedding(query)
+        retriever = self.get_retriever(similarity_top_k=top_k, filters=filters)
+        # Vector store clients are synchronous; the search runs on a worker thread
+        async with limits("vector_store"):
+            return await asyncio.to_thread(
+                retriever.retrieve, QueryBundle(query_str=query, embedding=embedding)
+            )
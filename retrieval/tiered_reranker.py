@@ -0,0 +1,204 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.embeddings import BaseEmbedding
+from llama_index.core.llms import LLM
+from llama_index.core.postprocessor import LLMRerank
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import NodeWithScore, QueryBundle
+
+from config.limits import limits
+from config.telemetry import bind_context, record
+
+
+class TieredReranker(BaseNodePostprocessor):
+    """Cheap embedding pass first; the LLM reranker only runs when that pass is not confident
+
+    Tier 1 orders candidates by query similarity (optionally diversified with
+    MMR). The gate reads raw cosine similarity in that returned order. The
+    first candidate must lead the second by at least score_gap. The weakest
+    kept candidate must also lead the strongest dropped one by score_gap.
+    If both hold, tier 1's answer is kept. Otherwise the leading
+    llm_candidates go to LLMRerank in concurrent batches.
+    """
+
+    top_n: int = Field(default=5)
+    score_gap: float = Field(default=0.02)  # cosine units
+    use_mmr: bool = Field(default=True)
+    mmr_lambda: float = Field(default=0.7)
+    llm_candidates: int = Field(default=10)
+    llm_batch_size: int = Field(default=5)
+    llm_concurrency: int = Field(default=4)
+
+    _embed_model: BaseEmbedding = PrivateAttr()
+    _llm: LLM = PrivateAttr()
+    _lock: Any = PrivateAttr()
+    _stats: Dict[str, float] = PrivateAttr()
+
+    def __init__(self, embed_model: BaseEmbedding, llm: LLM, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._embed_model = embed_model
+        self._llm = llm
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(
+            ("queries", "escalations", "tier1_seconds", "gate_seconds", "llm_seconds"), 0
+        )
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "TieredReranker"
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+        queries = stats["queries"] or 1
+        stats["escalation_rate"] = stats["escalations"] / queries
+        stats["avg_tier1_ms"] = 1000 * stats["tier1_seconds"] / queries
+        stats["avg_llm_ms"] = 1000 * stats["llm_seconds"] / max(stats["escalations"], 1)
+        return stats
+
+    def _record(self, **values: float):
+        with self._lock:
+            for key, value in values.items():
+                self._stats[key] += value
+
+    def _postprocess_nodes(
+            self,
+            nodes: List[NodeWithScore],
+            query_bundle: Optional[QueryBundle] = None,
+    ) -> List[NodeWithScore]:
+        if query_bundle is None or not nodes:
+            return nodes[:self.top_n]
+
+        start = time.perf_counter()
+        query = self._embed_model.get_query_embedding(query_bundle.query_str)
+        missing = [n for n in nodes if n.node.embedding is None]
+        if missing:
+            # Chunk texts were embedded at ingest, so these are embedding-cache hits
+            self._assign(missing, self._embed_model.get_text_embedding_batch(
+                [n.node.get_content() for n in missing]
+            ))
+        ranked, relevance = self._first_pass(nodes, query)
+        tier1_done = time.perf_counter()
+
+        confident = self._is_confident(relevance)
+        gate_done = time.perf_counter()
+        self._record(queries=1, tier1_seconds=tier1_done - start, gate_seconds=gate_done - tier1_done)
+        record("rerank.tier1", start, gate_done - start, candidates=len(nodes), escalated=not confident)
+        if confident:
+            return ranked[:self.top_n]
+
+        reranked = self._llm_rerank(ranked[:self.llm_candidates], query_bundle)
+        self._record(escalations=1, llm_seconds=time.perf_counter() - gate_done)
+        record("rerank.escalation", gate_done, time.perf_counter() - gate_done)
+        # LLMRerank drops candidates it considers irrelevant; never return less than tier 1 would
+        return reranked or ranked[:self.top_n]
+
+    async def arerank(self, nodes: List[NodeWithScore], query_bundle: QueryBundle) -> List[NodeWithScore]:
+        """Async variant; embedding and LLM calls respect the shared downstream limits"""
+        if not nodes:
+            return nodes
+
+        start = time.perf_counter()
+        async with limits("embedding"):
+            query = await self._embed_model.aget_query_embedding(query_bundle.query_str)
+            missing = [n for n in nodes if n.node.embedding is None]
+            if missing:
+                self._assign(missing, await self._embed_model.aget_text_embedding_batch(
+                    [n.node.get_content() for n in missing]
+                ))
+        ranked, relevance = self._first_pass(nodes, query)
+        tier1_done = time.perf_counter()
+
+        confident = self._is_confident(relevance)
+        gate_done = time.perf_counter()
+        self._record(queries=1, tier1_seconds=tier1_done - start, gate_seconds=gate_done - tier1_done)
+        record("rerank.tier1", start, gate_done - start, candidates=len(nodes), escalated=not confident)
+        if confident:
+            return ranked[:self.top_n]
+
+        candidates = ranked[:self.llm_candidates]
+
+        async def rerank(batch: List[NodeWithScore]) -> List[NodeWithScore]:
+            async with limits("llm"):
+                return await asyncio.to_thread(self._rerank_batch, batch, query_bundle)
+
+        results = await asyncio.gather(*(rerank(batch) for batch in self._batches(candidates)))
+        reranked = self._merge(results)
+        self._record(escalations=1, llm_seconds=time.perf_counter() - gate_done)
+        record("rerank.escalation", gate_done, time.perf_counter() - gate_done)
+        return reranked or ranked[:self.top_n]
+
+    @staticmethod
+    def _assign(nodes: List[NodeWithScore], vectors: List[List[float]]):
+        for n, vector in zip(nodes, vectors):
+            n.node.embedding = vector
+
+    def _first_pass(self, nodes: List[NodeWithScore], query_embedding: List[float]):
+        """Order by cosine similarity to the query, MMR-diversified if enabled"""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        docs = np.asarray([n.node.embedding for n in nodes], dtype=np.float32)
+        docs /= np.linalg.norm(docs, axis=1, keepdims=True) + 1e-12
+        query /= np.linalg.norm(query) + 1e-12
+        similarity = docs @ query
+
+        if self.use_mmr:
+            order = self._mmr(docs, similarity)
+        else:
+            order = list(np.argsort(-similarity))
+
+        ranked = [NodeWithScore(node=nodes[i].node, score=float(similarity[i])) for i in order]
+        return ranked, similarity[order]
+
+    def _mmr(self, docs: np.ndarray, similarity: np.ndarray) -> List[int]:
+        selected: List[int] = []
+        remaining = list(range(len(docs)))
+        while remaining:
+            if selected:
+                redundancy = (docs[remaining] @ docs[selected].T).max(axis=1)
+            else:
+                redundancy = np.zeros(len(remaining), dtype=np.float32)
+            mmr = self.mmr_lambda * similarity[remaining] - (1 - self.mmr_lambda) * redundancy
+            best = remaining[int(np.argmax(mmr))]
+            selected.append(best)
+            remaining.remove(best)
+        return selected
+
+    def _is_confident(self, relevance: np.ndarray) -> bool:
+        """relevance holds cosine similarities in returned order; MMR may put a weaker one first"""
+        if len(relevance) <= 1:
+            return True
+        top_margin = float(relevance[0] - relevance[1])
+        if len(relevance) <= self.top_n:
+            # Everything is kept; only the ordering of the best candidate is in question
+            return top_margin >= self.score_gap
+        cut_margin = float(relevance[:self.top_n].min() - relevance[self.top_n:].max())
+        return top_margin >= self.score_gap and cut_margin >= self.score_gap
+
+    def _batches(self, candidates: List[NodeWithScore]) -> List[List[NodeWithScore]]:
+        return [
+            candidates[i:i + self.llm_batch_size] for i in range(0, len(candidates), self.llm_batch_size)
+        ]
+
+    def _rerank_batch(self, batch: List[NodeWithScore], query_bundle: QueryBundle) -> List[NodeWithScore]:
+        reranker = LLMRerank(llm=self._llm, top_n=len(batch), choice_batch_size=len(batch))
+        return reranker.postprocess_nodes(batch, query_bundle=query_bundle)
+
+    def _merge(self, results: List[List[NodeWithScore]]) -> List[NodeWithScore]:
+        merged = [n for batch in results for n in batch]
+        merged.sort(key=lambda n: n.score or 0.0, reverse=True)
+        return merged[:self.top_n]
+
+    def _llm_rerank(self, candidates: List[NodeWithScore], query_bundle: QueryBundle) -> List[NodeWithScore]:
+        batches = self._batches(candidates)
+        if len(batches) == 1:
+            return self._merge([self._rerank_batch(batches[0], query_bundle)])
+        with ThreadPoolExecutor(max_workers=min(self.llm_concurrency, len(batches))) as pool:
+            futures = [pool.submit(bind_context(self._rerank_batch), b, query_bundle) for b in batches]
+            return self._merge([f.result() for f in futures])
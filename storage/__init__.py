@@ -1,24 +1,32 @@
 from .milvus_store import MilvusStorage
 import logging
-from pymilvus import (
-    connections,
-    FieldSchema, CollectionSchema, DataType,
-    Collection,
-)
 from config.settings import settings
 
-def initialize_milvus():
+def initialize_storage(serve_only: bool = False):
+    """Initialize the vector store backend selected by VECTOR_STORE_BACKEND
+
+    With serve_only the Milvus collection must already exist; it is attached
+    to as-is instead of being created.
+    """
+    if settings.VECTOR_STORE_BACKEND == "local":
+        from .local_store import LocalStorage
+        return LocalStorage()
+    if settings.VECTOR_STORE_BACKEND == "milvus":
+        return initialize_milvus(create_if_missing=not serve_only)
+    raise ValueError(f"Unknown vector store backend: {settings.VECTOR_STORE_BACKEND}")
+
+def initialize_milvus(create_if_missing: bool = True):
     """Initialize Milvus with comprehensive validation"""
     try:
         logging.info("Initializing Milvus storage...")
-        storage = MilvusStorage()
-
-        # Verify collection is accessible
-        col = Collection(settings.MILVUS_COLLECTION)
-        col.load()
+        storage = MilvusStorage(create_if_missing=create_if_missing)
 
-        if not col.is_empty:
-            logging.info(f"Collection '{settings.MILVUS_COLLECTION}' is ready with {col.num_entities} entities")
+        # Verify collection is accessible; MilvusVectorStore has already loaded it and
+        # segment stats need no second load()
+        client = storage.get_vector_store().client
+        row_count = int(client.get_collection_stats(settings.MILVUS_COLLECTION).get("row_count", 0))
+        if row_count:
+            logging.info(f"Collection '{settings.MILVUS_COLLECTION}' is ready with {row_count} entities")
         else:
             logging.info(f"Collection '{settings.MILVUS_COLLECTION}' is empty")
 
@@ -0,0 +1,380 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    FilterCondition,
+    FilterOperator,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import metadata_dict_to_node, node_to_metadata_dict
+
+from config.settings import settings
+from config.telemetry import traced
+
+_NUMERIC_OPERATORS = {
+    FilterOperator.GT: np.greater,
+    FilterOperator.GTE: np.greater_equal,
+    FilterOperator.LT: np.less,
+    FilterOperator.LTE: np.less_equal,
+}
+
+
+class _LocalIndex:
+    """Float32 memmap of embeddings plus a SQLite side store for node content
+
+    Row i of the matrix belongs to row i of the side store. Deletes only clear
+    the row's alive bit; updates of an existing node id reuse its row.
+    """
+
+    def __init__(self, path: str, dim: int, initial_capacity: int = 1024):
+        self.path = path
+        self.dim = dim
+        self._lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+
+        self._conn = sqlite3.connect(os.path.join(path, "nodes.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS nodes ("
+            "row INTEGER PRIMARY KEY, node_id TEXT UNIQUE NOT NULL, ref_doc_id TEXT, "
+            "metadata TEXT NOT NULL, content TEXT NOT NULL, alive INTEGER NOT NULL DEFAULT 1)"
+        )
+        self._conn.commit()
+
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        if not os.path.exists(self._vectors_path):
+            self._allocate(initial_capacity)
+        capacity = os.path.getsize(self._vectors_path) // (4 * dim)
+        self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, dim))
+
+        self.ids: List[str] = []
+        self.ref_doc_ids: List[Optional[str]] = []
+        self.metadata: List[Dict[str, Any]] = []
+        self.id_to_row: Dict[str, int] = {}
+        self.alive = np.zeros(capacity, dtype=bool)
+        for row, node_id, ref_doc_id, metadata, alive in self._conn.execute(
+                "SELECT row, node_id, ref_doc_id, metadata, alive FROM nodes ORDER BY row"
+        ):
+            self.ids.append(node_id)
+            self.ref_doc_ids.append(ref_doc_id)
+            self.metadata.append(json.loads(metadata))
+            self.id_to_row[node_id] = row
+            self.alive[row] = bool(alive)
+        self._columns: Dict[str, np.ndarray] = {}
+
+    @property
+    def count(self) -> int:
+        return len(self.ids)
+
+    @property
+    def capacity(self) -> int:
+        return self._matrix.shape[0]
+
+    @property
+    def live_count(self) -> int:
+        return int(self.alive[:self.count].sum())
+
+    def _allocate(self, capacity: int):
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(capacity * self.dim * 4)
+
+    def _grow(self, needed: int):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        self._matrix.flush()
+        del self._matrix
+        self._allocate(capacity)
+        self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self.alive)] = self.alive
+        self.alive = alive
+
+    def upsert(self, nodes: List[BaseNode]) -> List[str]:
+        with self._lock:
+            new = sum(1 for n in nodes if n.node_id not in self.id_to_row)
+            if self.count + new > self.capacity:
+                self._grow(self.count + new)
+
+            rows = []
+            for node in nodes:
+                metadata = dict(node.metadata)
+                content = json.dumps(node_to_metadata_dict(node, remove_text=False, flat_metadata=False))
+                row = self.id_to_row.get(node.node_id)
+                if row is None:
+                    row = self.count
+                    self.ids.append(node.node_id)
+                    self.ref_doc_ids.append(node.ref_doc_id)
+                    self.metadata.append(metadata)
+                    self.id_to_row[node.node_id] = row
+                else:
+                    self.ref_doc_ids[row] = node.ref_doc_id
+                    self.metadata[row] = metadata
+                self._matrix[row] = np.asarray(node.get_embedding(), dtype=np.float32)
+                self.alive[row] = True
+                rows.append((row, node.node_id, node.ref_doc_id, json.dumps(metadata), content))
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO nodes (row, node_id, ref_doc_id, metadata, content, alive) "
+                "VALUES (?, ?, ?, ?, ?, 1)",
+                rows
+            )
+            self._columns.clear()
+            return [node.node_id for node in nodes]
+
+    def delete_rows(self, rows: List[int]):
+        with self._lock:
+            if not rows:
+                return
+            self.alive[rows] = False
+            self._conn.executemany("UPDATE nodes SET alive = 0 WHERE row = ?", [(r,) for r in rows])
+
+    def persist(self):
+        with self._lock:
+            self._matrix.flush()
+            self._conn.commit()
+
+    def load_nodes(self, rows: List[int]) -> List[BaseNode]:
+        if not rows:
+            return []
+        placeholders = ",".join("?" * len(rows))
+        with self._lock:
+            found = dict(self._conn.execute(
+                f"SELECT row, content FROM nodes WHERE row IN ({placeholders})", rows
+            ).fetchall())
+        return [metadata_dict_to_node(json.loads(found[row])) for row in rows]
+
+    def column(self, key: str) -> np.ndarray:
+        """Metadata values for key as an object array, cached until the next write"""
+        with self._lock:
+            values = self._columns.get(key)
+            if values is None or len(values) != self.count:
+                values = np.empty(self.count, dtype=object)
+                values[:] = [m.get(key) for m in self.metadata]
+                self._columns[key] = values
+            return values
+
+    def filter_mask(self, filters: Optional[MetadataFilters]) -> np.ndarray:
+        """Live rows passing filters, as of one consistent snapshot of the row count"""
+        with self._lock:
+            mask = self.alive[:self.count].copy()
+            if filters is None or not filters.filters:
+                return mask
+            masks = [self._mask_for(f) for f in filters.filters]
+            if filters.condition == FilterCondition.OR:
+                combined = np.logical_or.reduce(masks)
+            else:
+                combined = np.logical_and.reduce(masks)
+            return mask & combined
+
+    def _mask_for(self, f) -> np.ndarray:
+        if isinstance(f, MetadataFilters):
+            return self.filter_mask(f)
+
+        column = self.column(f.key)
+        operator = f.operator
+        if operator == FilterOperator.EQ:
+            return column == f.value
+        if operator == FilterOperator.NE:
+            return column != f.value
+        if operator in _NUMERIC_OPERATORS:
+            numeric = np.array(
+                [v if isinstance(v, (int, float)) else np.nan for v in column], dtype=np.float64
+            )
+            with np.errstate(invalid="ignore"):
+                return _NUMERIC_OPERATORS[operator](numeric, f.value)
+        if operator in (FilterOperator.IN, FilterOperator.NIN):
+            values = set(f.value)
+            mask = np.fromiter((v in values for v in column), dtype=bool, count=len(column))
+            return mask if operator == FilterOperator.IN else ~mask
+        if operator == FilterOperator.CONTAINS:
+            return np.fromiter(
+                (isinstance(v, list) and f.value in v for v in column), dtype=bool, count=len(column)
+            )
+        if operator == FilterOperator.TEXT_MATCH:
+            return np.fromiter(
+                (isinstance(v, str) and f.value in v for v in column), dtype=bool, count=len(column)
+            )
+        raise ValueError(f"Unsupported filter operator: {operator}")
+
+    def search(self, query: np.ndarray, top_k: int, mask: np.ndarray):
+        """Top-k inner product over live rows passing mask; query may be 1-D or a batch
+
+        A selective mask (filtered queries) scores only the rows that pass it
+        instead of the whole matrix. Rows upserted after the mask was built are
+        not searched.
+        """
+        queries = np.atleast_2d(query)
+        candidates = np.flatnonzero(mask)
+        k = min(top_k, len(candidates))
+        if k <= 0:
+            return [[] for _ in range(queries.shape[0])]
+
+        with self._lock:
+            # Rows are only ever appended, so the mask's length is a consistent prefix
+            matrix = self._matrix[:len(mask)]
+            if len(candidates) <= len(mask) // 2:
+                scores = queries @ matrix[candidates].T
+            else:
+                scores = queries @ matrix.T
+                scores[:, ~mask] = -np.inf
+                candidates = None
+
+        results = []
+        for row_scores in scores:
+            top = np.argpartition(-row_scores, k - 1)[:k]
+            top = top[np.argsort(-row_scores[top])]
+            rows = top if candidates is None else candidates[top]
+            results.append([(int(row), float(row_scores[i])) for row, i in zip(rows, top)])
+        return results
+
+
+class NumpyVectorStore(BasePydanticVectorStore):
+    """In-process vector store: brute-force inner product over a memory-mapped float32 matrix"""
+
+    stores_text: bool = True
+    flat_metadata: bool = False
+    path: str
+    dim: int
+
+    _index: _LocalIndex = PrivateAttr()
+
+    def __init__(self, path: str, dim: int, **kwargs: Any):
+        super().__init__(path=path, dim=dim, **kwargs)
+        self._index = _LocalIndex(path, dim)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "NumpyVectorStore"
+
+    @property
+    def client(self) -> _LocalIndex:
+        return self._index
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        return self._index.upsert(nodes)
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        rows = [i for i, ref in enumerate(self._index.ref_doc_ids) if ref == ref_doc_id]
+        self._index.delete_rows(rows)
+
+    def delete_nodes(self, node_ids: Optional[List[str]] = None, filters: Optional[MetadataFilters] = None,
+                     **delete_kwargs: Any) -> None:
+        rows = set()
+        if node_ids:
+            rows.update(self._index.id_to_row[i] for i in node_ids if i in self._index.id_to_row)
+        if filters is not None:
+            rows.update(np.flatnonzero(self._index.filter_mask(filters)).tolist())
+        self._index.delete_rows(sorted(rows))
+
+    def get_nodes(self, node_ids: Optional[List[str]] = None, filters: Optional[MetadataFilters] = None,
+                  **kwargs: Any) -> List[BaseNode]:
+        index = self._index
+        mask = index.filter_mask(filters)
+        if node_ids is not None:
+            rows = [index.id_to_row[i] for i in node_ids if i in index.id_to_row]
+            rows = [row for row in rows if mask[row]]
+        else:
+            rows = np.flatnonzero(mask).tolist()
+        return index.load_nodes(rows)
+
+    def filtered_ids(self, filters: MetadataFilters, limit: Optional[int] = None) -> Optional[List[str]]:
+        """Ids of live nodes matching filters, or None when more than limit match"""
+        index = self._index
+        rows = np.flatnonzero(index.filter_mask(filters))
+        if limit is not None and len(rows) > limit:
+            return None
+        return [index.ids[row] for row in rows]
+
+    def existing_ids(self, node_ids: List[str]) -> Set[str]:
+        index = self._index
+        return {i for i in node_ids if i in index.id_to_row and index.alive[index.id_to_row[i]]}
+
+    def persist(self, persist_path: Optional[str] = None, fs: Any = None) -> None:
+        self._index.persist()
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        return self.query_batch([query.query_embedding], query.similarity_top_k, query.filters,
+                                node_ids=query.node_ids)[0]
+
+    def query_batch(
+            self,
+            embeddings: List[List[float]],
+            top_k: int,
+            filters: Optional[MetadataFilters] = None,
+            node_ids: Optional[List[str]] = None
+    ) -> List[VectorStoreQueryResult]:
+        """One matrix multiply for many query vectors sharing the same filters"""
+        index = self._index
+        mask = index.filter_mask(filters)
+        if node_ids is not None:
+            allowed = np.zeros_like(mask)
+            allowed[[index.id_to_row[i] for i in node_ids if i in index.id_to_row]] = True
+            mask &= allowed
+
+        hits = index.search(np.asarray(embeddings, dtype=np.float32), top_k, mask)
+        results = []
+        for row_hits in hits:
+            rows = [row for row, _ in row_hits]
+            nodes = index.load_nodes(rows)
+            results.append(VectorStoreQueryResult(
+                nodes=nodes,
+                similarities=[score for _, score in row_hits],
+                ids=[index.ids[row] for row in rows],
+            ))
+        return results
+
+
+class LocalStorage:
+    """Serverless backend with the same interface as MilvusStorage"""
+
+    def __init__(self, path: Optional[str] = None, dim: Optional[int] = None):
+        self.vector_store = NumpyVectorStore(
+            path=path or settings.LOCAL_STORE_PATH,
+            dim=dim or settings.EMBEDDING_DIM
+        )
+        logging.info(
+            f"✅ Local vector store at {self.vector_store.path} "
+            f"with {self.vector_store.client.live_count} nodes"
+        )
+
+    @traced("storage.upsert")
+    def store_nodes(self, nodes):
+        start = time.perf_counter()
+        self.vector_store.add(nodes)
+        elapsed = time.perf_counter() - start
+        rate = len(nodes) / elapsed if elapsed > 0 else float("inf")
+        logging.info(f"📥 Stored {len(nodes)} nodes ({rate:.0f} rows/sec)")
+
+    @traced("storage.flush")
+    def finalize(self):
+        self.vector_store.persist()
+
+    @traced("storage.checkpoint")
+    def checkpoint(self):
+        """Make stored rows durable before they are recorded as ingested; upserts are not committed"""
+        self.vector_store.persist()
+
+    @traced("storage.existing_ids")
+    def get_existing_ids(self, ids):
+        return self.vector_store.existing_ids(ids)
+
+    @traced("storage.delete")
+    def delete_nodes(self, ids):
+        self.vector_store.delete_nodes(node_ids=ids)
+        self.vector_store.persist()
+        logging.info(f"🗑️ Deleted {len(ids)} stale nodes")
+
+    def get_vector_store(self):
+        return self.vector_store
@@ -1,11 +1,280 @@
 from llama_index.vector_stores.milvus import MilvusVectorStore
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    FilterCondition,
+    FilterOperator,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryMode,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import node_to_metadata_dict, metadata_dict_to_node
 from pymilvus import connections, utility, Collection, FieldSchema, DataType, CollectionSchema
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
 from config.settings import settings
+from config.telemetry import traced
+import numpy as np
 import time
+import json
 import logging
 
+# (build params, search params) per index type; configured params are merged over these
+INDEX_DEFAULTS = {
+    "FLAT": ({}, {}),
+    "HNSW": ({"M": 16, "efConstruction": 200}, {"ef": 64}),
+    "IVF_FLAT": ({"nlist": 1024}, {"nprobe": 16}),
+    "IVF_SQ8": ({"nlist": 1024}, {"nprobe": 16}),
+    "IVF_PQ": ({"nlist": 1024, "m": None, "nbits": 8}, {"nprobe": 16}),
+    "HNSW_SQ": ({"M": 16, "efConstruction": 200, "sq_type": "SQ8"}, {"ef": 64}),
+    "HNSW_PQ": ({"M": 16, "efConstruction": 200, "m": None, "nbits": 8}, {"ef": 64}),
+}
+# Indexes that keep lossy codes instead of the float vectors; candidates for exact rescore
+QUANTIZED_INDEXES = frozenset({"IVF_SQ8", "IVF_PQ", "HNSW_SQ", "HNSW_PQ"})
+
+# Typed scalar fields for the metadata retrieval filters on, with their scalar index;
+# other metadata stays in the dynamic field
+FILTER_FIELD_SCHEMA = {
+    "document_id": (DataType.VARCHAR, {"max_length": 1024}, "INVERTED"),
+    "source_file": (DataType.VARCHAR, {"max_length": 4096}, "INVERTED"),
+    "doc_type": (DataType.VARCHAR, {"max_length": 256}, "INVERTED"),
+    "ingested_at": (DataType.INT64, {}, "STL_SORT"),
+}
+
+_EXPR_OPERATORS = {
+    FilterOperator.EQ: "==",
+    FilterOperator.NE: "!=",
+    FilterOperator.GT: ">",
+    FilterOperator.GTE: ">=",
+    FilterOperator.LT: "<",
+    FilterOperator.LTE: "<=",
+    FilterOperator.IN: "in",
+    FilterOperator.NIN: "not in",
+}
+
+
+def filters_to_expr(filters: Optional[MetadataFilters]) -> str:
+    """Milvus boolean expression for MetadataFilters, evaluated inside the search"""
+    if filters is None or not filters.filters:
+        return ""
+    clauses = []
+    for f in filters.filters:
+        if isinstance(f, MetadataFilters):
+            clauses.append(f"({filters_to_expr(f)})")
+            continue
+        if f.operator in _EXPR_OPERATORS:
+            value = list(f.value) if f.operator in (FilterOperator.IN, FilterOperator.NIN) else f.value
+            clauses.append(f"{f.key} {_EXPR_OPERATORS[f.operator]} {json.dumps(value)}")
+        elif f.operator == FilterOperator.CONTAINS:
+            clauses.append(f"array_contains({f.key}, {json.dumps(f.value)})")
+        elif f.operator == FilterOperator.TEXT_MATCH:
+            clauses.append(f"{f.key} like {json.dumps('%' + str(f.value) + '%')}")
+        else:
+            raise ValueError(f"Unsupported filter operator: {f.operator}")
+    joiner = " or " if filters.condition == FilterCondition.OR else " and "
+    return joiner.join(clauses)
+
+
+def _pq_subquantizers(dim: int) -> int:
+    """Largest m dividing dim with at least 8 dimensions per sub-vector"""
+    return next(m for m in range(max(dim // 8, 1), 0, -1) if dim % m == 0)
+
+
+@dataclass
+class IndexConfig:
+    """Vector index type with its build and search parameters"""
+    index_type: str
+    build_params: Dict[str, Any] = field(default_factory=dict)
+    search_params: Dict[str, Any] = field(default_factory=dict)
+    metric_type: str = "IP"
+    rescore: int = 0  # fetch top_k * rescore candidates and re-rank them on the float vectors
+
+    def index_params(self) -> Dict[str, Any]:
+        return {"index_type": self.index_type, "metric_type": self.metric_type, "params": self.build_params}
+
+    def search_request(self) -> Dict[str, Any]:
+        return {"metric_type": self.metric_type, "params": self.search_params}
+
+    @property
+    def label(self) -> str:
+        params = ",".join(f"{k}={v}" for k, v in {**self.build_params, **self.search_params}.items())
+        rescore = f" rescore x{self.rescore}" if self.rescore else ""
+        return f"{self.index_type}({params}){rescore}"
+
+
+def index_config(
+        index_type: Optional[str] = None,
+        build_params: Optional[Dict[str, Any]] = None,
+        search_params: Optional[Dict[str, Any]] = None,
+        rescore: Optional[int] = None,
+        dim: Optional[int] = None,
+        metric_type: Optional[str] = None
+) -> IndexConfig:
+    """The configured index (MILVUS_INDEX_* settings), or the given type with defaults filled in"""
+    if index_type is None:
+        index_type = settings.MILVUS_INDEX_TYPE
+        build_params = json.loads(settings.MILVUS_INDEX_PARAMS) if settings.MILVUS_INDEX_PARAMS else build_params
+        search_params = json.loads(settings.MILVUS_SEARCH_PARAMS) if settings.MILVUS_SEARCH_PARAMS else search_params
+        rescore = settings.MILVUS_RESCORE_MULTIPLIER if rescore is None else rescore
+    index_type = index_type.upper()
+    default_build, default_search = INDEX_DEFAULTS.get(index_type, ({}, {}))
+    build = {**default_build, **(build_params or {})}
+    if "m" in build and build["m"] is None:
+        build["m"] = _pq_subquantizers(dim or settings.EMBEDDING_DIM)
+    return IndexConfig(
+        index_type=index_type,
+        build_params=build,
+        search_params={**default_search, **(search_params or {})},
+        metric_type=(metric_type or settings.MILVUS_METRIC_TYPE).upper(),
+        rescore=rescore or 0
+    )
+
+
+def _exact_scores(metric_type: str, query: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    if metric_type == "L2":
+        return ((vectors - query) ** 2).sum(axis=1)
+    if metric_type == "COSINE":
+        return vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query) + 1e-12)
+    return vectors @ query
+
+
+def search_vectors(
+        client,
+        collection_name: str,
+        embeddings: List[List[float]],
+        top_k: int,
+        config: IndexConfig,
+        anns_field: str = "embedding",
+        output_fields: Optional[List[str]] = None,
+        expr: str = ""
+) -> List[List[Dict[str, Any]]]:
+    """One multi-vector ANN search with the config's search params; hits are {id, distance, entity}
+
+    With config.rescore the index is asked for top_k * rescore candidates
+    along with their stored float vectors. Those candidates are re-ranked on
+    the exact metric, which recovers most of the recall a quantized index
+    gives up.
+    """
+    fields = list(output_fields or [])
+    limit = top_k * config.rescore if config.rescore else top_k
+    if config.rescore:
+        fields.append(anns_field)
+    hits_per_query = client.search(
+        collection_name=collection_name,
+        data=embeddings,
+        filter=expr,
+        limit=limit,
+        anns_field=anns_field,
+        output_fields=fields,
+        search_params=config.search_request()
+    )
+
+    results = []
+    for query, hits in zip(embeddings, hits_per_query):
+        hits = [{"id": hit["id"], "distance": hit["distance"], "entity": dict(hit["entity"])} for hit in hits]
+        if config.rescore and hits:
+            vectors = np.asarray([hit["entity"].pop(anns_field) for hit in hits], dtype=np.float32)
+            scores = _exact_scores(config.metric_type, np.asarray(query, dtype=np.float32), vectors)
+            order = np.argsort(scores) if config.metric_type == "L2" else np.argsort(-scores)
+            hits = [{**hits[i], "distance": float(scores[i])} for i in order[:top_k]]
+        results.append(hits)
+    return results
+
+
+def is_milvus_store(vector_store):
+    return isinstance(vector_store, MilvusVectorStore)
+
+
+def _entity_to_node(entity: Dict[str, Any], text_key: Optional[str]) -> BaseNode:
+    node = metadata_dict_to_node(entity)
+    if text_key and entity.get(text_key):
+        node.set_content(entity[text_key])
+    return node
+
+
+def milvus_query_batch(vector_store, embeddings, top_k, filters=None):
+    """Search many query vectors in one Milvus request, filters applied inside the search"""
+    text_key = getattr(vector_store, "text_key", None)
+    config = getattr(vector_store, "index_config", None) or index_config()
+    hits_per_query = search_vectors(
+        vector_store.client,
+        vector_store.collection_name,
+        embeddings,
+        top_k,
+        config,
+        anns_field=getattr(vector_store, "embedding_field", "embedding"),
+        output_fields=["*"],
+        expr=filters_to_expr(filters)
+    )
+    results = []
+    for hits in hits_per_query:
+        nodes, similarities, ids = [], [], []
+        for hit in hits:
+            nodes.append(_entity_to_node(hit["entity"], text_key))
+            similarities.append(hit["distance"])
+            ids.append(str(hit["id"]))
+        results.append(VectorStoreQueryResult(nodes=nodes, similarities=similarities, ids=ids))
+    return results
+
+
+class TunedMilvusVectorStore(MilvusVectorStore):
+    """MilvusVectorStore whose dense queries use the configured search params and rescore,
+    with metadata filters evaluated by Milvus against the scalar-indexed fields"""
+
+    _index_config: Optional[IndexConfig] = PrivateAttr(default=None)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "TunedMilvusVectorStore"
+
+    @property
+    def index_config(self) -> Optional[IndexConfig]:
+        return self._index_config
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if (kwargs or query.query_embedding is None
+                or query.node_ids or query.doc_ids or query.mode != VectorStoreQueryMode.DEFAULT):
+            return super().query(query, **kwargs)
+        return milvus_query_batch(self, [query.query_embedding], query.similarity_top_k, query.filters)[0]
+
+    def get_nodes(self, node_ids: Optional[List[str]] = None, filters: Optional[MetadataFilters] = None,
+                  **kwargs: Any) -> List[BaseNode]:
+        if filters is None:
+            return super().get_nodes(node_ids=node_ids, **kwargs)
+        clauses = [f"({filters_to_expr(filters)})"]
+        if node_ids is not None:
+            clauses.append(f"{self.primary_field} in {json.dumps(node_ids)}")
+        rows = self.client.query(
+            collection_name=self.collection_name,
+            filter=" and ".join(clauses),
+            output_fields=["*"]
+        )
+        return [_entity_to_node(row, self.text_key) for row in rows]
+
+    def filtered_ids(self, filters: MetadataFilters, limit: int = 16000) -> Optional[List[str]]:
+        """Ids of the chunks matching filters, or None when more than limit match
+
+        limit + 1 must stay within Milvus' query result window (16384 by default).
+        """
+        rows = self.client.query(
+            collection_name=self.collection_name,
+            filter=filters_to_expr(filters),
+            output_fields=[self.primary_field],
+            limit=limit + 1
+        )
+        if len(rows) > limit:
+            return None
+        return [row[self.primary_field] for row in rows]
+
+
 class MilvusStorage:
-    def __init__(self):
+    def __init__(self, write_batch_size: int = None, create_if_missing: bool = True):
+        self.write_batch_size = write_batch_size or settings.MILVUS_WRITE_BATCH_SIZE
+        self.create_if_missing = create_if_missing
+        self.index_config = index_config()
+        self._rows_written = 0
+        self._write_seconds = 0.0
         self._connect_with_retry()
         self.vector_store = self._initialize_collection()
 
@@ -13,13 +282,7 @@ class MilvusStorage:
         """Robust connection handling with authentication"""
         for attempt in range(max_retries):
             try:
-                connections.connect(
-                    alias="default",
-                    host=settings.MILVUS_HOST,
-                    port=settings.MILVUS_PORT,
-                    user=settings.MILVUS_USER,
-                    password=settings.MILVUS_PASSWORD
-                )
+                connections.connect(alias="default", **self._connection_kwargs())
                 if connections.has_connection("default"):
                     logging.info("✅ Successfully connected to Milvus")
                     return
@@ -33,29 +296,34 @@ class MilvusStorage:
         """Initialize collection with proper schema handling"""
         try:
             # Check if collection exists
-            if settings.MILVUS_COLLECTION in utility.list_collections():
+            if utility.has_collection(settings.MILVUS_COLLECTION):
                 logging.info(f"🔄 Using existing collection: {settings.MILVUS_COLLECTION}")
+                # Schema only; MilvusVectorStore loads the collection once when it attaches
                 col = Collection(settings.MILVUS_COLLECTION)
-                col.load()
 
                 # Verify the collection has the required schema
                 if not self._validate_collection_schema(col):
                     logging.warning("⚠️ Existing collection has invalid schema")
                     raise RuntimeError("Schema validation failed")
+                self._check_index(col)
+                untyped = set(FILTER_FIELD_SCHEMA) - {f.name for f in col.schema.fields}
+                if untyped:
+                    logging.warning(
+                        f"⚠️ {sorted(untyped)} are dynamic fields in this collection: filters on them run "
+                        f"without scalar indexes until the collection is recreated"
+                    )
 
-                return MilvusVectorStore(
-                    collection_name=settings.MILVUS_COLLECTION,
-                    overwrite=False,
-                    uri=f"http://{settings.MILVUS_HOST}:{settings.MILVUS_PORT}",
-                    user=settings.MILVUS_USER,
-                    password=settings.MILVUS_PASSWORD,
-                    db_name=settings.MILVUS_DATABASE
+                return self._vector_store(overwrite=False)
+
+            if not self.create_if_missing:
+                raise RuntimeError(
+                    f"Collection '{settings.MILVUS_COLLECTION}' does not exist; run an ingest before serve-only startup"
                 )
 
             # Create new collection if it doesn't exist
             logging.info(f"🆕 Creating new collection: {settings.MILVUS_COLLECTION}")
 
-            # Define schema for new collection
+            # Define schema for new collection; remaining metadata goes to the dynamic field
             fields = [
                 FieldSchema(
                     name="id",
@@ -74,34 +342,32 @@ class MilvusStorage:
                     max_length=65535
                 ),
                 FieldSchema(
-                    name="document_id",
+                    name="doc_id",
                     dtype=DataType.VARCHAR,
                     max_length=65535
                 ),
-                FieldSchema(
-                    name="metadata",
-                    dtype=DataType.JSON
-                )
             ]
-
-            vector_store = MilvusVectorStore(
-                collection_name=settings.MILVUS_COLLECTION,
-                dim=settings.EMBEDDING_DIM,
-                overwrite=True,
-                index_params={
-                    "metric_type": "IP",
-                    "index_type": "HNSW",
-                    "params": {"M": 16, "efConstruction": 200}
-                },
-                uri=f"http://{settings.MILVUS_HOST}:{settings.MILVUS_PORT}",
-                user=settings.MILVUS_USER,
-                password=settings.MILVUS_PASSWORD,
-                db_name=settings.MILVUS_DATABASE
+            fields += [
+                FieldSchema(name=name, dtype=dtype, **params)
+                for name, (dtype, params, _) in FILTER_FIELD_SCHEMA.items()
+            ]
+            partitioning = {}
+            if settings.MILVUS_PARTITION_KEY:
+                # Entities are hashed into partitions on this field, so filtering on it prunes the rest
+                partitioning = {"num_partitions": settings.MILVUS_NUM_PARTITIONS}
+            schema = CollectionSchema(
+                fields,
+                enable_dynamic_field=True,
+                partition_key_field=settings.MILVUS_PARTITION_KEY or None
             )
+            col = Collection(settings.MILVUS_COLLECTION, schema, **partitioning)
+            col.create_index("embedding", self.index_config.index_params())
+            self._create_scalar_indexes(col)
 
-            # Verify creation
-            time.sleep(2)  # Allow time for propagation
-            if settings.MILVUS_COLLECTION not in utility.list_collections():
+            vector_store = self._vector_store(overwrite=False)
+
+            # Verify creation; create_collection is synchronous so no wait is needed
+            if not utility.has_collection(settings.MILVUS_COLLECTION):
                 raise RuntimeError("Collection creation failed")
 
             logging.info("✅ Collection created successfully")
@@ -111,43 +377,199 @@ class MilvusStorage:
             logging.error(f"❌ Collection setup failed: {e}")
             raise RuntimeError(f"Collection initialization error: {e}")
 
+    def _create_scalar_indexes(self, collection):
+        for name, (_, _, index_type) in FILTER_FIELD_SCHEMA.items():
+            try:
+                collection.create_index(name, {"index_type": index_type}, index_name=f"{name}_idx")
+            except Exception as e:
+                # Filters still run inside Milvus, only without the index (e.g. on Milvus Lite)
+                logging.warning(f"⚠️ No {index_type} index on {name}: {e}")
+
+    def _vector_store(self, **kwargs):
+        vector_store = TunedMilvusVectorStore(
+            collection_name=settings.MILVUS_COLLECTION,
+            index_config={"index_type": self.index_config.index_type, "params": self.index_config.build_params},
+            similarity_metric=self.index_config.metric_type,
+            search_config=self.index_config.search_request(),
+            **kwargs,
+            **self._connection_kwargs()
+        )
+        vector_store._index_config = self.index_config
+        return vector_store
+
+    def _check_index(self, collection):
+        """Warn when the collection was indexed differently from MILVUS_INDEX_TYPE / MILVUS_INDEX_PARAMS /
+        MILVUS_METRIC_TYPE, and serve with the settings of the index actually built"""
+        for index in collection.indexes:
+            if index.field_name != "embedding":
+                continue
+            params = dict(index.params)
+            built = params.get("params", {})
+            if isinstance(built, str):
+                built = json.loads(built)
+            wanted = self.index_config
+            metric = str(params.get("metric_type") or wanted.metric_type).upper()
+            same_type = params.get("index_type") == wanted.index_type and all(
+                str(built.get(k)) == str(v) for k, v in wanted.build_params.items()
+            )
+            if not same_type or metric != wanted.metric_type:
+                logging.warning(
+                    f"⚠️ Collection index is {params.get('index_type')} {built} ({metric}), configured "
+                    f"{wanted.label} ({wanted.metric_type}); serving the existing index until "
+                    f"rebuild_index() (or benchmarks.index_tuning --apply)"
+                )
+                # Search params and metric must match the index actually built
+                self.index_config = index_config(
+                    params.get("index_type", "FLAT"),
+                    build_params=built,
+                    search_params=wanted.search_params if same_type else None,
+                    rescore=wanted.rescore,
+                    metric_type=metric
+                )
+
+    @traced("storage.rebuild_index")
+    def rebuild_index(self, config: Optional[IndexConfig] = None):
+        """Replace the vector index in place, by default with the configured MILVUS_INDEX_* settings;
+        the collection is unavailable for search meanwhile"""
+        config = config or index_config()
+        col = Collection(settings.MILVUS_COLLECTION)
+        start = time.perf_counter()
+        col.release()
+        for index in col.indexes:
+            if index.field_name == "embedding":
+                col.drop_index(index_name=index.index_name)
+        col.create_index("embedding", config.index_params())
+        col.load()
+        self.index_config = config
+        self.vector_store._index_config = config
+        self.vector_store.search_config = config.search_request()
+        self.vector_store.similarity_metric = config.metric_type
+        logging.info(f"✅ Rebuilt index as {config.label} in {time.perf_counter() - start:.1f}s")
+
+    def _connection_kwargs(self):
+        """Server URI with credentials, or a local .db file for Milvus Lite"""
+        if settings.milvus_is_lite:
+            return {"uri": settings.milvus_uri}
+        return {
+            "uri": settings.milvus_uri,
+            "user": settings.MILVUS_USER,
+            "password": settings.MILVUS_PASSWORD,
+            "db_name": settings.MILVUS_DATABASE
+        }
+
     def _validate_collection_schema(self, collection):
-        """Verify the collection has required fields"""
+        """Verify the collection has the fields MilvusVectorStore reads and writes"""
         required_fields = {
             "id": DataType.VARCHAR,
-            "embedding": DataType.FLOAT_VECTOR,
-            "text": DataType.VARCHAR,
-            "metadata": DataType.JSON
+            "embedding": DataType.FLOAT_VECTOR
         }
 
-        schema = collection.schema
+        fields = {field.name: field for field in collection.schema.fields}
         for field_name, field_type in required_fields.items():
-            if field_name not in schema.fields:
+            if field_name not in fields:
                 logging.error(f"Missing required field: {field_name}")
                 return False
-            if schema.fields[field_name].dtype != field_type:
+            if fields[field_name].dtype != field_type:
                 logging.error(f"Invalid type for field {field_name}")
                 return False
+        dim = fields["embedding"].params.get("dim")
+        if dim is not None and int(dim) != settings.EMBEDDING_DIM:
+            logging.error(f"Embedding dim {dim} does not match EMBEDDING_DIM={settings.EMBEDDING_DIM}")
+            return False
         return True
 
+    def _node_to_row(self, node):
+        """Build the same row MilvusVectorStore.add writes for a node"""
+        row = node_to_metadata_dict(node, remove_text=False, flat_metadata=True)
+        row[getattr(self.vector_store, "primary_field", "id")] = node.node_id
+        row[getattr(self.vector_store, "embedding_field", "embedding")] = node.embedding
+        row[getattr(self.vector_store, "doc_id_field", "doc_id")] = node.ref_doc_id or ""
+        text_key = getattr(self.vector_store, "text_key", None)
+        if text_key:
+            row[text_key] = node.get_content()
+        return row
+
+    @traced("storage.upsert")
     def store_nodes(self, nodes):
-        """Safe data insertion with validation"""
+        """Upsert nodes in size-bounded batches keyed on their deterministic id
+
+        Re-running over the same nodes overwrites rather than duplicates. No
+        flush happens here; call finalize() once the whole write is done.
+        """
         try:
             if not self.vector_store:
                 raise RuntimeError("Collection not initialized")
 
-            self.vector_store.add(nodes)
-            logging.info(f"📥 Stored {len(nodes)} nodes")
+            start = time.perf_counter()
+            client = self.vector_store.client
+            for i in range(0, len(nodes), self.write_batch_size):
+                rows = [self._node_to_row(node) for node in nodes[i:i + self.write_batch_size]]
+                client.upsert(collection_name=settings.MILVUS_COLLECTION, data=rows)
 
-            # Verify insertion
-            col = Collection(settings.MILVUS_COLLECTION)
-            col.load()
-            if col.num_entities == 0:
-                logging.warning("⚠️ No entities found after insertion")
+            elapsed = time.perf_counter() - start
+            self._rows_written += len(nodes)
+            self._write_seconds += elapsed
+            rate = len(nodes) / elapsed if elapsed > 0 else float("inf")
+            logging.info(f"📥 Upserted {len(nodes)} nodes ({rate:.0f} rows/sec)")
         except Exception as e:
             logging.error(f"❌ Data storage failed: {e}")
             raise
 
+    @traced("storage.flush")
+    def finalize(self):
+        """Flush once after a bulk write so segments seal and get indexed, then verify"""
+        if not self._rows_written:
+            return
+        client = self.vector_store.client
+        start = time.perf_counter()
+        client.flush(collection_name=settings.MILVUS_COLLECTION)
+        self._write_seconds += time.perf_counter() - start
+
+        # Row count comes from segment stats, so no load() is needed
+        row_count = int(client.get_collection_stats(settings.MILVUS_COLLECTION).get("row_count", 0))
+        if row_count == 0:
+            logging.warning("⚠️ No entities found after insertion")
+        rate = self._rows_written / self._write_seconds if self._write_seconds > 0 else float("inf")
+        logging.info(
+            f"✅ Bulk write done: {self._rows_written} rows in {self._write_seconds:.2f}s "
+            f"({rate:.0f} rows/sec), collection has {row_count} rows"
+        )
+        self._rows_written = 0
+        self._write_seconds = 0.0
+
+    def checkpoint(self):
+        """Make stored rows durable before they are recorded as ingested
+
+        Acknowledged upserts are already in Milvus' write-ahead log; the flush
+        in finalize() only seals segments, so nothing is needed per file.
+        """
+
+    @traced("storage.existing_ids")
+    def get_existing_ids(self, ids, batch_size=1000):
+        """Return the subset of ids already present in the collection"""
+        existing = set()
+        primary_field = getattr(self.vector_store, "primary_field", "id")
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            rows = self.vector_store.client.query(
+                collection_name=settings.MILVUS_COLLECTION,
+                filter=f"{primary_field} in {json.dumps(batch)}",
+                output_fields=[primary_field]
+            )
+            existing.update(row[primary_field] for row in rows)
+        return existing
+
+    @traced("storage.delete")
+    def delete_nodes(self, ids, batch_size=1000):
+        """Delete chunks by node id"""
+        try:
+            for start in range(0, len(ids), batch_size):
+                self.vector_store.delete_nodes(node_ids=ids[start:start + batch_size])
+            logging.info(f"🗑️ Deleted {len(ids)} stale nodes")
+        except Exception as e:
+            logging.error(f"❌ Node deletion failed: {e}")
+            raise
+
     def get_vector_store(self):
         """Get verified vector store instance"""
         if not self.vector_store:
@@ -0,0 +1,218 @@
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from typing import List, Any, Sequence
+
+import numpy as np
+from llama_index.core.base.llms.generic_utils import (
+    astream_completion_response_to_chat_response,
+    completion_response_to_chat_response,
+)
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.embeddings import BaseEmbedding
+from llama_index.core.llms import (
+    ChatMessage,
+    ChatResponse,
+    ChatResponseAsyncGen,
+    CompletionResponse,
+    CompletionResponseAsyncGen,
+    CompletionResponseGen,
+    CustomLLM,
+    LLMMetadata,
+)
+from llama_index.core.llms.callbacks import llm_chat_callback, llm_completion_callback
+
+
+def deterministic_vector(text: str, dim: int) -> List[float]:
+    """Unit vector seeded by the text hash, so equal texts always embed equally"""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    vector /= np.linalg.norm(vector)
+    return vector.tolist()
+
+
+class FakeEmbedding(BaseEmbedding):
+    """Local embedding model with simulated per-request latency and failures"""
+
+    dim: int = 1536
+    latency: float = 0.0
+    per_text_latency: float = 0.0
+    failure_rate: float = 0.0
+
+    _lock: Any = PrivateAttr()
+    _rng: Any = PrivateAttr()
+    _calls: int = PrivateAttr(default=0)
+    _texts: int = PrivateAttr(default=0)
+
+    def __init__(self, **kwargs: Any):
+        kwargs.setdefault("model_name", "fake-embedding")
+        super().__init__(**kwargs)
+        self._lock = threading.Lock()
+        self._rng = random.Random(0)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "FakeEmbedding"
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    @property
+    def texts_embedded(self) -> int:
+        return self._texts
+
+    def _record(self, count: int) -> float:
+        with self._lock:
+            self._calls += 1
+            self._texts += count
+            if self.failure_rate and self._rng.random() < self.failure_rate:
+                raise RuntimeError("Simulated embedding API failure")
+        return self.latency + self.per_text_latency * count
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        time.sleep(self._record(1))
+        return deterministic_vector(query, self.dim)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        await asyncio.sleep(self._record(1))
+        return deterministic_vector(query, self.dim)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_query_embedding(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self._record(len(texts)))
+        return [deterministic_vector(t, self.dim) for t in texts]
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self._record(len(texts)))
+        return [deterministic_vector(t, self.dim) for t in texts]
+
+
+class FakeLLM(CustomLLM):
+    """Local LLM with simulated latency whose answers follow the prompt formats used here
+
+    It emits LLMRerank choice lists, ReAct thought/action/answer steps and plain
+    extractive answers for synthesis prompts, so the full query path can run
+    offline.
+    """
+
+    latency: float = 0.0
+    per_token_latency: float = 0.0
+    context_window: int = 16384
+    num_output: int = 2000
+    model_name: str = "fake-llm"
+
+    _calls: int = PrivateAttr(default=0)
+    _lock: Any = PrivateAttr()
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "FakeLLM"
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(
+            context_window=self.context_window,
+            num_output=self.num_output,
+            model_name=self.model_name,
+        )
+
+    def _respond(self, prompt: str) -> str:
+        with self._lock:
+            self._calls += 1
+
+        documents = re.findall(r"Document (\d+):", prompt)
+        if documents and "Relevance" in prompt:
+            # LLMRerank choice-select format, earlier documents rated higher
+            return "\n".join(
+                f"Doc: {doc}, Relevance: {max(1, 10 - i)}" for i, doc in enumerate(documents)
+            )
+
+        if "Action Input" in prompt:
+            # The ReAct header itself documents "Observation: tool response"
+            observations = [
+                o for o in re.findall(r"Observation: (.*)", prompt) if o.strip() != "tool response"
+            ]
+            if observations:
+                return f"Thought: I can answer without using any more tools.\nAnswer: {observations[-1].strip()}"
+            questions = re.findall(r"user: (.*)", prompt)
+            question = questions[-1].strip() if questions else "the question"
+            return (
+                "Thought: I need to use a tool to help me answer the question.\n"
+                "Action: document_retriever\n"
+                f"Action Input: {json.dumps({'input': question})}"
+            )
+
+        context = prompt.split("---------------------")
+        source = context[1] if len(context) > 2 else prompt
+        words = source.split()[:60]
+        return "Based on the provided context: " + " ".join(words)
+
+    @staticmethod
+    def _tokens(text: str) -> List[str]:
+        return re.findall(r"\S+\s*", text)
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        text = self._respond(prompt)
+        time.sleep(self.latency + self.per_token_latency * len(self._tokens(text)))
+        return CompletionResponse(text=text)
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+        text = self._respond(prompt)
+
+        def gen() -> CompletionResponseGen:
+            time.sleep(self.latency)
+            so_far = ""
+            for token in self._tokens(text):
+                time.sleep(self.per_token_latency)
+                so_far += token
+                yield CompletionResponse(text=so_far, delta=token)
+
+        return gen()
+
+    @llm_completion_callback()
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        text = self._respond(prompt)
+        await asyncio.sleep(self.latency + self.per_token_latency * len(self._tokens(text)))
+        return CompletionResponse(text=text)
+
+    @llm_completion_callback()
+    async def astream_complete(self, prompt: str, formatted: bool = False,
+                               **kwargs: Any) -> CompletionResponseAsyncGen:
+        text = self._respond(prompt)
+
+        async def gen() -> CompletionResponseAsyncGen:
+            await asyncio.sleep(self.latency)
+            so_far = ""
+            for token in self._tokens(text):
+                await asyncio.sleep(self.per_token_latency)
+                so_far += token
+                yield CompletionResponse(text=so_far, delta=token)
+
+        return gen()
+
+    @llm_chat_callback()
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        completion = await self.acomplete(self.messages_to_prompt(messages), formatted=True)
+        return completion_response_to_chat_response(completion)
+
+    @llm_chat_callback()
+    async def astream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseAsyncGen:
+        completion = await self.astream_complete(self.messages_to_prompt(messages), formatted=True)
+        return astream_completion_response_to_chat_response(completion)
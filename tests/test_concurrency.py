@@ -0,0 +1,198 @@
+import asyncio
+import json
+import socket
+import threading
+
+import pytest
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from app.application import AdvancedRAGApplication
+from app.server import RAGServer
+from config.limits import DownstreamLimits, limits
+from config.settings import settings
+from orchestrator.query_engine import AdvancedQueryEngine
+from retrieval.reranker import AdvancedReranker
+from testing.fake_models import FakeLLM, deterministic_vector
+
+LLM_LIMIT = 2
+QUESTIONS = [f"What did bidder {i} offer for the target?" for i in range(12)]
+
+
+class StaticRetriever(BaseRetriever):
+    """Stands in for AdvancedRetriever: the same few chunks for every question"""
+
+    def __init__(self, nodes):
+        super().__init__()
+        self.nodes = nodes
+
+    def get_retriever(self, similarity_top_k=5, filters=None):
+        return self
+
+    def _retrieve(self, query_bundle):
+        return [NodeWithScore(node=node, score=1.0) for node in self.nodes]
+
+
+class InFlight:
+    """Highest number of overlapping calls seen"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.current = 0
+        self.peak = 0
+
+    def __enter__(self):
+        with self._lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def __exit__(self, *exc):
+        with self._lock:
+            self.current -= 1
+
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    """Offline models, LIMIT_LLM of LLM_LIMIT, and a tracker of concurrent FakeLLM calls"""
+    monkeypatch.setattr(settings, "EMBEDDING_PROVIDER", "fake")
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "fake")
+    monkeypatch.setattr(settings, "EMBED_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "FAKE_LLM_LATENCY", 0.02)
+    monkeypatch.setattr(settings, "CONTEXT_COMPRESSION", False)
+    monkeypatch.setitem(limits._limits, "llm", LLM_LIMIT)
+
+    tracker = InFlight()
+    complete, acomplete = FakeLLM.complete, FakeLLM.acomplete
+
+    def counted_complete(self, *args, **kwargs):
+        with tracker:
+            return complete(self, *args, **kwargs)
+
+    async def counted_acomplete(self, *args, **kwargs):
+        with tracker:
+            return await acomplete(self, *args, **kwargs)
+
+    monkeypatch.setattr(FakeLLM, "complete", counted_complete)
+    monkeypatch.setattr(FakeLLM, "acomplete", counted_acomplete)
+    return tracker
+
+
+@pytest.fixture
+def app(llm_calls):
+    texts = [
+        "Bidder one offered 42 million in cash for the target.",
+        "Bidder two offered 45 million, half of it in stock.",
+        "The board meets on Friday to compare both offers.",
+    ]
+    nodes = [TextNode(text=t, embedding=deterministic_vector(t, settings.EMBEDDING_DIM)) for t in texts]
+    engine = AdvancedQueryEngine(StaticRetriever(nodes), AdvancedReranker(top_n=3))
+    return AdvancedRAGApplication(engine, mode="query")
+
+
+def test_limits_cap_concurrent_holders():
+    caps = DownstreamLimits(llm=2)
+    tracker = InFlight()
+
+    async def call():
+        async with caps("llm"):
+            with tracker:
+                await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(*(call() for _ in range(10)))
+
+    asyncio.run(main())
+    assert tracker.peak == 2
+
+
+def test_limits_work_across_event_loops():
+    caps = DownstreamLimits(llm=1)
+
+    async def main():
+        async def call():
+            async with caps("llm"):
+                await asyncio.sleep(0.001)
+
+        # Contention binds the semaphore to this loop
+        await asyncio.gather(call(), call())
+
+    asyncio.run(main())
+    asyncio.run(main())
+
+
+def test_concurrent_aquery_respects_the_llm_limit(app, llm_calls):
+    async def main():
+        return await asyncio.gather(*(app.aquery(q) for q in QUESTIONS))
+
+    results = asyncio.run(main())
+    # A second loop in the same process reuses the module-level limits
+    results += asyncio.run(main())
+
+    assert len(results) == 2 * len(QUESTIONS)
+    assert all(r["answer"] and r["sources"] for r in results)
+    assert 1 < llm_calls.peak <= LLM_LIMIT
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _post(port: int, payload: dict):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(
+        f"POST /query HTTP/1.1\r\nHost: test\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, payload = raw.partition(b"\r\n\r\n")
+    return int(head.split()[1]), payload
+
+
+def _chunks(payload: bytes) -> bytes:
+    """Body of a chunked transfer-encoded response"""
+    body = b""
+    while payload:
+        size, _, rest = payload.partition(b"\r\n")
+        length = int(size, 16)
+        if length == 0:
+            break
+        body += rest[:length]
+        payload = rest[length + 2:]
+    return body
+
+
+def test_server_serves_concurrent_clients_within_the_llm_limit(app, llm_calls):
+    port = _free_port()
+
+    async def main():
+        server = RAGServer(app, port=port, max_concurrency=8)
+        task = asyncio.create_task(server.serve_forever())
+        try:
+            for _ in range(100):
+                try:
+                    _, writer = await asyncio.open_connection("127.0.0.1", port)
+                    writer.close()
+                    break
+                except OSError:
+                    await asyncio.sleep(0.01)
+            plain = [_post(port, {"query": q}) for q in QUESTIONS]
+            streamed = [_post(port, {"query": q, "stream": True}) for q in QUESTIONS[:4]]
+            return await asyncio.gather(*plain), await asyncio.gather(*streamed), server
+        finally:
+            task.cancel()
+
+    plain, streamed, server = asyncio.run(main())
+
+    assert [status for status, _ in plain + streamed] == [200] * (len(QUESTIONS) + 4)
+    assert all(json.loads(body)["answer"] for _, body in plain)
+    for _, payload in streamed:
+        events = [json.loads(line) for line in _chunks(payload).splitlines()]
+        assert events[-1]["type"] == "done"
+        assert "".join(e["delta"] for e in events if e["type"] == "token") == events[-1]["answer"]
+    assert server._in_flight == 0
+    assert llm_calls.peak <= LLM_LIMIT
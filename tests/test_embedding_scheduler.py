@@ -0,0 +1,99 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from data_pipeline import embedding_scheduler
+from data_pipeline.embedding_scheduler import EmbeddingScheduler
+from testing.fake_models import FakeEmbedding, deterministic_vector
+
+DIM = 8
+
+
+class FlakyEmbedding(FakeEmbedding):
+    """Fails its first fail_first batch calls, then behaves like FakeEmbedding"""
+
+    fail_first: int = 0
+
+    def _get_text_embeddings(self, texts):
+        if self.calls < self.fail_first:
+            self._record(len(texts))
+            raise RuntimeError("Simulated rate limit")
+        return super()._get_text_embeddings(texts)
+
+
+def words(text):
+    return text.split()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Backoff delays the scheduler asked for, without actually sleeping"""
+    delays = []
+    # Only the scheduler's clock; FakeEmbedding keeps sleeping for its simulated latency
+    monkeypatch.setattr(embedding_scheduler, "time", SimpleNamespace(sleep=delays.append, perf_counter=time.perf_counter))
+    return delays
+
+
+def test_pack_batches_respects_token_and_size_budgets():
+    scheduler = EmbeddingScheduler(
+        FakeEmbedding(dim=DIM), max_batch_tokens=5, max_batch_size=3, tokenizer=words
+    )
+    texts = ["a b c", "d e", "f", "g h i j k l", "m", "n", "o", "p"]
+    assert scheduler.pack_batches(texts) == [[0, 1], [2], [3], [4, 5, 6], [7]]
+
+
+def test_pack_batches_keeps_an_oversized_text_alone():
+    scheduler = EmbeddingScheduler(
+        FakeEmbedding(dim=DIM), max_batch_tokens=2, max_batch_size=10, tokenizer=words
+    )
+    assert scheduler.pack_batches(["a", "b c d e", "f"]) == [[0], [1], [2]]
+
+
+def test_results_follow_input_order_across_concurrent_batches():
+    # Earlier batches are larger, so with per-text latency they finish last
+    texts = [f"chunk {i} " + "word " * (40 - i) for i in range(40)]
+    model = FakeEmbedding(dim=DIM, per_text_latency=0.001)
+    scheduler = EmbeddingScheduler(model, max_batch_tokens=120, max_batch_size=8, concurrency=4, tokenizer=words)
+
+    vectors = scheduler.embed(texts)
+
+    assert vectors == [deterministic_vector(t, DIM) for t in texts]
+    assert scheduler.last_stats["batches"] == len(scheduler.pack_batches(texts))
+    assert model.texts_embedded == len(texts)
+
+
+def test_failed_batches_are_retried_with_capped_exponential_backoff(sleeps):
+    model = FlakyEmbedding(dim=DIM, fail_first=4)
+    scheduler = EmbeddingScheduler(
+        model, max_batch_size=10, concurrency=1, max_retries=5,
+        initial_backoff=1.0, max_backoff=3.0, tokenizer=words
+    )
+
+    vectors = scheduler.embed(["alpha", "beta"])
+
+    assert vectors == [deterministic_vector(t, DIM) for t in ["alpha", "beta"]]
+    assert scheduler.last_stats["retries"] == 4
+    assert model.calls == 5
+    # Jitter keeps each delay within [50%, 100%] of min(max_backoff, initial * 2^attempt)
+    for delay, ceiling in zip(sleeps, [1.0, 2.0, 3.0, 3.0]):
+        assert ceiling / 2 <= delay <= ceiling
+
+
+def test_exhausted_retries_raise_with_the_original_error(sleeps):
+    model = FakeEmbedding(dim=DIM, failure_rate=1.0)
+    scheduler = EmbeddingScheduler(model, concurrency=1, max_retries=2, tokenizer=words)
+
+    with pytest.raises(RuntimeError, match="after 3 attempts") as excinfo:
+        scheduler.embed(["alpha"])
+
+    assert isinstance(excinfo.value.__cause__, RuntimeError)
+    assert "Simulated embedding API failure" in str(excinfo.value.__cause__)
+    assert model.calls == 3
+    assert len(sleeps) == 2
+
+
+def test_empty_input_makes_no_calls():
+    model = FakeEmbedding(dim=DIM)
+    assert EmbeddingScheduler(model, tokenizer=words).embed([]) == []
+    assert model.calls == 0